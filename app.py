@@ -4,10 +4,14 @@ import dash_bootstrap_components as dbc
 from flask_login import LoginManager
 import os
 
-# Importa il modello
+# Collega il database (mapping e migrazioni) prima di registrare le callback
 import model
+model.init_app()
 
 from controller.auth import register_auth_callbacks
+from controller.push import register_push_routes
+from controller.export import register_export_routes
+from controller.payload import register_payload_instrumentation
 from view.layout import get_main_layout
 
 # Initialize the Dash app with Bootstrap styling
@@ -31,16 +35,24 @@ login_manager.login_view = '/login'
 
 app.layout = get_main_layout()
 
-# User loader per Flask-Login
+# User loader per Flask-Login: identità dalla cache, senza query ad ogni callback
 @login_manager.user_loader
 def load_user(username):
-    from pony.orm import db_session
-    with db_session:
-        return model.User.get(username=username)
+    from model.user_cache import load_user_snapshot
+    return load_user_snapshot(username)
     
 # Register all callbacks
 register_auth_callbacks(app)
 
+# Endpoint SSE per le notifiche push ai medici
+register_push_routes(server)
+
+# Download CSV in streaming dei dati dei pazienti
+register_export_routes(server)
+
+# Dimensione delle risposte misurata per callback
+register_payload_instrumentation(server)
+
 
 # Run the app
 if __name__ == '__main__':
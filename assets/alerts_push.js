@@ -0,0 +1,62 @@
+// assets/alerts_push.js
+// Canale push per la campanella del medico: una sola EventSource per scheda.
+// Ad ogni evento aggiorna lo store "alerts-push-medico", che fa ricaricare gli alert.
+// Alla riconnessione il browser invia Last-Event-ID e il server recupera gli eventi persi;
+// il polling lento della dashboard ("alerts-poll-medico") è attivo solo quando il canale
+// push non è disponibile: browser senza EventSource o connessione rifiutata (503).
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    alerts: {
+        connect: function () {
+            var STORE_ID = "alerts-push-medico";
+            var POLL_ID = "alerts-poll-medico";
+
+            function polling(attivo) {
+                if (document.getElementById(POLL_ID)) {
+                    window.dash_clientside.set_props(POLL_ID, {disabled: !attivo});
+                }
+            }
+
+            if (!window.EventSource) {
+                polling(true);
+                return window.dash_clientside.no_update;
+            }
+            if (window._alertsSource) {
+                return window.dash_clientside.no_update;
+            }
+
+            var source = new EventSource("/alerts/stream");
+            window._alertsSource = source;
+
+            function push(data) {
+                // Dashboard medico non più visibile: chiudo la connessione
+                if (!document.getElementById(STORE_ID)) {
+                    source.close();
+                    window._alertsSource = null;
+                    return;
+                }
+                window.dash_clientside.set_props(STORE_ID, {data: data});
+            }
+
+            source.addEventListener("open", function () {
+                polling(false);
+            });
+
+            source.addEventListener("alerts", function (e) {
+                var payload = {};
+                try { payload = JSON.parse(e.data); } catch (err) {}
+                payload.received_at = Date.now();
+                push(payload);
+            });
+
+            source.addEventListener("error", function () {
+                // Connessione rifiutata: il browser non riprova, al prossimo montaggio si ritenta
+                if (source.readyState === EventSource.CLOSED) {
+                    window._alertsSource = null;
+                    polling(true);
+                }
+            });
+
+            return window.dash_clientside.no_update;
+        }
+    }
+});
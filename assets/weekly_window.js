@@ -0,0 +1,40 @@
+// assets/weekly_window.js
+// Grafico "Media settimana per settimana": il server invia una sola volta la
+// figura della finestra più ampia; cambiando "Finestra settimane" la figura
+// viene ritagliata qui, senza richieste al server.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    charts: {
+        sliceWeeks: function (stored, weeks) {
+            if (!stored || !stored.figure) {
+                return window.dash_clientside.no_update;
+            }
+
+            var fig = JSON.parse(JSON.stringify(stored.figure));
+            var cutoffs = stored.cutoffs || {};
+            var start = cutoffs[String(weeks)];
+            if (start === undefined) {
+                return fig;
+            }
+
+            // Nessuna settimana con dati nella finestra scelta
+            if (start >= stored.size) {
+                fig.data = [];
+                fig.layout = fig.layout || {};
+                fig.layout.annotations = [{
+                    text: "Nessuna settimana con dati nel periodo",
+                    xref: "paper", yref: "paper", x: 0.5, y: 0.5, showarrow: false
+                }];
+                return fig;
+            }
+
+            (fig.data || []).forEach(function (trace) {
+                if (Array.isArray(trace.x)) { trace.x = trace.x.slice(start); }
+                if (Array.isArray(trace.y)) { trace.y = trace.y.slice(start); }
+            });
+            if (fig.data && fig.data.length && stored.trace_name) {
+                fig.data[0].name = stored.trace_name.replace("{n}", weeks);
+            }
+            return fig;
+        }
+    }
+});
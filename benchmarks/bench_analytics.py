@@ -0,0 +1,134 @@
+# benchmarks/bench_analytics.py
+"""Benchmark delle serie glicemiche su storici sintetici.
+
+Confronta, per storici da 10k a 1M misurazioni di un paziente:
+  - pandas:  lettura di tutte le righe + resample (pipeline dei grafici precedente)
+  - group_by: aggregazione in SQL sulle sole finestre dei grafici (model.aggregazioni)
+  - rollup:  lettura degli aggregati pre-calcolati + assemblaggio (controller.analytics)
+  - backfill: ricostruzione completa degli aggregati (una tantum, migrazione 2)
+
+Uso:
+    python benchmarks/bench_analytics.py [--sizes 10000 100000 1000000] [--repeat 5]
+"""
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model import db, init_app  # noqa: E402
+from model.aggregazioni import bucket_stats_sql  # noqa: E402
+from model.rollup import rebuild_all_sql, period_start, period_end  # noqa: E402
+from controller.analytics import (  # noqa: E402
+    assemble_weekday, assemble_weekly, assemble_monthly, weeks_window_start, DEFAULT_WEEKS_WINDOW
+)
+
+# Solo per lo schema: il database dell'applicazione non viene aperto
+init_app(":memory:", quiet=True)
+
+PAZIENTE = "bench"
+INTERVALLO_MINUTI = 5  # frequenza tipica di un sensore CGM
+
+_ROLLUP_SQL = (
+    'SELECT inizio, somma, conteggio FROM "GlicemiaRollup" '
+    "WHERE paziente = ? AND periodo = ? AND inizio >= ? AND inizio < ?"
+)
+
+
+def _positional(sql):
+    return re.sub(r"\$\w+", "?", sql)
+
+def build_database(n):
+    """Database in memoria con n misurazioni sintetiche che terminano oggi"""
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(db.schema.generate_create_script())
+
+    rng = np.random.default_rng(42)
+    valori = np.clip(rng.normal(140, 45, n), 40, 400).round(1)
+    fine = datetime.combine(date.today(), datetime.min.time()) + timedelta(hours=12)
+    passo = timedelta(minutes=INTERVALLO_MINUTI)
+    inizio = fine - passo * (n - 1)
+
+    conn.executemany(
+        'INSERT INTO "Glicemia" (paziente, valore, data_ora, momento_pasto, note) '
+        "VALUES (?, ?, ?, 'digiuno', '')",
+        ((PAZIENTE, float(v), (inizio + passo * i).strftime("%Y-%m-%d %H:%M:%S"))
+         for i, v in enumerate(valori))
+    )
+    conn.commit()
+    return conn
+
+def _windows(today):
+    start_week = period_start('settimana', today)
+    return {
+        'giorno': (start_week, period_end('settimana', start_week)),
+        'settimana': (weeks_window_start(today, DEFAULT_WEEKS_WINDOW), today + timedelta(days=1)),
+        'mese': (date(today.year, 1, 1), date(today.year + 1, 1, 1)),
+    }
+
+def run_pandas(conn, today):
+    rows = conn.execute('SELECT data_ora, valore FROM "Glicemia" WHERE paziente = ?', (PAZIENTE,))
+    df = pd.DataFrame(rows.fetchall(), columns=["data", "valore"])
+    df["data"] = pd.to_datetime(df["data"])
+    df = df.set_index("data").sort_index()
+
+    since = pd.Timestamp(today - timedelta(weeks=DEFAULT_WEEKS_WINDOW))
+    start_week = pd.Timestamp(period_start('settimana', today))
+    week = df.loc[(df.index >= start_week) & (df.index < start_week + pd.Timedelta(days=7))]
+    week.groupby(week.index.dayofweek)["valore"].mean()
+    df.loc[df.index >= since]["valore"].resample("W-MON", label="left", closed="left").mean()
+    df.loc[df.index >= pd.Timestamp(year=today.year, month=1, day=1)]["valore"].resample("MS").mean()
+
+def run_group_by(conn, today):
+    for periodo, (start, end) in _windows(today).items():
+        conn.execute(_positional(bucket_stats_sql(periodo)), (
+            PAZIENTE, datetime.combine(start, datetime.min.time()).strftime("%Y-%m-%d %H:%M:%S"),
+            datetime.combine(end, datetime.min.time()).strftime("%Y-%m-%d %H:%M:%S"),
+        )).fetchall()
+
+def run_rollup(conn, today):
+    means = {}
+    for periodo, (start, end) in _windows(today).items():
+        rows = conn.execute(_ROLLUP_SQL, (PAZIENTE, periodo, start.isoformat(), end.isoformat()))
+        means[periodo] = {date.fromisoformat(i): s / n for i, s, n in rows}
+    assemble_weekday(means['giorno'], today)
+    assemble_weekly(means['settimana'])
+    assemble_monthly(means['mese'], today.year)
+
+def run_backfill(conn, today):
+    for sql in rebuild_all_sql():
+        conn.execute(sql)
+
+def best_of(func, conn, today, repeat):
+    tempi = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(conn, today)
+        tempi.append(time.perf_counter() - t0)
+    return min(tempi)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    today = date.today()
+    print(f"{'misure':>10} {'pandas':>10} {'group_by':>10} {'rollup':>10} {'backfill':>10}   (ms, migliore su {args.repeat})")
+    for n in args.sizes:
+        conn = build_database(n)
+        backfill = best_of(run_backfill, conn, today, 1)
+        risultati = [best_of(f, conn, today, args.repeat) for f in (run_pandas, run_group_by, run_rollup)]
+        print(f"{n:>10} " + " ".join(f"{t * 1000:>10.2f}" for t in risultati + [backfill]))
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/bench_login.py
+"""Benchmark degli accessi concorrenti: verifica delle password inline o nel pool.
+
+Simula un picco di accessi (es. apertura dell'ambulatorio) su un server con
+più thread di richiesta: --logins thread verificano ciascuno una password,
+mentre un altro thread riceve ogni 20 ms una callback leggera (la
+serializzazione di alcune figure) e ne misura la latenza dall'arrivo.
+
+Modalità:
+  - inline: check_password_hash nel thread della richiesta (comportamento precedente)
+  - pool:   model.passwords.verify_password (PASSWORD_WORKERS thread)
+
+Riporta accessi al secondo, latenza degli accessi e latenza della callback
+leggera durante il picco.
+
+Uso:
+    python benchmarks/bench_login.py [--logins 32] [--method scrypt:32768:8:1]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash, check_password_hash  # noqa: E402
+from model import passwords  # noqa: E402
+
+# Payload tipico di una callback leggera (una figura con un centinaio di punti)
+FIGURA = {"data": [{"x": list(range(100)), "y": [100.0 + i % 50 for i in range(100)], "type": "scatter"}],
+          "layout": {"title": "glicemia", "height": 300}}
+
+
+def _p95(valori):
+    valori = sorted(valori)
+    return valori[max(0, int(len(valori) * 0.95) - 1)]
+
+def run(mode, logins, password_hash):
+    verifica = check_password_hash if mode == "inline" else passwords.verify_password
+    latenze_login, latenze_callback = [], []
+    fine_picco = threading.Event()
+
+    def login():
+        t0 = time.perf_counter()
+        assert verifica(password_hash, "password")
+        latenze_login.append(time.perf_counter() - t0)
+
+    def callback():
+        # Una richiesta ogni 20 ms: latenza dall'arrivo prevista alla risposta
+        arrivo = time.perf_counter()
+        while not fine_picco.is_set():
+            for _ in range(20):
+                json.loads(json.dumps(FIGURA))
+            latenze_callback.append(time.perf_counter() - arrivo)
+            arrivo += 0.02
+            time.sleep(max(0.0, arrivo - time.perf_counter()))
+
+    altro = threading.Thread(target=callback)
+    altro.start()
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=login) for _ in range(logins)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    durata = time.perf_counter() - t0
+    fine_picco.set()
+    altro.join()
+
+    return (logins / durata, statistics.median(latenze_login) * 1000, _p95(latenze_login) * 1000,
+            statistics.median(latenze_callback) * 1000, _p95(latenze_callback) * 1000)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--method", default=passwords.PASSWORD_METHOD)
+    args = parser.parse_args()
+
+    password_hash = generate_password_hash("password", args.method)
+    print(f"{args.logins} accessi concorrenti, {args.method}, pool di {passwords.PASSWORD_WORKERS} "
+          f"thread, {os.cpu_count()} CPU")
+    print(f"{'modalità':>8} {'accessi/s':>10} {'login p50':>10} {'login p95':>10} "
+          f"{'callback p50':>13} {'callback p95':>13}")
+    for mode in ("inline", "pool"):
+        r = run(mode, args.logins, password_hash)
+        print(f"{mode:>8} {r[0]:>10.1f} {r[1]:>8.0f}ms {r[2]:>8.0f}ms {r[3]:>11.2f}ms {r[4]:>11.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# benchmarks/bench_sqlite_contention.py
+"""Benchmark di contesa tra processi su SQLite: profilo predefinito contro WAL.
+
+Simula più worker (come gunicorn) sullo stesso file di database:
+  - scrittori: salvataggi di glicemie, ognuno in una transazione
+    BEGIN IMMEDIATE come quelle di Pony (misura + aggregato giornaliero)
+  - lettori: query GROUP BY dei grafici (model.aggregazioni) sullo storico
+
+Per ogni profilo riporta scritture e letture al secondo, latenza delle
+scritture ed errori "database is locked".
+
+Profili:
+  - default: impostazioni di sqlite3 (journal DELETE, synchronous FULL, timeout 5 s)
+  - wal:     model.database.SQLITE_PRAGMAS
+
+Uso:
+    python benchmarks/bench_sqlite_contention.py [--writers 4] [--readers 4] [--seconds 5] [--history 50000]
+"""
+import argparse
+import multiprocessing as mp
+import os
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model import db, init_app  # noqa: E402
+from model.database import apply_sqlite_pragmas, SQLITE_PRAGMAS  # noqa: E402
+from model.aggregazioni import bucket_stats_sql  # noqa: E402
+
+# Solo per lo schema: il database dell'applicazione non viene aperto
+init_app(":memory:", quiet=True)
+
+PROFILI = {"default": [], "wal": SQLITE_PRAGMAS}
+PAZIENTI = [f"bench{i}" for i in range(20)]
+
+_INSERT = (
+    'INSERT INTO "Glicemia" (paziente, valore, data_ora, momento_pasto, note) '
+    "VALUES (?, ?, ?, 'digiuno', '')"
+)
+_ROLLUP = (
+    'INSERT INTO "GlicemiaRollup" '
+    "(paziente, periodo, inizio, conteggio, somma, minimo, massimo, somma_quadrati) "
+    "VALUES (?, 'giorno', ?, 1, ?, ?, ?, ?) "
+    "ON CONFLICT (paziente, periodo, inizio) DO UPDATE SET "
+    "conteggio = conteggio + 1, somma = somma + excluded.somma, "
+    "somma_quadrati = somma_quadrati + excluded.somma_quadrati"
+)
+
+
+def _connect(path, pragmas):
+    # Stesse impostazioni della connessione aperta da Pony
+    conn = sqlite3.connect(path, isolation_level=None)
+    apply_sqlite_pragmas(conn, pragmas)
+    return conn
+
+def build_database(path, pragmas, history):
+    """File con lo schema dell'applicazione e history misure distribuite tra i pazienti"""
+    conn = _connect(path, pragmas)
+    conn.executescript(db.schema.generate_create_script())
+    inizio = datetime.now() - timedelta(minutes=5 * history)
+    conn.execute("BEGIN")
+    conn.executemany(_INSERT, (
+        (PAZIENTI[i % len(PAZIENTI)], 100.0 + i % 150,
+         (inizio + timedelta(minutes=5 * i)).strftime("%Y-%m-%d %H:%M:%S"))
+        for i in range(history)
+    ))
+    conn.execute("COMMIT")
+    conn.close()
+
+def writer(path, pragmas, seconds, worker_id, results):
+    conn = _connect(path, pragmas)
+    latenze, errori = [], 0
+    base = datetime.now() + timedelta(days=1 + worker_id * 1000)
+    fine = time.perf_counter() + seconds
+    i = 0
+    while time.perf_counter() < fine:
+        paziente = PAZIENTI[i % len(PAZIENTI)]
+        data_ora = base + timedelta(seconds=i)
+        valore = 90.0 + i % 120
+        t0 = time.perf_counter()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(_INSERT, (paziente, valore, data_ora.strftime("%Y-%m-%d %H:%M:%S")))
+            conn.execute(_ROLLUP, (paziente, data_ora.strftime("%Y-%m-%d"),
+                                   valore, valore, valore, valore * valore))
+            conn.execute("COMMIT")
+            latenze.append(time.perf_counter() - t0)
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e) and "busy" not in str(e):
+                raise
+            errori += 1
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+        i += 1
+    conn.close()
+    results.put(("writer", len(latenze), errori, latenze))
+
+def reader(path, pragmas, seconds, worker_id, results):
+    conn = _connect(path, pragmas)
+    sql = re.sub(r"\$(\w+)", r":\1", bucket_stats_sql("settimana"))
+    letture, errori = 0, 0
+    fine = time.perf_counter() + seconds
+    i = worker_id
+    while time.perf_counter() < fine:
+        params = {"paziente": PAZIENTI[i % len(PAZIENTI)],
+                  "start": "2000-01-01 00:00:00", "end": "2100-01-01 00:00:00"}
+        try:
+            conn.execute(sql, params).fetchall()
+            letture += 1
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e) and "busy" not in str(e):
+                raise
+            errori += 1
+        i += 1
+    conn.close()
+    results.put(("reader", letture, errori, []))
+
+def run_profile(nome, writers, readers, seconds, history):
+    pragmas = PROFILI[nome]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.sqlite")
+        build_database(path, pragmas, history)
+
+        # fork: ogni processo apre la propria connessione, come i worker gunicorn
+        ctx = mp.get_context("fork")
+        results = ctx.Queue()
+        processi = (
+            [ctx.Process(target=writer, args=(path, pragmas, seconds, i, results)) for i in range(writers)] +
+            [ctx.Process(target=reader, args=(path, pragmas, seconds, i, results)) for i in range(readers)]
+        )
+        for p in processi:
+            p.start()
+        raccolti = [results.get() for _ in processi]
+        for p in processi:
+            p.join()
+
+    scritture = sum(r[1] for r in raccolti if r[0] == "writer")
+    letture = sum(r[1] for r in raccolti if r[0] == "reader")
+    errori = sum(r[2] for r in raccolti)
+    latenze = sorted(l for r in raccolti for l in r[3])
+    p95 = latenze[int(len(latenze) * 0.95) - 1] * 1000 if latenze else float("nan")
+    mediana = statistics.median(latenze) * 1000 if latenze else float("nan")
+    return scritture / seconds, letture / seconds, mediana, p95, errori
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--history", type=int, default=50000)
+    args = parser.parse_args()
+
+    print(f"{args.writers} scrittori, {args.readers} lettori, {args.seconds:g} s, "
+          f"{args.history} misure di storico")
+    print(f"{'profilo':>8} {'scritt./s':>10} {'letture/s':>10} {'mediana ms':>11} {'p95 ms':>8} {'locked':>7}")
+    for nome in PROFILI:
+        w, r, mediana, p95, errori = run_profile(nome, args.writers, args.readers, args.seconds, args.history)
+        print(f"{nome:>8} {w:>10.0f} {r:>10.0f} {mediana:>11.2f} {p95:>8.2f} {errori:>7}")
+
+
+if __name__ == "__main__":
+    main()
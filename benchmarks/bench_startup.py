@@ -0,0 +1,88 @@
+# benchmarks/bench_startup.py
+"""Benchmark dei tempi di avvio al crescere della tabella utenti.
+
+Ogni fase viene eseguita in un interprete nuovo (avvio a freddo, come un
+worker gunicorn o un processo di test) su un database con N utenti:
+  - python:     interprete vuoto (riferimento)
+  - import:     `import model` (sole definizioni delle entità)
+  - init_app:   import + model.init_app() (collegamento, mapping, migrazioni)
+  - precedente: init_app più conteggio e stampa di tutti gli utenti, cioè
+                ciò che faceva l'import di model prima di init_app
+Riporta anche il tempo di raccolta dei test (pytest --collect-only).
+
+Uso:
+    python benchmarks/bench_startup.py [--users 10 10000 100000] [--repeat 5]
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FASI = {
+    "python": "pass",
+    "import": "import model",
+    "init_app": "import model; model.init_app({path!r}, quiet=True)",
+    "precedente": (
+        "import model; from pony.orm import db_session; model.init_app({path!r})\n"
+        "with db_session:\n"
+        "    print(model.User.select().count())\n"
+        "    for u in model.User.select(): print(u.username, u.role)"
+    ),
+}
+
+_INSERT_USER = (
+    'INSERT INTO "User" (username, password_hash, is_admin, role, name, surname, telefono, email) '
+    "VALUES (?, 'x', 0, ?, 'Nome', 'Cognome', '', ?)"
+)
+
+
+def _run(codice, repeat):
+    """Mediana in ms dell'esecuzione di codice in un processo nuovo"""
+    tempi = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "-c", codice], cwd=ROOT, check=True,
+                       stdout=subprocess.DEVNULL, env={**os.environ, "PYTHONPATH": ROOT})
+        tempi.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(tempi)
+
+def build_database(path, users):
+    """Schema dell'applicazione (con migrazioni) e users utenti alternati pazienti/medici"""
+    subprocess.run([sys.executable, "-c", FASI["init_app"].format(path=path)],
+                   cwd=ROOT, check=True, env={**os.environ, "PYTHONPATH": ROOT})
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.executemany(_INSERT_USER, (
+            (f"utente{i}", "Paziente", None) if i % 2 else (f"utente{i}", "Medico", f"utente{i}@example.it")
+            for i in range(users)
+        ))
+    conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[10, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'utenti':>8} " + " ".join(f"{fase + ' ms':>14}" for fase in FASI))
+    for users in args.users:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.sqlite")
+            build_database(path, users)
+            tempi = [_run(codice.format(path=path), args.repeat) for codice in FASI.values()]
+        print(f"{users:>8} " + " ".join(f"{t:>14.0f}" for t in tempi))
+
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "pytest", "--collect-only", "-q"], cwd=ROOT,
+                   check=True, stdout=subprocess.DEVNULL)
+    print(f"raccolta dei test: {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# controller/adherence.py
+"""Calcolo indicizzato dell'aderenza alle terapie.
+
+Le assunzioni di un intervallo vengono lette con una sola query e
+raggruppate una volta per (giorno, farmaco normalizzato, dosaggio
+normalizzato). Copertura giornaliera e giorni consecutivi mancanti
+diventano semplici lookup sul dizionario.
+"""
+import re
+from collections import Counter
+from datetime import datetime, timedelta, time as dtime
+from pony.orm import db_session, select
+
+from model.assunzione import Assunzione
+
+
+def _normalize_string(s):
+    """Normalizza una stringa rimuovendo spazi e convertendo in lowercase"""
+    return re.sub(r"\s+", "", (s or "").strip().lower())
+
+def therapy_key(terapia):
+    """Chiave normalizzata (farmaco, dosaggio) di una terapia"""
+    return (_normalize_string(terapia.nome_farmaco),
+            _normalize_string(terapia.dosaggio_per_assunzione))
+
+def bucket_intakes(assunzioni):
+    """Conta le assunzioni per (giorno, farmaco normalizzato, dosaggio normalizzato)"""
+    buckets = Counter()
+    for a in assunzioni:
+        buckets[(a.data_ora.date(),
+                 _normalize_string(a.nome_farmaco),
+                 _normalize_string(a.dosaggio))] += 1
+    return buckets
+
+def intake_range_query(paziente, start_date, end_date):
+    """Query delle assunzioni del paziente tra start_date e end_date (inclusi)"""
+    start = datetime.combine(start_date, dtime.min)
+    end = datetime.combine(end_date, dtime.min) + timedelta(days=1)
+
+    return select(
+        a for a in Assunzione
+        if a.paziente == paziente and a.data_ora >= start and a.data_ora < end
+    )
+
+@db_session
+def load_intake_buckets(paziente, start_date, end_date):
+    """Raggruppa le assunzioni del paziente tra start_date e end_date (inclusi)"""
+    return bucket_intakes(intake_range_query(paziente, start_date, end_date))
+
+def daily_coverage(terapie, buckets, start_date, end_date):
+    """
+    Copertura giornaliera per ogni terapia nell'intervallo indicato.
+
+    Returns:
+        dict {terapia: {giorno: numero assunzioni}} con tutti i giorni
+        dell'intervallo in cui la terapia è attiva
+    """
+    coverage = {}
+    for terapia in terapie:
+        drug, dose = therapy_key(terapia)
+        t_start = max(start_date, terapia.data_inizio.date())
+        t_end = min(end_date, terapia.data_fine.date()) if terapia.data_fine else end_date
+
+        giorni = {}
+        day = t_start
+        while day <= t_end:
+            giorni[day] = buckets.get((day, drug, dose), 0)
+            day += timedelta(days=1)
+        coverage[terapia] = giorni
+    return coverage
+
+@db_session
+def get_daily_coverage(paziente, terapie, start_date, end_date):
+    """Copertura giornaliera delle terapie con una sola query sulle assunzioni"""
+    buckets = load_intake_buckets(paziente, start_date, end_date)
+    return daily_coverage(terapie, buckets, start_date, end_date)
+
+def missing_streak(terapia, buckets, today_date, max_days):
+    """Giorni consecutivi (a ritroso da oggi) senza assunzioni della terapia"""
+    drug, dose = therapy_key(terapia)
+    start_date = terapia.data_inizio.date()
+
+    streak = 0
+    for i in range(max_days):
+        day = today_date - timedelta(days=i)
+        if day < start_date:
+            break
+        if buckets.get((day, drug, dose), 0):
+            break
+        streak += 1
+    return streak
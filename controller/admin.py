@@ -187,12 +187,12 @@ def register_admin_callbacks(app):
                 return [dbc.Alert(f'Username "{username}" già esistente!', color='danger')] + [dash.no_update] * 10
             
             # Crea l'utente in base al ruolo
-            from werkzeug.security import generate_password_hash
+            from model.passwords import hash_password
             
             if role == 'medico':
                 medico = Medico(
                     username=username,
-                    password_hash=generate_password_hash(password),
+                    password_hash=hash_password(password),
                     name=name,
                     surname=surname,
                     telefono=telefono if telefono else '',
@@ -214,7 +214,7 @@ def register_admin_callbacks(app):
                 
                 paziente = Paziente(
                     username=username,
-                    password_hash=generate_password_hash(password),
+                    password_hash=hash_password(password),
                     name=name,
                     surname=surname,
                     telefono=telefono if telefono else '',
@@ -232,7 +232,7 @@ def register_admin_callbacks(app):
             else:  # nuovo admin
                 user = User(
                     username=username,
-                    password_hash=generate_password_hash(password),
+                    password_hash=hash_password(password),
                     name=name,
                     surname=surname,
                     telefono=telefono if telefono else '',
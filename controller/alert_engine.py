@@ -0,0 +1,449 @@
+# controller/alert_engine.py
+"""Motore alert incrementale per i medici.
+
+Gli alert non vengono più ricalcolati scorrendo tutto lo storico ad ogni
+poll: vengono salvati nella tabella Alert quando il paziente registra una
+glicemia o un'assunzione e quando una terapia cambia. La lettura per il
+medico diventa una query indicizzata su (paziente, data_ora).
+"""
+from datetime import datetime, timedelta
+from pony.orm import db_session, commit, select, desc, left_join
+
+from model.alert import Alert, AlertStato
+from model.paziente import Paziente
+from model.versione import bump_version
+from model.cache import LRUCache
+from controller.adherence import load_intake_buckets, missing_streak
+from controller.push import notify_patient_doctors
+from controller.severity import classify_severity, SEVERITY_NAMES
+
+
+# Giorni consecutivi senza assunzioni oltre i quali scatta l'alert
+MAX_MISSING_DAYS = 3
+
+# Alert restituiti per pagina al modal del medico
+ALERT_PAGE_SIZE = 20
+
+# Gravità in ordine di priorità (dalla più alta)
+SEVERITY_ORDER = ('danger', 'danger-orange', 'warning')
+
+# Risultati per medico in cache (LRU tra tutti i medici)
+DOCTOR_CACHE_SIZE = 256
+
+_doctor_cache = LRUCache(maxsize=DOCTOR_CACHE_SIZE)
+
+# ===============================
+# FUNZIONI DI SUPPORTO
+# ===============================
+
+def _fmt_ctx(misura):
+    """Formatta il contesto della misurazione glicemica"""
+    momento = (getattr(misura, "momento_pasto", None) or "").strip().lower()
+
+    if momento == "digiuno":
+        return "a digiuno"
+    elif momento == "prima_pasto":
+        return "prima del pasto"
+    elif momento == "dopo_pasto":
+        due_ore = getattr(misura, "due_ore_pasto", None)
+        if due_ore is True:
+            return "dopo il pasto (≥ 2 ore)"
+        elif due_ore is False:
+            return "dopo il pasto (< 2 ore)"
+        return "dopo il pasto"
+    return None
+
+def _is_anomalo_with_severity(valore, misura):
+    """
+    Determina la gravità di un valore glicemico anomalo.
+
+    Returns:
+        None: valore normale
+        'warning': anomalo lieve (giallo)
+        'danger-orange': anomalo moderato (arancione)
+        'danger': anomalo critico (rosso)
+    """
+    code = classify_severity([valore], [getattr(misura, "momento_pasto", None)])[0]
+    return SEVERITY_NAMES[code]
+
+def _patient_label(paziente):
+    """Etichetta 'Nome Cognome' del paziente"""
+    return f"{getattr(paziente, 'name', '')} {getattr(paziente, 'surname', '')}".strip()
+
+# ===============================
+# COSTRUZIONE ALERT
+# ===============================
+
+def _build_glicemia_alert(paziente, misura, severity=None):
+    """Crea il dizionario alert per una glicemia anomala (None se nella norma)"""
+    ts = getattr(misura, "data_ora", None)
+    val = getattr(misura, "valore", None)
+
+    # La gravità può arrivare già calcolata dalla classificazione batch
+    if severity is None:
+        severity = _is_anomalo_with_severity(val, misura)
+    if not severity:
+        return None
+
+    patient_label = _patient_label(paziente)
+    ctx_txt = _fmt_ctx(misura)
+    val_txt = f"{val:g} mg/dL" if val is not None else "valore non disponibile"
+    ts_txt = ts.strftime("%d/%m/%Y %H:%M") if ts else "data sconosciuta"
+    ctx_phrase = f" ({ctx_txt})" if ctx_txt else ""
+
+    # Determina etichetta gravità
+    if severity == 'danger':
+        severity_label = "critica"
+    elif severity == 'danger-orange':
+        severity_label = "preoccupante"
+    else:  # warning
+        severity_label = "anomala"
+
+    msg = (f"Il paziente {patient_label} ha rilevato una glicemia {severity_label} di "
+        f"{val_txt}{ctx_phrase} in data {ts_txt}.")
+
+    return {
+        "type": severity,
+        "patient_id": getattr(paziente, "username", None) or getattr(paziente, "id", None),
+        "patient_name": patient_label or getattr(paziente, "username", ""),
+        "value_mgdl": val,
+        "context": ctx_txt,
+        "timestamp": ts.isoformat() if ts else None,
+        "message": msg,
+        "severity_label": severity_label
+    }
+
+def build_glicemia_alerts(paziente, misure):
+    """
+    Alert delle misure anomale classificate in un solo passaggio
+    (misure: oggetti con valore, data_ora, momento_pasto e due_ore_pasto).
+
+    Returns:
+        lista di (misura, dizionario alert)
+    """
+    codes = classify_severity([m.valore for m in misure], [m.momento_pasto for m in misure])
+    alerts = []
+    for misura, code in zip(misure, codes):
+        alert = _build_glicemia_alert(paziente, misura, SEVERITY_NAMES[code]) if code else None
+        if alert:
+            alerts.append((misura, alert))
+    return alerts
+
+def _build_therapy_alerts(paziente, today_date, now):
+    """Calcola gli alert di mancata aderenza per le terapie attive del paziente"""
+    alerts = []
+    patient_label = _patient_label(paziente)
+
+    # Terapie attive oggi
+    terapie = [
+        t for t in paziente.terapies
+        if t.data_inizio.date() <= today_date and
+           (t.data_fine is None or t.data_fine.date() >= today_date)
+    ]
+    if not terapie:
+        return alerts
+
+    # Una sola query sulle assunzioni degli ultimi giorni, raggruppate per giorno/farmaco/dose
+    buckets = load_intake_buckets(paziente, today_date - timedelta(days=MAX_MISSING_DAYS - 1), today_date)
+
+    for terapia in terapie:
+        start_date = terapia.data_inizio.date()
+
+        # Calcola giorni di controllo mancanza
+        if terapia.data_fine:
+            planned_days = (terapia.data_fine.date() - start_date).days + 1
+        else:
+            planned_days = None
+
+        base_thresh = planned_days if planned_days in (1, 2) else MAX_MISSING_DAYS
+
+        # Conta giorni consecutivi senza assunzioni
+        missing_streak_days = missing_streak(terapia, buckets, today_date, base_thresh)
+
+        # Se mancano abbastanza giorni, crea alert
+        if missing_streak_days >= base_thresh:
+            giorni_txt = "giorno" if missing_streak_days == 1 else "giorni"
+            dosaggio = getattr(terapia, "dosaggio_per_assunzione", None)
+            dosaggio_txt = f" (dosaggio: {dosaggio})" if dosaggio else ""
+
+            start_str = start_date.strftime("%d/%m/%Y")
+            if terapia.data_fine:
+                end_str = terapia.data_fine.strftime("%d/%m/%Y")
+                periodo_label = f"dal {start_str} al {end_str}"
+                is_continuativa = False
+            else:
+                end_str = None
+                periodo_label = f"dal {start_str} (continuativa)"
+                is_continuativa = True
+
+            msg = (f"Il paziente {patient_label} non ha registrato assunzioni di "
+                f"{terapia.nome_farmaco}{dosaggio_txt} negli ultimi {missing_streak_days} {giorni_txt} consecutivi. "
+                f"Terapia {periodo_label}.")
+
+            alerts.append({
+                "type": "danger",
+                "patient_id": getattr(paziente, "username", None) or getattr(paziente, "id", None),
+                "patient_name": patient_label or getattr(paziente, "username", ""),
+                "drug_name": terapia.nome_farmaco,
+                "dosaggio_per_assunzione": dosaggio,
+                "streak_days": missing_streak_days,
+                "timestamp": now.isoformat(),
+                "message": msg,
+                "therapy_start": start_str,
+                "therapy_end": end_str,
+                "therapy_continuativa": is_continuativa
+            })
+
+    return alerts
+
+# ===============================
+# AGGIORNAMENTO TABELLA ALERT
+# ===============================
+
+def _get_or_create_stato(paziente):
+    """Restituisce lo stato del motore alert per il paziente"""
+    stato = paziente.alert_stato
+    if stato is None:
+        stato = AlertStato(paziente=paziente)
+    return stato
+
+@db_session
+def update_glicemia_alerts(misura):
+    """Registra l'alert per una nuova glicemia, se anomala"""
+    # La versione del paziente è già incrementata dall'hook di inserimento di Glicemia
+    paziente = misura.paziente
+    alert = _build_glicemia_alert(paziente, misura)
+    if alert:
+        Alert(
+            paziente=paziente,
+            categoria='glicemia',
+            tipo=alert["type"],
+            data_ora=misura.data_ora,
+            dati=alert
+        )
+    commit()
+
+    if alert:
+        notify_patient_doctors(paziente, {"categoria": "glicemia", "type": alert["type"]})
+    return alert
+
+def _therapy_signature(alerts):
+    """Firma degli alert di aderenza per capire se sono cambiati"""
+    return sorted((a.get("drug_name") or "", a.get("streak_days") or 0) for a in alerts)
+
+@db_session
+def update_therapy_alerts(paziente, today_date=None, notify=True):
+    """Ricalcola gli alert di aderenza del paziente per la giornata indicata"""
+    now = datetime.now()
+    today_date = today_date or now.date()
+
+    precedenti = select(a for a in Alert if a.paziente == paziente and a.categoria == 'terapia')
+    firma_precedente = _therapy_signature(a.dati for a in precedenti)
+    precedenti.delete(bulk=True)
+
+    alerts = _build_therapy_alerts(paziente, today_date, now)
+    for alert in alerts:
+        Alert(
+            paziente=paziente,
+            categoria='terapia',
+            tipo=alert["type"],
+            data_ora=now,
+            dati=alert
+        )
+
+    _get_or_create_stato(paziente).terapie_calcolate_il = today_date
+
+    cambiati = _therapy_signature(alerts) != firma_precedente
+    if cambiati:
+        bump_version(paziente)
+    commit()
+
+    # Push solo se la situazione del paziente è cambiata
+    if notify and cambiati:
+        notify_patient_doctors(paziente, {"categoria": "terapia", "count": len(alerts)})
+    return alerts
+
+@db_session
+def rebuild_patient_alerts(paziente, today_date=None, notify=False):
+    """Ricostruisce da zero tutti gli alert del paziente (backfill)"""
+    select(a for a in Alert if a.paziente == paziente and a.categoria == 'glicemia').delete(bulk=True)
+
+    # Classificazione dell'intero storico in un solo passaggio
+    misure = list(paziente.rilevazione)
+    codes = classify_severity([m.valore for m in misure], [m.momento_pasto for m in misure])
+
+    for misura, code in zip(misure, codes):
+        if not code:
+            continue
+        alert = _build_glicemia_alert(paziente, misura, SEVERITY_NAMES[code])
+        if alert:
+            Alert(
+                paziente=paziente,
+                categoria='glicemia',
+                tipo=alert["type"],
+                data_ora=misura.data_ora,
+                dati=alert
+            )
+    bump_version(paziente)
+
+    update_therapy_alerts(paziente, today_date, notify=notify)
+
+def _new_patients_query(medico):
+    """Pazienti del medico mai elaborati dal motore alert"""
+    return select(p for p in Paziente for d in p.doctors if d == medico and p.alert_stato is None)
+
+def _stale_patients_query(medico, today_date):
+    """Pazienti del medico con aderenza calcolata in un giorno precedente"""
+    return select(
+        p for p in Paziente for d in p.doctors
+        if d == medico and p.alert_stato is not None and
+           (p.alert_stato.terapie_calcolate_il is None or p.alert_stato.terapie_calcolate_il != today_date)
+    )
+
+@db_session
+def refresh_stale_alerts(medico, today_date=None):
+    """Aggiorna solo i pazienti mai calcolati o con aderenza calcolata in un giorno precedente"""
+    today_date = today_date or datetime.now().date()
+
+    # Pazienti mai passati dal motore: backfill completo dello storico
+    for paziente in _new_patients_query(medico)[:]:
+        rebuild_patient_alerts(paziente, today_date)
+
+    # L'aderenza dipende dal giorno corrente: ricalcolo una volta al giorno
+    for paziente in _stale_patients_query(medico, today_date)[:]:
+        # Ricalcolo richiesto dalla lettura stessa: nessun push di ritorno
+        update_therapy_alerts(paziente, today_date, notify=False)
+
+def encode_cursor(data_ora, alert_id):
+    """Cursore di paginazione 'iso|id' dell'ultimo alert restituito"""
+    return f"{data_ora.isoformat()}|{alert_id}"
+
+def decode_cursor(cursor):
+    """Decodifica il cursore (None se assente o non valido)"""
+    if not cursor:
+        return None
+    try:
+        ts, alert_id = cursor.rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(alert_id)
+    except (ValueError, AttributeError):
+        return None
+
+def _doctor_alerts_query(medico, since=None, until=None, severities=None):
+    """Query degli alert dei pazienti del medico con finestra temporale e gravità"""
+    # Join esplicito sulla tabella medico-paziente: l'indice (paziente, ...) di Alert viene usato
+    query = select(a for a in Alert for p in Paziente for d in p.doctors if a.paziente == p and d == medico)
+    if since is not None:
+        query = query.filter(lambda a: a.data_ora >= since)
+    if until is not None:
+        query = query.filter(lambda a: a.data_ora < until)
+    if severities:
+        tipi = list(severities)
+        query = query.filter(lambda a: a.tipo in tipi)
+    return query
+
+def _versions_query(medico):
+    """Versione dati di ogni paziente del medico"""
+    # LEFT JOIN: anche i pazienti senza scritture (versione assente) fanno parte dell'impronta
+    return left_join(
+        (p.username, v.valore) for p in Paziente for d in p.doctors for v in p.versione_dati if d == medico
+    )
+
+def _doctor_fingerprint(medico, today_date):
+    """Pazienti del medico con la loro versione dati, più il giorno corrente"""
+    return today_date, frozenset(_versions_query(medico)[:])
+
+def _cached(medico, key, today_date, compute):
+    """Risultato dalla cache se nessun paziente del medico è cambiato, altrimenti ricalcola"""
+    key = (medico.username,) + key
+    fingerprint = _doctor_fingerprint(medico, today_date)
+
+    hit = _doctor_cache.get(key)
+    if hit is not None and hit[0] == fingerprint:
+        return hit[1]
+
+    result = compute()
+    _doctor_cache.set(key, (fingerprint, result))
+    return result
+
+@db_session
+def query_doctor_alerts(medico, since=None, until=None, severities=None,
+                        limit=ALERT_PAGE_SIZE, cursor=None, today_date=None):
+    """
+    Pagina di alert del medico ordinata dal database (più recenti prima).
+
+    Returns:
+        tuple (lista alert, cursore della pagina successiva o None)
+    """
+    if not medico:
+        return [], None
+
+    today_date = today_date or datetime.now().date()
+
+    # Il ricalcolo degli stati scaduti serve solo alla prima pagina
+    if cursor is None:
+        refresh_stale_alerts(medico, today_date)
+
+    def compute():
+        query = _doctor_alerts_query(medico, since, until, severities)
+
+        decoded = decode_cursor(cursor)
+        if decoded:
+            c_ts, c_id = decoded
+            query = query.filter(lambda a: a.data_ora < c_ts or (a.data_ora == c_ts and a.id < c_id))
+
+        # Un elemento in più per sapere se esiste una pagina successiva
+        rows = query.order_by(lambda a: (desc(a.data_ora), desc(a.id)))[:limit + 1]
+        page = rows[:limit]
+
+        next_cursor = None
+        if len(rows) > limit:
+            last = page[-1]
+            next_cursor = encode_cursor(last.data_ora, last.id)
+
+        return [dict(a.dati) for a in page], next_cursor
+
+    key = ("page", since, until, tuple(sorted(severities)) if severities else None, limit, cursor)
+    return _cached(medico, key, today_date, compute)
+
+@db_session
+def doctor_alert_level(medico, since=None, today_date=None):
+    """Gravità più alta tra gli alert del medico (None se nessun alert)"""
+    if not medico:
+        return None
+
+    def compute():
+        # Una query EXISTS per gravità, interrotta alla prima trovata
+        for tipo in SEVERITY_ORDER:
+            if _doctor_alerts_query(medico, since=since, severities=[tipo]).exists():
+                return tipo
+        return None
+
+    return _cached(medico, ("level", since), today_date or datetime.now().date(), compute)
+
+# ===============================
+# HOOK DI SCRITTURA
+# ===============================
+
+def on_glicemia_saved(misura):
+    """Da chiamare dopo il salvataggio di una glicemia"""
+    try:
+        update_glicemia_alerts(misura)
+    except Exception as e:
+        print(f"Errore aggiornamento alert glicemia: {e}")
+
+def on_assunzione_saved(assunzione):
+    """Da chiamare dopo il salvataggio di un'assunzione"""
+    try:
+        update_therapy_alerts(assunzione.paziente)
+    except Exception as e:
+        print(f"Errore aggiornamento alert assunzione: {e}")
+
+def on_terapia_changed(*pazienti):
+    """Da chiamare dopo creazione, modifica o eliminazione di una terapia"""
+    for paziente in pazienti:
+        if paziente is None:
+            continue
+        try:
+            update_therapy_alerts(paziente)
+        except Exception as e:
+            print(f"Errore aggiornamento alert terapia: {e}")
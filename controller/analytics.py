@@ -0,0 +1,196 @@
+# controller/analytics.py
+"""Serie glicemiche condivise dai grafici di paziente e medico.
+
+Le medie arrivano dagli aggregati pre-calcolati (GlicemiaRollup): il costo
+dipende dal numero di periodi mostrati e non dalla lunghezza dello storico.
+Le funzioni assemble_* lavorano su dizionari {inizio: media} e non toccano
+il database, così il benchmark (benchmarks/bench_analytics.py) le misura
+sugli stessi dati prodotti dalle query.
+"""
+from datetime import date, datetime, timedelta
+import math
+
+from model.database import db
+from model.rollup import get_rollup_means, period_start, period_end
+# Intervallo target per il time-in-range (mg/dL), lo stesso delle metriche del paziente
+from model.metriche import TIR_MIN, TIR_MAX
+from controller.severity import severity_case_sql, DANGER
+
+DEFAULT_WEEKS_WINDOW = 8
+
+# Finestre del menu "Finestra settimane": il grafico settimanale arriva al browser
+# una sola volta con la finestra più ampia e viene ritagliato lato client
+WEEKS_WINDOW_OPTIONS = (4, 8)
+MAX_WEEKS_WINDOW = max(WEEKS_WINDOW_OPTIONS)
+WEEKLY_TRACE_NAME = "Media settimanale (ultime {n} sett.)"
+
+DOW_LABELS = ["Lunedì", "Martedì", "Mercoledì", "Giovedì", "Venerdì", "Sabato", "Domenica"]
+MONTH_LABELS = ["Gen", "Feb", "Mar", "Apr", "Mag", "Giu",
+                "Lug", "Ago", "Set", "Ott", "Nov", "Dic"]
+
+
+# ===============================
+# ASSEMBLAGGIO SERIE
+# ===============================
+
+def weeks_window_start(today, weeks_window):
+    """Lunedì della settimana che contiene l'inizio della finestra"""
+    return period_start('settimana', today - timedelta(weeks=int(weeks_window)))
+
+def assemble_weekday(means, today):
+    """Medie lun→dom della settimana corrente (None per i giorni senza misure)"""
+    start_week = period_start('settimana', today)
+    return [means.get(start_week + timedelta(days=i)) for i in range(7)]
+
+def assemble_weekly(means):
+    """
+    Settimane dalla prima all'ultima con dati.
+
+    Returns:
+        (lista lunedì, lista medie) con None per le settimane senza misure
+    """
+    if not means:
+        return [], []
+
+    first, last = min(means), max(means)
+    starts = [first + timedelta(weeks=i) for i in range((last - first).days // 7 + 1)]
+    return starts, [means.get(w) for w in starts]
+
+def assemble_monthly(means, year):
+    """Medie dei 12 mesi dell'anno (None per i mesi senza misure)"""
+    return [means.get(date(year, m, 1)) for m in range(1, 13)]
+
+
+# ===============================
+# SERIE DEL PAZIENTE
+# ===============================
+
+def weekly_window_cutoffs(starts, values, today, windows=WEEKS_WINDOW_OPTIONS):
+    """
+    Per ogni finestra, indice della prima settimana da mostrare:
+    la prima con dati dentro la finestra (len(starts) se nessuna).
+    """
+    cutoffs = {}
+    for weeks in windows:
+        inizio = weeks_window_start(today, weeks)
+        cutoffs[str(weeks)] = next(
+            (i for i, (s, v) in enumerate(zip(starts, values)) if s >= inizio and v is not None),
+            len(starts)
+        )
+    return cutoffs
+
+def weekly_store(figure, starts=(), values=(), today=None):
+    """
+    Dati dello store del grafico settimanale (ritagliato da assets/weekly_window.js).
+
+    Args:
+        figure: figura della finestra più ampia (go.Figure o dict)
+        starts, values: serie settimanale usata nella figura
+        today: giorno corrente (None = figura senza finestre, es. grafico vuoto)
+    """
+    if hasattr(figure, "to_dict"):
+        figure = figure.to_dict()
+    return {
+        "figure": figure,
+        "cutoffs": weekly_window_cutoffs(starts, values, today) if today else {},
+        "size": len(starts),
+        "trace_name": WEEKLY_TRACE_NAME,
+    }
+
+def weekday_means(paziente_username, today):
+    """Media di ogni giorno della settimana corrente"""
+    start_week = period_start('settimana', today)
+    means = get_rollup_means(paziente_username, 'giorno', start_week,
+                             period_end('settimana', start_week))
+    return assemble_weekday(means, today)
+
+def weekly_means(paziente_username, weeks_window, today):
+    """Medie settimanali delle ultime weeks_window settimane"""
+    means = get_rollup_means(paziente_username, 'settimana',
+                             weeks_window_start(today, weeks_window), today + timedelta(days=1))
+    return assemble_weekly(means)
+
+def monthly_means(paziente_username, year):
+    """Medie mensili dell'anno indicato"""
+    means = get_rollup_means(paziente_username, 'mese', date(year, 1, 1), date(year + 1, 1, 1))
+    return assemble_monthly(means, year)
+
+def glucose_series(paziente_username, weeks_window=DEFAULT_WEEKS_WINDOW, today=None):
+    """
+    Le tre serie dei grafici glicemici per un paziente.
+
+    Returns:
+        dict con 'giorni' (7 medie), 'settimane' (lunedì, medie) e 'mesi' (12 medie)
+    """
+    today = today or datetime.now().date()
+    return {
+        "giorni": weekday_means(paziente_username, today),
+        "settimane": weekly_means(paziente_username, weeks_window, today),
+        "mesi": monthly_means(paziente_username, today.year),
+    }
+
+
+# ===============================
+# PANORAMICA DEI PAZIENTI DEL MEDICO
+# ===============================
+
+def panel_stats_sql():
+    """
+    Statistiche di tutti i pazienti di un medico in una sola GROUP BY
+    (parametri $medico e $since). Le ultime misure usano la chiave (paziente, data_ora).
+    """
+    return (
+        'SELECT u.username, u.name, u.surname, '
+        'COUNT(g.valore), SUM(g.valore), SUM(g.valore * g.valore), '
+        f'SUM(CASE WHEN g.valore BETWEEN {TIR_MIN} AND {TIR_MAX} THEN 1 ELSE 0 END), '
+        f'SUM(CASE WHEN ({severity_case_sql("g.valore", "g.momento_pasto")}) = {DANGER} THEN 1 ELSE 0 END), '
+        '(SELECT l.data_ora FROM "Glicemia" l WHERE l.paziente = mp.paziente '
+        'ORDER BY l.data_ora DESC LIMIT 1), '
+        '(SELECT l.valore FROM "Glicemia" l WHERE l.paziente = mp.paziente '
+        'ORDER BY l.data_ora DESC LIMIT 1) '
+        'FROM "Medico_Paziente" mp '
+        'JOIN "User" u ON u.username = mp.paziente '
+        'LEFT JOIN "Glicemia" g ON g.paziente = mp.paziente AND g.data_ora >= $since '
+        'WHERE mp.medico = $medico '
+        'GROUP BY mp.paziente'
+    )
+
+def _panel_row(username, name, surname, n, somma, somma_q, in_range, critiche, ultima_data, ultimo_valore):
+    """Riga della panoramica con media, CV e TIR calcolati dalle somme"""
+    media = cv = tir = None
+    if n:
+        media = somma / n
+        varianza = max(somma_q / n - media * media, 0.0)
+        cv = math.sqrt(varianza) / media * 100 if media else None
+        tir = in_range / n * 100
+
+    if isinstance(ultima_data, str):
+        ultima_data = datetime.fromisoformat(ultima_data)
+
+    return {
+        "username": username,
+        "nome": f"{surname or ''} {name or ''}".strip(),
+        "misure": n,
+        "media": media,
+        "cv": cv,
+        "tir": tir,
+        "critiche": critiche or 0,
+        "ultima_data": ultima_data,
+        "ultimo_valore": ultimo_valore,
+    }
+
+def panel_stats(medico_username, days=30, today=None):
+    """
+    Panoramica glicemica di tutti i pazienti seguiti dal medico negli ultimi days giorni.
+
+    Returns:
+        lista di dict (username, nome, misure, media, cv, tir, critiche,
+        ultima_data, ultimo_valore): prima chi ha più misure critiche, poi TIR più basso
+    """
+    today = today or datetime.now().date()
+    since = datetime.combine(today - timedelta(days=int(days)), datetime.min.time())
+
+    rows = db.select(panel_stats_sql(), {"medico": medico_username, "since": since})
+    stats = [_panel_row(*row) for row in rows]
+    stats.sort(key=lambda r: (-r["critiche"], r["tir"] if r["tir"] is not None else math.inf, r["nome"]))
+    return stats
@@ -7,6 +7,7 @@ from flask_login import login_user, logout_user, current_user
 from pony.orm import db_session
 from dash import html, dcc
 from model.operations import validate_user, get_user_by_username
+from model.passwords import PasswordPoolBusy
 from controller.admin import register_admin_callbacks
 from controller.patient import register_patient_callbacks
 from controller.doctor import register_doctor_callbacks
@@ -26,12 +27,15 @@ def register_auth_callbacks(app):
          State('login-password', 'value')],
         prevent_initial_call=True
     )
-    @db_session
     def login_callback(n_clicks, username, password):
         if not n_clicks or not username or not password:
             return '', dash.no_update
         
-        user = validate_user(username, password)
+        # Nessuna db_session qui: la verifica della password non deve tenerla aperta
+        try:
+            user = validate_user(username, password)
+        except PasswordPoolBusy:
+            return dbc.Alert('Troppi accessi in corso, riprova tra qualche secondo', color='warning'), dash.no_update
         if user:
             login_user(user)
             return dbc.Alert('Login effettuato!', color='success'), '/dashboard'
@@ -1,13 +1,13 @@
 # controller/doctor.py
 """Controller per la gestione dei medici"""
 import dash
-from dash.dependencies import Input, Output, State
+from dash.dependencies import Input, Output, State, ClientsideFunction
 import dash_bootstrap_components as dbc
+from flask import g, has_request_context
 from flask_login import current_user
 from dash import html
 from datetime import datetime, timedelta
 from pony.orm import db_session, commit, select
-import pandas as pd
 import plotly.graph_objects as go
 from datetime import datetime as _dt
 import json
@@ -18,6 +18,15 @@ from model.medico import Medico
 from model.paziente import Paziente
 from model.glicemia import Glicemia
 from model.assunzione import Assunzione
+from model.metriche import patient_metrics
+from controller.analytics import (
+    weekday_means, weekly_means, monthly_means, panel_stats, weekly_store,
+    DOW_LABELS, MONTH_LABELS, MAX_WEEKS_WINDOW, WEEKLY_TRACE_NAME
+)
+from controller.figure_cache import cached_figure
+from controller.figures import new_figure, empty_figure
+from controller.timeline import load_timeline, create_timeline_figure, relayout_range, EMPTY_TIMELINE
+from controller.alert_engine import query_doctor_alerts, doctor_alert_level, on_terapia_changed
 from view.doctor import *
 # =============================================================================
 # FUNZIONE CORE per salvataggio terapia (testabile)
@@ -77,6 +86,7 @@ def save_terapia_core(
             note=note.strip() if note else ''
         )
         commit()
+        on_terapia_changed(paziente)
 
         return get_terapia_success_message(
             f"{paziente.name} {paziente.surname}",
@@ -125,99 +135,27 @@ def save_patient_data_modifications_core(
 # FUNZIONI DI SUPPORTO GLOBALI
 # ===============================
 
-def _normalize_string(s):
-    """Normalizza una stringa rimuovendo spazi e convertendo in lowercase"""
-    return re.sub(r"\s+", "", (s or "").strip().lower())
-
-def _same_drug(a_nome, t_nome):
-    """Confronta due nomi di farmaco normalizzati"""
-    return _normalize_string(a_nome) == _normalize_string(t_nome)
+# Helper per ottenere il medico corrente
+def get_current_medico_username():
+    """Username del medico loggato, risolto una sola volta per richiesta (None se non è un medico)"""
+    if has_request_context() and "current_medico_username" in g:
+        return g.current_medico_username
 
-def _same_dose(a_dose, t_dose):
-    """Confronta due dosaggi normalizzati"""
-    return _normalize_string(a_dose) == _normalize_string(t_dose)
+    username = None
+    if current_user and current_user.is_authenticated and getattr(current_user, "role", None) == 'Medico':
+        username = current_user.username
 
-def _matches_therapy(assunzione, terapia):
-    """Verifica se un'assunzione corrisponde a una terapia"""
-    if getattr(assunzione, "terapia", None) is not None:
-        return assunzione.terapia == terapia
-    
-    return (_same_drug(assunzione.nome_farmaco, terapia.nome_farmaco) and
-            _same_dose(assunzione.dosaggio, terapia.dosaggio_per_assunzione))
+    if has_request_context():
+        g.current_medico_username = username
+    return username
 
-def _fmt_ctx(misura):
-    """Formatta il contesto della misurazione glicemica"""
-    momento = (getattr(misura, "momento_pasto", None) or "").strip().lower()
-    
-    if momento == "digiuno":
-        return "a digiuno"
-    elif momento == "prima_pasto":
-        return "prima del pasto"
-    elif momento == "dopo_pasto":
-        due_ore = getattr(misura, "due_ore_pasto", None)
-        if due_ore is True:
-            return "dopo il pasto (≥ 2 ore)"
-        elif due_ore is False:
-            return "dopo il pasto (< 2 ore)"
-        return "dopo il pasto"
-    return None
-
-def _is_anomalo_with_severity(valore, misura):
-    """
-    Determina la gravità di un valore glicemico anomalo.
-    
-    Returns:
-        None: valore normale
-        'warning': anomalo lieve (giallo)
-        'danger-orange': anomalo moderato (arancione)
-        'danger': anomalo critico (rosso)
-    """
-    if valore is None:
-        return None
-
-    try:
-        v = float(valore)
-    except (ValueError, TypeError):
-        return None
-
-    momento = (getattr(misura, "momento_pasto", None) or "").strip().lower()
-    
-    # Valori critici (ROSSI)
-    if v < 54 or v > 250:
-        return 'danger'
-    
-    if momento in ("digiuno", "prima_pasto") and v > 200:
-        return 'danger'
-    
-    # Valori moderati (ARANCIONI)
-    if 54 <= v <= 69:
-        return 'danger-orange'
-    
-    if momento in ("digiuno", "prima_pasto") and 151 <= v <= 200:
-        return 'danger-orange'
-    elif momento == "dopo_pasto" and 201 <= v <= 250:
-        return 'danger-orange'
-    
-    
-    # Valori lievi (GIALLI)
-    if 70 <= v <= 90:
-        return 'warning'
-    
-    if momento in ("digiuno", "prima_pasto") and 131 <= v <= 150:
-        return 'warning'
-    elif momento == "dopo_pasto" and 181 <= v <= 200:
-        return 'warning'
-    
-    
-    return None
-
-def _is_anomalo(valore, misura):
-    """Verifica se un valore glicemico è anomalo (compatibilità)"""
-    return _is_anomalo_with_severity(valore, misura) is not None
-# Helper per ottenere il medico corrente
 @db_session
 def get_current_medico():
-    return Medico.get(name=current_user.name, surname=current_user.surname)
+    """Medico loggato, cercato per chiave primaria (senza query se già in sessione)"""
+    username = get_current_medico_username()
+    if not username:
+        return None
+    return Medico.get(username=username)
 # ===============================
     # VALIDATORI 
     # ===============================
@@ -633,6 +571,7 @@ def register_doctor_callbacks(app):
                 terapia.modificata = f"Dr. {medico.name} {medico.surname}"
 
             commit()
+            on_terapia_changed(paziente_orig, *([paziente_nuovo] if paziente_nuovo != paziente_orig else []))
 
             return get_terapia_modify_success_message(
                 f"{paziente_nuovo.name} {paziente_nuovo.surname}",
@@ -703,6 +642,7 @@ def register_doctor_callbacks(app):
             # Elimina terapia
             terapia.delete()
             commit()
+            on_terapia_changed(paziente)
 
             return get_terapia_delete_success_message(paziente_nome, farmaco_eliminato, dosaggio_eliminato)
 
@@ -766,7 +706,7 @@ def register_doctor_callbacks(app):
                 return get_error_message("Paziente non trovato!")
 
             can_modify = medico in paziente.doctors
-            return get_patient_data_display(paziente, can_modify)
+            return get_patient_data_display(paziente, can_modify, patient_metrics(paziente.username))
 
         except Exception as e:
             return get_error_message(f"Errore: {str(e)}")
@@ -1053,7 +993,21 @@ def register_doctor_callbacks(app):
     def show_andamenti_glicemici_medico(n_clicks):
         if not n_clicks:
             return dash.no_update
-        return get_andamento_glicemico_medico_view()
+        return get_andamento_glicemico_medico_view(current_user.username)
+
+    @app.callback(
+        Output("panel-stats-medico", "children"),
+        Input("panel-window-medico", "value"),
+        prevent_initial_call=False
+    )
+    @db_session
+    def render_panel_stats_medico(days):
+        """Panoramica di tutti i pazienti del medico calcolata con una sola query"""
+        username = get_current_medico_username()
+        if not username:
+            return get_error_message("Errore: medico non trovato!")
+
+        return create_panel_stats_table(panel_stats(username, days or 30))
 
     @app.callback(
         Output("doctor-patient-selector", "options"),
@@ -1077,157 +1031,150 @@ def register_doctor_callbacks(app):
 
     @app.callback(
         Output("doctor-week-dow", "figure"),
-        Output("doctor-weekly-avg", "figure"),
+        Output("doctor-weekly-store", "data"),
         Output("doctor-monthly-avg", "figure"),
         Input("doctor-patient-selector", "value"),
-        Input("weeks-window-medico", "value"),
         prevent_initial_call=True
     )
     @db_session
-    def render_week_month_charts_medico(selected_username, weeks_window):
+    def render_week_month_charts_medico(selected_username):
         """Genera i grafici settimanali e mensili per il paziente selezionato"""
         
         def empty_fig(msg):
             """Crea un grafico vuoto con messaggio"""
-            f = go.Figure()
-            f.update_yaxes(range=[0, 300], title="mg/dL")
-            f.add_annotation(text=msg, xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
-            f.update_layout(
-                height=360, margin=dict(l=10, r=10, t=30, b=10),
-                plot_bgcolor="white", paper_bgcolor="white", hovermode="x unified"
-            )
-            f.update_xaxes(showline=True, linecolor="black", linewidth=1)
-            f.update_yaxes(showline=True, linecolor="black", linewidth=1)
-            return f
+            return empty_figure(msg, hovermode="x unified")
 
         if not selected_username:
             ef = empty_fig("Seleziona un paziente")
-            return ef, ef, ef
+            return ef, weekly_store(ef), ef
 
         # Carica dati paziente
         paziente = Paziente.get(username=selected_username)
-        misurazioni = list(paziente.rilevazione) if paziente else []
-
-        if not misurazioni:
+        # Gli aggregati esistono solo se c'è almeno una misurazione
+        if not paziente or paziente.rollups.is_empty():
             ef = empty_fig("Nessuna glicemia registrata")
-            return ef, ef, ef
-
-        # Crea DataFrame
-        df = pd.DataFrame(
-            [(m.data_ora, m.valore) for m in misurazioni],
-            columns=["data", "valore"]
-        ).set_index("data").sort_index()
-
-        # GRAFICO A: Giorni settimana (settimana corrente)
-        today = _dt.now()
-        start_week = (today - timedelta(days=today.weekday())).replace(
-            hour=0, minute=0, second=0, microsecond=0
-        )
-        end_week = start_week + timedelta(days=7)
+            return ef, weekly_store(ef), ef
 
-        week_df = df.loc[(df.index >= start_week) & (df.index < end_week)].copy()
+        today = _dt.now().date()
+        weeks_window = MAX_WEEKS_WINDOW
 
-        fig_dow = go.Figure()
-        fig_dow.update_yaxes(range=[0, 300], title="mg/dL")
+        def build_dow():
+            """GRAFICO A: Giorni settimana (settimana corrente)"""
+            daily_mean = weekday_means(selected_username, today)
 
-        dow_order = ["Lunedì", "Martedì", "Mercoledì", "Giovedì", "Venerdì", "Sabato", "Domenica"]
-        fig_dow.update_xaxes(categoryorder="array", categoryarray=dow_order, title="Giorno della settimana")
+            fig_dow = new_figure(hovermode="x unified")
+            fig_dow.update_yaxes(range=[0, 300], title="mg/dL")
 
-        if not week_df.empty:
-            # Mappa numeri giorni settimana a nomi italiani
-            week_df["giorno_label"] = week_df.index.dayofweek.map({
-                0: "Lunedì", 1: "Martedì", 2: "Mercoledì",
-                3: "Giovedì", 4: "Venerdì", 5: "Sabato", 6: "Domenica"
-            })
-            daily_mean = week_df.groupby("giorno_label")["valore"].mean().reindex(dow_order)
+            dow_order = DOW_LABELS
+            fig_dow.update_xaxes(categoryorder="array", categoryarray=dow_order, title="Giorno della settimana")
 
-            fig_dow.add_trace(go.Scatter(
-                x=dow_order, y=daily_mean.values,
-                mode="lines+markers", name="Media giorno",
-                line=dict(color="#F58518", width=2), connectgaps=True
-            ))
+            if any(v is not None for v in daily_mean):
+                fig_dow.add_trace(go.Scatter(
+                    x=dow_order, y=daily_mean,
+                    mode="lines+markers", name="Media giorno",
+                    line=dict(color="#F58518", width=2), connectgaps=True
+                ))
 
-            add_glucose_reference_lines(fig_dow, dow_order)
-        else:
-            fig_dow.add_annotation(
-                text="Nessun dato nella settimana corrente",
-                xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False
-            )
+                add_glucose_reference_lines(fig_dow, dow_order)
+            else:
+                fig_dow.add_annotation(
+                    text="Nessun dato nella settimana corrente",
+                    xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False
+                )
+            return fig_dow
+
+        def build_week():
+            """GRAFICO B: Media settimanale (finestra più ampia, ritagliata nel browser)"""
+            weeks, weekly_mean = weekly_means(selected_username, weeks_window, today)
+
+            fig_week = new_figure(hovermode="x unified")
+            fig_week.update_yaxes(range=[0, 300], title="mg/dL")
+
+            if weeks:
+                # Crea etichette settimane
+                x_labels = [
+                    (ts.strftime("%d/%m") + "→" + (ts + timedelta(days=6)).strftime("%d/%m"))
+                    for ts in weeks
+                ]
+
+                fig_week.add_trace(go.Scatter(
+                    x=x_labels, y=weekly_mean,
+                    mode="lines+markers",
+                    name=WEEKLY_TRACE_NAME.format(n=weeks_window),
+                    line=dict(color="#4C78A8", width=2), connectgaps=True
+                ))
+
+                add_glucose_reference_lines(fig_week, x_labels)
+            else:
+                fig_week.add_annotation(
+                    text="Nessuna settimana con dati nel periodo",
+                    xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False
+                )
 
-        # GRAFICO B: Media settimanale
-        weeks_window = weeks_window or 8
-        since = _dt.now() - timedelta(weeks=int(weeks_window))
-        recent = df.loc[df.index >= since].copy()
-        weekly_mean = recent["valore"].resample("W-MON", label="left", closed="left").mean()
-        
-        fig_week = go.Figure()
-        fig_week.update_yaxes(range=[0, 300], title="mg/dL")
-
-        if not weekly_mean.empty:
-            # Crea etichette settimane
-            x_labels = [
-                (ts.strftime("%d/%m") + "→" + (ts + timedelta(days=6)).strftime("%d/%m"))
-                for ts in weekly_mean.index
-            ]
-
-            fig_week.add_trace(go.Scatter(
-                x=x_labels, y=weekly_mean.values,
-                mode="lines+markers",
-                name=f"Media settimanale (ultime {weeks_window} sett.)",
+            fig_week.update_layout(xaxis_title="Settimana (Lun→Dom)")
+            return weekly_store(fig_week, weeks, weekly_mean, today)
+
+        def build_month():
+            """GRAFICO C: Media mensile (anno corrente)"""
+            year = today.year
+            monthly_mean = monthly_means(selected_username, year)
+
+            x_m = MONTH_LABELS
+
+            fig_month = new_figure(hovermode="x unified")
+            fig_month.update_yaxes(range=[0, 300], title="mg/dL")
+
+            fig_month.add_trace(go.Scatter(
+                x=x_m, y=monthly_mean,
+                mode="lines+markers", name=f"Media mensile {year}",
                 line=dict(color="#4C78A8", width=2), connectgaps=True
             ))
 
-            add_glucose_reference_lines(fig_week, x_labels)
-        else:
-            fig_week.add_annotation(
-                text="Nessuna settimana con dati nel periodo",
-                xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False
-            )
-        
-        fig_week.update_layout(xaxis_title="Settimana (Lun→Dom)")
-
-        # GRAFICO C: Media mensile (anno corrente)
-        year = _dt.now().year
-        year_start = pd.Timestamp(year=year, month=1, day=1)
-        idx_months = pd.date_range(start=year_start, periods=12, freq="MS")
-        df_year = df.loc[
-            (df.index >= year_start) & 
-            (df.index < year_start + pd.offsets.YearEnd(0) + pd.Timedelta(days=1))
-        ].copy()
-        monthly_mean = df_year["valore"].resample("MS").mean().reindex(idx_months)
-
-        mesi_it = ["Gen", "Feb", "Mar", "Apr", "Mag", "Giu",
-                   "Lug", "Ago", "Set", "Ott", "Nov", "Dic"]
-        x_m = [mesi_it[ts.month - 1] for ts in monthly_mean.index]
-
-        fig_month = go.Figure()
-        fig_month.update_yaxes(range=[0, 300], title="mg/dL")
-
-        fig_month.add_trace(go.Scatter(
-            x=x_m, y=monthly_mean.values,
-            mode="lines+markers", name=f"Media mensile {year}",
-            line=dict(color="#4C78A8", width=2), connectgaps=True
-        ))
+            if all(v is None for v in monthly_mean):
+                fig_month.add_annotation(
+                    text="Nessun dato per l'anno selezionato",
+                    xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False
+                )
 
-        if monthly_mean.isna().all():
-            fig_month.add_annotation(
-                text="Nessun dato per l'anno selezionato",
-                xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False
-            )
+            add_glucose_reference_lines(fig_month, x_m)
+            fig_month.update_layout(xaxis_title=f"Anno ({year})")
+            return fig_month
 
-        add_glucose_reference_lines(fig_month, x_m)
-        fig_month.update_layout(xaxis_title=f"Anno ({year})")
+        # Figure già serializzate se i dati del paziente non sono cambiati
+        return (
+            cached_figure(paziente, "medico-giorni", None, today, build_dow),
+            cached_figure(paziente, "medico-settimane", weeks_window, today, build_week),
+            cached_figure(paziente, "medico-mesi", None, today, build_month),
+        )
 
-        # Applica stile comune
-        for fig in (fig_dow, fig_week, fig_month):
-            fig.update_layout(
-                height=360, margin=dict(l=10, r=10, t=30, b=10),
-                plot_bgcolor="white", paper_bgcolor="white", hovermode="x unified"
-            )
-            fig.update_xaxes(showline=True, linecolor="black", linewidth=1)
-            fig.update_yaxes(showline=True, linecolor="black", linewidth=1)
+    # La finestra settimane ritaglia nel browser la serie già caricata
+    app.clientside_callback(
+        ClientsideFunction(namespace="charts", function_name="sliceWeeks"),
+        Output("doctor-weekly-avg", "figure"),
+        Input("doctor-weekly-store", "data"),
+        Input("weeks-window-medico", "value")
+    )
+
+    @app.callback(
+        Output("doctor-timeline", "figure"),
+        Input("doctor-patient-selector", "value"),
+        Input("doctor-timeline", "relayoutData"),
+        prevent_initial_call=True
+    )
+    @db_session
+    def render_timeline_medico(selected_username, relayout):
+        """Timeline delle misurazioni del paziente selezionato (zoom = più dettaglio)"""
+        if not selected_username:
+            return create_timeline_figure(EMPTY_TIMELINE, empty_message="Seleziona un paziente")
 
-        return fig_dow, fig_week, fig_month
+        # Nuovo paziente: si riparte dallo storico completo
+        ctx = dash.callback_context
+        if ctx.triggered and ctx.triggered[0]['prop_id'].startswith("doctor-patient-selector"):
+            relayout = None
+
+        start, end = relayout_range(relayout)
+        return create_timeline_figure(load_timeline(selected_username, start, end), start, end,
+                                      uirevision=selected_username)
 
     def add_glucose_reference_lines(fig, x_labels):
         """Aggiunge linee di riferimento per valori glicemici normali"""
@@ -1256,176 +1203,98 @@ def register_doctor_callbacks(app):
     # CALLBACK SISTEMA NOTIFICHE
     # ===============================
 
-    @db_session
-    def build_alerts_for_doctor():
-        """Genera lista completa di alert per il medico corrente"""
-        medico = get_current_medico()
+    def _alerts_since(period):
+        """Inizio della finestra temporale scelta nel modal (None = tutto lo storico)"""
+        try:
+            giorni = int(period)
+        except (TypeError, ValueError):
+            return None
+        # Allineato alla mezzanotte: stessa chiave di cache per tutta la giornata
+        inizio = datetime.now().date() - timedelta(days=giorni)
+        return datetime(inizio.year, inizio.month, inizio.day)
+
+    def load_alerts_page(medico, period, severities, cursor=None):
+        """Legge una pagina di alert del medico già calcolati dal motore"""
         if not medico:
-            return []
+            return [], None
 
-        alerts = []
-        today_date = datetime.now().date()
-        now_iso = datetime.now().isoformat()
-    
-        pazienti = list(medico.patients) if hasattr(medico, "patients") else []
-    
-        for paziente in pazienti:
-            patient_label = f"{getattr(paziente, 'name', '')} {getattr(paziente, 'surname', '')}".strip()
+        return query_doctor_alerts(
+            medico,
+            since=_alerts_since(period),
+            severities=severities,
+            cursor=cursor
+        )
 
-            # Alert aderenza terapie
-            for terapia in list(paziente.terapies):
-                start_date = terapia.data_inizio.date()
-                end_date = terapia.data_fine.date() if terapia.data_fine else None
-            
-                # Salta terapie non ancora iniziate o già finite
-                if start_date > today_date:
-                    continue
-                if end_date is not None and end_date < today_date:
-                    continue
-            
-                # Calcola giorni di controllo mancanza
-                if terapia.data_fine:
-                    planned_days = (terapia.data_fine.date() - start_date).days + 1
-                else:
-                    planned_days = None
-                    
-                base_thresh = planned_days if planned_days in (1, 2) else 3
-
-                # Conta giorni consecutivi senza assunzioni
-                missing_streak = 0
-                for i in range(base_thresh):
-                    day = today_date - timedelta(days=i)
-                    if day < start_date:
-                        break
-
-                    day_start = datetime.combine(day, datetime.min.time())
-                    next_day = day_start + timedelta(days=1)
-
-                    # Verifica se c'è un'assunzione corrispondente in quel giorno
-                    has_matching_intake = any(
-                        (day_start <= a.data_ora < next_day) and _matches_therapy(a, terapia)
-                        for a in getattr(paziente, "assunzione", [])
-                    )
-
-                    if has_matching_intake:
-                        break
-                    missing_streak += 1
-
-                # Se mancano abbastanza giorni, crea alert
-                if missing_streak >= base_thresh:
-                    giorni_txt = "giorno" if missing_streak == 1 else "giorni"
-                    dosaggio = getattr(terapia, "dosaggio_per_assunzione", None)
-                    dosaggio_txt = f" (dosaggio: {dosaggio})" if dosaggio else ""
-
-                    start_str = start_date.strftime("%d/%m/%Y")
-                    if terapia.data_fine:
-                        end_str = terapia.data_fine.strftime("%d/%m/%Y")
-                        periodo_label = f"dal {start_str} al {end_str}"
-                        is_continuativa = False
-                    else:
-                        end_str = None
-                        periodo_label = f"dal {start_str} (continuativa)"
-                        is_continuativa = True
-                
-                    msg = (f"Il paziente {patient_label} non ha registrato assunzioni di "
-                        f"{terapia.nome_farmaco}{dosaggio_txt} negli ultimi {missing_streak} {giorni_txt} consecutivi. "
-                        f"Terapia {periodo_label}.")
-                       
-                    alerts.append({
-                        "type": "danger",
-                        "patient_id": getattr(paziente, "username", None) or getattr(paziente, "id", None),
-                        "patient_name": patient_label or getattr(paziente, "username", ""),
-                        "drug_name": terapia.nome_farmaco,
-                        "dosaggio_per_assunzione": dosaggio,
-                        "streak_days": missing_streak,
-                        "timestamp": now_iso,
-                        "message": msg,
-                        "therapy_start": start_str,
-                        "therapy_end": end_str,
-                        "therapy_continuativa": is_continuativa
-                    })
-
-            # Alert glicemie anomale
-            misurazioni = list(paziente.rilevazione) 
-            for misura in misurazioni:
-                ts = getattr(misura, "data_ora", None)
-                val = getattr(misura, "valore", None)
-
-                severity = _is_anomalo_with_severity(val, misura)
-                if severity:
-                    ctx_txt = _fmt_ctx(misura)
-                    val_txt = f"{val:g} mg/dL" if val is not None else "valore non disponibile"
-                    ts_txt = ts.strftime("%d/%m/%Y %H:%M") if ts else "data sconosciuta"
-                    ctx_phrase = f" ({ctx_txt})" if ctx_txt else ""
-
-                    # Determina etichetta gravità
-                    if severity == 'danger':
-                        severity_label = "critica"
-                    elif severity == 'danger-orange':
-                        severity_label = "preoccupante"
-                    else:  # warning
-                        severity_label = "anomala"
-
-                    msg = (f"Il paziente {patient_label} ha rilevato una glicemia {severity_label} di "
-                        f"{val_txt}{ctx_phrase} in data {ts_txt}.")
-
-                    alerts.append({
-                        "type": severity,
-                        "patient_id": getattr(paziente, "username", None) or getattr(paziente, "id", None),
-                        "patient_name": patient_label or getattr(paziente, "username", ""),
-                        "value_mgdl": val,
-                        "context": ctx_txt,
-                        "timestamp": ts.isoformat() if ts else None,
-                        "message": msg,
-                        "severity_label": severity_label
-                    })
-
-        # Ordina per timestamp (più recenti prima)
-        def _ts(alert):
-            t = alert.get("timestamp")
-            try:
-                return _dt.fromisoformat(t) if t else _dt.min
-            except Exception:
-                return _dt.min
+    def bell_color(medico):
+        """Colore della campanella in base alla gravità più alta presente"""
+        level = doctor_alert_level(medico)
 
-        alerts.sort(key=_ts, reverse=True)
-        return alerts
+        if level == 'danger':
+            return "danger"    # Rosso per terapie non seguite O glicemie critiche
+        elif level == 'danger-orange':
+            return "orange"   # Arancione per glicemie preoccupanti
+        elif level == 'warning':
+            return "warning"   # Giallo per glicemie anomale
+        return "success"   # Verde se tutto ok
 
     @app.callback(
         Output("alerts-store-medico", "data"),
         Output("bell-button-medico", "color"),
+        Input("alerts-push-medico", "data"),
         Input("alerts-poll-medico", "n_intervals"),
+        Input("alerts-period-medico", "value"),
+        Input("alerts-severity-medico", "value"),
+        Input("alerts-load-more-medico", "n_clicks"),
+        State("alerts-store-medico", "data"),
         prevent_initial_call=False
     )
-    def refresh_doctor_alerts(_):
-        """Aggiorna gli alert e il colore della campanella"""
-        alerts = build_alerts_for_doctor()
-
-        # Determina colore campanella in base alla priorità degli alert
-        if any(a['type'] == 'danger' for a in alerts):
-            bell_color = "danger"    # Rosso per terapie non seguite O glicemie critiche
-        elif any(a['type'] == 'danger-orange' for a in alerts):
-            bell_color = "orange"   # Arancione per glicemie preoccupanti
-        elif any(a['type'] == 'warning' for a in alerts):
-            bell_color = "warning"   # Giallo per glicemie anomale
+    @db_session
+    def refresh_doctor_alerts(_, __, period, severities, ___, store):
+        """Aggiorna la prima pagina di alert e la campanella, o accoda la pagina successiva"""
+        ctx = dash.callback_context
+        trigger = ctx.triggered[0]["prop_id"].split(".")[0] if ctx.triggered else None
+        medico = get_current_medico()
+
+        # "Carica altri": accoda la pagina successiva senza toccare la campanella
+        if trigger == "alerts-load-more-medico":
+            cursor = (store or {}).get("cursor")
+            if not cursor:
+                return dash.no_update, dash.no_update
+            page, next_cursor = load_alerts_page(medico, period, severities, cursor)
+            return {"alerts": store.get("alerts", []) + page, "cursor": next_cursor}, dash.no_update
+
+        # Nessuna gravità selezionata: lista vuota
+        if severities is not None and not severities:
+            page, next_cursor = [], None
         else:
-            bell_color = "success"   # Verde se tutto ok
-    
-        return alerts, bell_color
+            page, next_cursor = load_alerts_page(medico, period, severities)
+
+        return {"alerts": page, "cursor": next_cursor}, bell_color(medico)
+
+    # Apre la connessione SSE quando la dashboard medico viene montata
+    app.clientside_callback(
+        ClientsideFunction(namespace="alerts", function_name="connect"),
+        Output("alerts-push-medico", "data"),
+        Input("alerts-push-medico", "id"),
+    )
 
     @app.callback(
         Output("alerts-modal-body-medico", "children"),
+        Output("alerts-load-more-wrapper-medico", "style"),
         Input("alerts-store-medico", "data"),
         prevent_initial_call=False
     )
-    def render_doctor_alerts(alerts):
+    def render_doctor_alerts(store):
         """Renderizza il contenuto del modal degli alert"""
-        alerts = alerts or []
+        store = store or {}
+        alerts = store.get("alerts") or []
+        load_more_style = {"display": "block"} if store.get("cursor") else {"display": "none"}
+
         if not alerts:
             return html.Div(
                 "Nessuna notifica al momento. Tutti i pazienti seguiti sono in regola!",
                 className="text-center p-3"
-            )
+            ), load_more_style
 
         items = []
         for alert in alerts:
@@ -1461,7 +1330,7 @@ def register_doctor_callbacks(app):
                 ], className=f"border-start border-{border_type} border-3")
             )
         
-        return dbc.ListGroup(items, flush=True)
+        return dbc.ListGroup(items, flush=True), load_more_style
 
     @app.callback(
         Output("alerts-modal-medico", "is_open"),
@@ -0,0 +1,179 @@
+# controller/export.py
+"""Esportazione in CSV dei dati dei pazienti, in streaming.
+
+Le righe vengono lette a pagine di EXPORT_PAGE_SIZE con paginazione keyset
+sulla chiave della tabella (nessun OFFSET, nessun oggetto Pony) e ogni
+pagina viene scritta sulla risposta HTTP prima di leggere la successiva:
+la memoria usata dipende dalla pagina, non dal numero di righe esportate.
+Ogni pagina è letta in una db_session breve, quindi l'esportazione non
+tiene aperta una transazione per tutta la durata del download.
+
+Il CSV delle glicemie usa le stesse colonne dell'importazione
+(controller.glicemia_import), quindi può essere reimportato.
+
+Endpoint (vedi register_export_routes):
+    /export/paziente/<username>/<dataset>.csv   un paziente
+    /export/medico/<username>/<dataset>.csv     tutti i pazienti di un medico
+"""
+import csv
+import io
+import re
+
+from flask import Response, abort, stream_with_context
+from flask_login import current_user
+from pony.orm import db_session
+
+from model.database import db
+
+EXPORT_PAGE_SIZE = 2000
+
+# Per ogni dataset: tabella, colonne esportate e chiave keyset (dopo paziente)
+DATASETS = {
+    "glicemie": {
+        "tabella": "Glicemia",
+        "colonne": ("data_ora", "valore", "momento_pasto", "due_ore_pasto", "note"),
+        "chiave": ("data_ora",),
+    },
+    "assunzioni": {
+        "tabella": "Assunzione",
+        "colonne": ("data_ora", "nome_farmaco", "dosaggio", "note"),
+        "chiave": ("data_ora", "nome_farmaco"),
+    },
+    "sintomi": {
+        "tabella": "Sintomi",
+        "colonne": ("tipo", "descrizione", "data_inizio", "data_fine", "frequenza", "note"),
+        "chiave": ("tipo", "descrizione", "data_inizio"),
+    },
+    "terapie": {
+        "tabella": "Terapia",
+        "colonne": ("data_inizio", "data_fine", "nome_farmaco", "dosaggio_per_assunzione",
+                    "assunzioni_giornaliere", "indicazioni", "medico_nome", "modificata", "note"),
+        # Indice (paziente, data_inizio, data_fine) della migrazione 1: ordinamento
+        # temporaneo solo tra terapie con la stessa data di inizio
+        "chiave": ("data_inizio", "medico_nome", "nome_farmaco"),
+    },
+}
+
+
+# ===============================
+# LETTURA A PAGINE
+# ===============================
+
+def page_sql(dataset, first_page=False):
+    """Pagina successiva al cursore $k0, $k1, ... delle righe del paziente $paziente"""
+    spec = DATASETS[dataset]
+    chiave = spec["chiave"]
+    colonne = list(dict.fromkeys(spec["colonne"] + chiave))
+    cursore = ""
+    if not first_page:
+        parametri = ", ".join(f"$k{i}" for i in range(len(chiave)))
+        cursore = f" AND ({', '.join(chiave)}) > ({parametri})"
+    return (
+        f'SELECT {", ".join(colonne)} FROM "{spec["tabella"]}" '
+        f"WHERE paziente = $paziente{cursore} "
+        f"ORDER BY {', '.join(chiave)} LIMIT $limite"
+    )
+
+def iter_pages(dataset, paziente_username, page_size=EXPORT_PAGE_SIZE):
+    """
+    Righe del paziente a pagine (paginazione keyset).
+
+    Yields:
+        liste di tuple con le colonne di DATASETS[dataset]['colonne']
+    """
+    spec = DATASETS[dataset]
+    colonne = list(dict.fromkeys(spec["colonne"] + spec["chiave"]))
+    indici_chiave = [colonne.index(c) for c in spec["chiave"]]
+    n_colonne = len(spec["colonne"])
+
+    params = {"paziente": paziente_username, "limite": page_size}
+    first_page = True
+    while True:
+        with db_session:
+            rows = db.select(page_sql(dataset, first_page), params)
+        if not rows:
+            return
+        yield [tuple(row[:n_colonne]) for row in rows]
+        if len(rows) < page_size:
+            return
+        first_page = False
+        params.update({f"k{i}": rows[-1][j] for i, j in enumerate(indici_chiave)})
+
+def panel_usernames(medico_username):
+    """Pazienti seguiti dal medico, in ordine"""
+    with db_session:
+        return db.select(
+            'SELECT paziente FROM "Medico_Paziente" WHERE medico = $medico ORDER BY paziente',
+            {"medico": medico_username}
+        )
+
+
+# ===============================
+# CSV
+# ===============================
+
+def iter_csv(dataset, pazienti, page_size=EXPORT_PAGE_SIZE):
+    """
+    CSV del dataset per i pazienti indicati, un blocco di testo per pagina.
+    La prima colonna è sempre 'paziente'.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(("paziente",) + DATASETS[dataset]["colonne"])
+
+    for username in pazienti:
+        for page in iter_pages(dataset, username, page_size):
+            writer.writerows((username,) + row for row in page)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def export_filename(scope, username, dataset):
+    nome = re.sub(r"[^\w.-]", "_", username)
+    return f"{dataset}_{scope}_{nome}.csv"
+
+
+# ===============================
+# ENDPOINT
+# ===============================
+
+def _can_export_patient(username):
+    """Il paziente stesso, un medico o un amministratore"""
+    if getattr(current_user, "is_admin", False) or current_user.role == 'Medico':
+        return True
+    return current_user.role == 'Paziente' and current_user.username == username
+
+def _can_export_panel(medico_username):
+    """Il medico stesso o un amministratore"""
+    if getattr(current_user, "is_admin", False):
+        return True
+    return current_user.role == 'Medico' and current_user.username == medico_username
+
+def _csv_response(rows, filename):
+    response = Response(stream_with_context(rows), mimetype="text/csv")
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+def register_export_routes(server):
+    """Registra gli endpoint di esportazione sul server Flask"""
+
+    @server.route("/export/paziente/<username>/<dataset>.csv")
+    def export_patient(username, dataset):
+        if not current_user.is_authenticated or not _can_export_patient(username):
+            abort(403)
+        if dataset not in DATASETS:
+            abort(404)
+        return _csv_response(iter_csv(dataset, [username]), export_filename("paziente", username, dataset))
+
+    @server.route("/export/medico/<username>/<dataset>.csv")
+    def export_panel(username, dataset):
+        if not current_user.is_authenticated or not _can_export_panel(username):
+            abort(403)
+        if dataset not in DATASETS:
+            abort(404)
+        pazienti = panel_usernames(username)
+        return _csv_response(iter_csv(dataset, pazienti), export_filename("medico", username, dataset))
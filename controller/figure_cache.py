@@ -0,0 +1,47 @@
+# controller/figure_cache.py
+"""Cache delle figure Plotly dei grafici glicemici.
+
+Le figure sono salvate già serializzate (dict) con chiave
+(paziente, grafico, finestra, versione dati, giorno): una nuova misurazione
+incrementa la versione del paziente e rende irraggiungibili le vecchie
+voci, che escono dalla cache LRU.
+"""
+from model.cache import LRUCache
+
+FIGURE_CACHE_SIZE = 512
+
+_figure_cache = LRUCache(maxsize=FIGURE_CACHE_SIZE)
+
+
+def data_version(paziente):
+    """Versione corrente dei dati del paziente (0 se mai scritti)"""
+    versione = paziente.versione_dati
+    return versione.valore if versione is not None else 0
+
+def cached_figure(paziente, chart, window, today, build):
+    """
+    Figura dalla cache o costruita con build() e memorizzata.
+
+    Args:
+        paziente: entità Paziente
+        chart: nome del grafico (es. 'paziente-settimana')
+        window: parametro del grafico che cambia i dati (o None)
+        today: giorno corrente, i grafici dipendono da settimana e anno correnti
+        build: funzione senza argomenti che restituisce una go.Figure
+            (o un dict già serializzabile, es. i dati di uno store)
+
+    Returns:
+        dict della figura, pronto per l'output di una callback
+    """
+    key = (paziente.username, chart, window, data_version(paziente), today)
+    fig = _figure_cache.get(key)
+    if fig is None:
+        fig = build()
+        if hasattr(fig, "to_dict"):
+            fig = fig.to_dict()
+        _figure_cache.set(key, fig)
+    return fig
+
+def clear_figure_cache():
+    """Svuota la cache delle figure"""
+    _figure_cache.clear()
@@ -0,0 +1,35 @@
+# controller/figures.py
+"""Template Plotly compatto condiviso dai grafici glicemici.
+
+go.Figure() incorpora il template predefinito di Plotly (circa 7 KB di
+colori e stili mai usati) in ogni figura inviata al browser. Qui lo stile
+comune dei grafici (sfondo bianco, assi con linea nera, altezza e margini)
+è raccolto in un template di poche righe: ogni figura porta con sé solo
+questo e i propri dati.
+"""
+import plotly.graph_objects as go
+import plotly.io as pio
+
+GLUCOSE_TEMPLATE_NAME = "glicemia"
+
+GLUCOSE_TEMPLATE = go.layout.Template(layout=dict(
+    plot_bgcolor="white", paper_bgcolor="white",
+    height=360, margin=dict(l=10, r=10, t=30, b=10),
+    xaxis=dict(showline=True, linecolor="black", linewidth=1),
+    yaxis=dict(showline=True, linecolor="black", linewidth=1),
+))
+
+pio.templates[GLUCOSE_TEMPLATE_NAME] = GLUCOSE_TEMPLATE
+
+
+def new_figure(**layout):
+    """Figura vuota con il template compatto (layout: proprietà aggiuntive)"""
+    return go.Figure(layout=dict(template=GLUCOSE_TEMPLATE, **layout))
+
+def empty_figure(message, **layout):
+    """Figura senza dati con un messaggio al centro e scala 0-300 mg/dL"""
+    fig = new_figure(**layout)
+    fig.update_yaxes(range=[0, 300], title="mg/dL")
+    fig.add_annotation(text=message, xref="paper", yref="paper",
+                       x=0.5, y=0.5, showarrow=False)
+    return fig
@@ -0,0 +1,319 @@
+# controller/glicemia_import.py
+"""Importazione in blocco delle glicemie da file CSV (glucometri e sensori CGM).
+
+Il file viene letto riga per riga: ogni riga è validata con le stesse regole
+del form (controller.validation.glicemia_error) e le righe valide vengono
+inserite a blocchi di IMPORT_BATCH_SIZE, una transazione per blocco, con
+INSERT OR IGNORE: le misure già presenti (stessa chiave paziente, data_ora)
+vengono saltate. La memoria usata non dipende dalla lunghezza del file.
+
+Gli inserimenti non passano dagli hook di Glicemia: gli alert delle misure
+nuove sono scritti nello stesso blocco, mentre aggregati (con i contatori
+delle metriche) e versione dei dati del paziente vengono aggiornati una
+sola volta al termine.
+
+Dal browser (dcc.Upload) il file arriva come data URL base64, già intero in
+memoria: import_glicemie_data_url lo decodifica a blocchi durante la
+lettura, senza crearne copie decodificate complete.
+
+Colonne riconosciute (intestazione, maiuscole indifferenti):
+    data_ora oppure data + ora, valore, momento_pasto, due_ore_pasto, note
+e le colonne equivalenti degli export CGM più comuni (COLUMN_ALIASES).
+"""
+import base64
+import csv
+import io
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+from pony.orm import db_session, commit
+
+from model.database import db, sql_datetime
+from model.paziente import Paziente
+from model.versione import bump_version
+from model.rollup import rebuild_rollups
+from controller.validation import glicemia_error, MOMENTI_PASTO
+from controller.alert_engine import build_glicemia_alerts
+from controller.push import notify_patient_doctors
+
+IMPORT_BATCH_SIZE = 5000
+# Errori riportati nel riepilogo (gli altri sono solo contati)
+MAX_REPORTED_ERRORS = 20
+
+COLUMN_ALIASES = {
+    "data_ora": ("data_ora", "data e ora", "timestamp", "device timestamp",
+                 "timestamp (yyyy-mm-ddthh:mm:ss)"),
+    "data": ("data", "date"),
+    "ora": ("ora", "time"),
+    "valore": ("valore", "glicemia", "glucose", "glucose value (mg/dl)",
+               "historic glucose mg/dl", "glicemia mg/dl"),
+    "momento_pasto": ("momento_pasto", "momento"),
+    "due_ore_pasto": ("due_ore_pasto", "due_ore"),
+    "note": ("note", "notes"),
+}
+_ALIAS = {alias: campo for campo, aliases in COLUMN_ALIASES.items() for alias in aliases}
+
+_DATETIME_FORMATS = ("%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d-%m-%Y %H:%M:%S", "%d-%m-%Y %H:%M")
+_SI = {"si", "sì", "s", "true", "1", "yes", "y"}
+_NO = {"no", "n", "false", "0"}
+
+_INSERT_SQL = (
+    'INSERT OR IGNORE INTO "Glicemia" '
+    '(paziente, valore, data_ora, momento_pasto, due_ore_pasto, note) '
+    'VALUES (?, ?, ?, ?, ?, ?)'
+)
+_ALERT_SQL = (
+    'INSERT INTO "Alert" (paziente, categoria, tipo, data_ora, dati) '
+    "VALUES (?, 'glicemia', ?, ?, ?)"
+)
+
+
+# ===============================
+# LETTURA E VALIDAZIONE
+# ===============================
+
+def _parse_datetime(testo):
+    testo = (testo or "").strip()
+    if not testo:
+        return None
+    try:
+        # Ora locale del dispositivo: l'eventuale fuso orario viene ignorato
+        return datetime.fromisoformat(testo.replace("T", " ").rstrip("Z")).replace(tzinfo=None)
+    except ValueError:
+        pass
+    for fmt in _DATETIME_FORMATS:
+        try:
+            return datetime.strptime(testo, fmt)
+        except ValueError:
+            continue
+    return None
+
+def _parse_bool(testo):
+    testo = (testo or "").strip().lower()
+    if testo in _SI:
+        return True
+    if testo in _NO:
+        return False
+    return None
+
+def iter_csv_rows(stream):
+    """
+    Righe del CSV come dict {campo: testo} con i nomi di COLUMN_ALIASES.
+    Il separatore (',', ';' o tab) è dedotto dall'intestazione.
+
+    Yields:
+        (numero di riga nel file, dict)
+    """
+    intestazione = stream.readline()
+    if not intestazione:
+        return
+    separatore = max((";", ",", "\t"), key=intestazione.count)
+    nomi = next(csv.reader([intestazione], delimiter=separatore))
+    campi = [_ALIAS.get(n.strip().lower()) for n in nomi]
+
+    for numero, valori in enumerate(csv.reader(stream, delimiter=separatore), start=2):
+        if not any(v.strip() for v in valori):
+            continue
+        yield numero, {c: v for c, v in zip(campi, valori) if c}
+
+def parse_row(row, default_momento=None, today=None):
+    """
+    Misura da una riga del CSV, validata come nel form.
+
+    Returns:
+        (misura con valore, data_ora, momento_pasto, due_ore_pasto e note, None)
+        oppure (None, messaggio di errore)
+    """
+    if row.get("data_ora"):
+        data_ora = _parse_datetime(row["data_ora"])
+    else:
+        data_ora = _parse_datetime(f"{row.get('data', '')} {row.get('ora', '')}")
+
+    testo_valore = (row.get("valore") or "").strip().replace(",", ".")
+    try:
+        valore = float(testo_valore) if testo_valore else None
+    except ValueError:
+        return None, f"Valore non numerico: {testo_valore}"
+    if valore is not None and valore <= 0:
+        return None, f"Valore non valido: {testo_valore}"
+
+    momento = (row.get("momento_pasto") or "").strip().lower() or default_momento
+    if momento and momento not in MOMENTI_PASTO:
+        return None, f"Momento del pasto non riconosciuto: {momento}"
+    due_ore = _parse_bool(row.get("due_ore_pasto"))
+
+    if data_ora is None and (row.get("data_ora") or row.get("data")):
+        return None, "Formato data non valido!"
+
+    error = glicemia_error(
+        valore,
+        data_ora.date() if data_ora else None,
+        data_ora.time() if data_ora else None,
+        momento, due_ore, today
+    )
+    if error:
+        return None, error
+
+    return SimpleNamespace(
+        valore=valore, data_ora=data_ora, momento_pasto=momento,
+        due_ore_pasto=due_ore if momento == 'dopo_pasto' else None,
+        note=(row.get("note") or "").strip()
+    ), None
+
+
+# ===============================
+# IMPORTAZIONE
+# ===============================
+
+def _existing_times(paziente_username, misure):
+    """data_ora già presenti per il paziente nell'intervallo del blocco (chiave primaria)"""
+    tempi = [m.data_ora for m in misure]
+    return {
+        _as_key(t) for t in db.select(
+            'SELECT data_ora FROM "Glicemia" WHERE paziente = $paziente '
+            'AND data_ora >= $start AND data_ora <= $end',
+            {"paziente": paziente_username, "start": sql_datetime(min(tempi)), "end": sql_datetime(max(tempi))}
+        )
+    }
+
+def _as_key(data_ora):
+    """Chiave di confronto di una data_ora (come salvata da Pony, al secondo)"""
+    if isinstance(data_ora, str):
+        data_ora = datetime.fromisoformat(data_ora)
+    return data_ora.replace(microsecond=0)
+
+def _insert_batch(paziente_username, misure):
+    """
+    Inserisce in una transazione le misure del blocco non ancora presenti
+    e i relativi alert.
+
+    Returns:
+        (misure inserite, alert creati)
+    """
+    with db_session:
+        paziente = Paziente[paziente_username]
+        visti = _existing_times(paziente_username, misure)
+        nuove = []
+        for misura in misure:
+            chiave = _as_key(misura.data_ora)
+            if chiave not in visti:
+                visti.add(chiave)
+                nuove.append(misura)
+        alerts = build_glicemia_alerts(paziente, nuove)
+
+        connection = db.get_connection()
+        inserite = connection.executemany(_INSERT_SQL, [
+            (paziente_username, m.valore, sql_datetime(m.data_ora),
+             m.momento_pasto, m.due_ore_pasto, m.note)
+            for m in nuove
+        ]).rowcount
+        connection.executemany(_ALERT_SQL, [
+            (paziente_username, alert["type"], sql_datetime(misura.data_ora),
+             json.dumps(alert, separators=(",", ":"), sort_keys=True, ensure_ascii=False))
+            for misura, alert in alerts
+        ])
+        commit()
+    return max(inserite, 0), len(alerts)
+
+def _after_import(paziente_username, alert_creati):
+    """Aggiorna una sola volta ciò che gli hook di Glicemia aggiornano misura per misura"""
+    rebuild_rollups(paziente_username)
+    with db_session:
+        paziente = Paziente[paziente_username]
+        bump_version(paziente)
+        commit()
+        if alert_creati:
+            notify_patient_doctors(paziente, {"categoria": "glicemia", "count": alert_creati})
+
+def import_glicemie(paziente_username, stream, default_momento=None, batch_size=IMPORT_BATCH_SIZE, today=None):
+    """
+    Importa le glicemie di un paziente da un CSV (stream di testo).
+
+    Args:
+        default_momento: momento del pasto per le righe che non lo indicano
+            (es. export CGM); senza, quelle righe vengono scartate
+
+    Returns:
+        dict con 'righe' lette, 'inserite', 'duplicate', 'scartate', 'alert'
+        creati ed 'errori' (primi MAX_REPORTED_ERRORS come (riga, messaggio))
+
+    Raises:
+        ValueError: paziente inesistente
+    """
+    with db_session:
+        if Paziente.get(username=paziente_username) is None:
+            raise ValueError(f"Paziente non trovato: {paziente_username}")
+
+    esito = {"righe": 0, "inserite": 0, "duplicate": 0, "scartate": 0, "alert": 0, "errori": []}
+    batch = []
+
+    def flush():
+        inserite, alerts = _insert_batch(paziente_username, batch)
+        esito["inserite"] += inserite
+        esito["duplicate"] += len(batch) - inserite
+        esito["alert"] += alerts
+        batch.clear()
+
+    for numero, row in iter_csv_rows(stream):
+        esito["righe"] += 1
+        misura, error = parse_row(row, default_momento, today)
+        if error:
+            esito["scartate"] += 1
+            if len(esito["errori"]) < MAX_REPORTED_ERRORS:
+                esito["errori"].append((numero, error))
+            continue
+
+        batch.append(misura)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    if esito["inserite"]:
+        _after_import(paziente_username, esito["alert"])
+    return esito
+
+def _text_stream(raw):
+    # Caratteri non UTF-8 (es. note in Latin-1) sostituiti invece di interrompere l'importazione
+    return io.TextIOWrapper(raw, encoding="utf-8-sig", errors="replace", newline="")
+
+def import_glicemie_bytes(paziente_username, contenuto, **kwargs):
+    """Come import_glicemie, per il contenuto di un file (bytes UTF-8)"""
+    return import_glicemie(paziente_username, _text_stream(io.BytesIO(contenuto)), **kwargs)
+
+
+class _Base64Reader(io.RawIOBase):
+    """Lettura dei byte di un testo base64, decodificato BLOCK caratteri alla volta"""
+    BLOCK = 64 * 1024  # multiplo di 4: ogni blocco si decodifica da solo
+
+    def __init__(self, testo, inizio=0):
+        self._testo = testo
+        self._pos = inizio
+        self._decodificati = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._decodificati and self._pos < len(self._testo):
+            blocco = self._testo[self._pos:self._pos + self.BLOCK]
+            self._pos += self.BLOCK
+            self._decodificati = base64.b64decode(blocco)
+        n = min(len(buffer), len(self._decodificati))
+        buffer[:n] = self._decodificati[:n]
+        self._decodificati = self._decodificati[n:]
+        return n
+
+def import_glicemie_data_url(paziente_username, contents, **kwargs):
+    """
+    Come import_glicemie, per il contenuto di dcc.Upload ("data:<tipo>;base64,<dati>").
+
+    Raises:
+        ValueError: contenuto non in formato base64 o paziente inesistente
+    """
+    intestazione, separatore, _ = contents[:256].partition(",")
+    if not separatore or not intestazione.endswith(";base64"):
+        raise ValueError("Contenuto del file non valido")
+    raw = io.BufferedReader(_Base64Reader(contents, len(intestazione) + 1))
+    return import_glicemie(paziente_username, _text_stream(raw), **kwargs)
@@ -2,13 +2,12 @@
 """Controller per la gestione dei pazienti - versione riorganizzata"""
 
 import dash
-from dash.dependencies import Input, Output, State
+from dash.dependencies import Input, Output, State, ClientsideFunction
 from flask_login import current_user
 from dash import html, dcc
 from datetime import datetime, timedelta, time as dtime
 import time as pytime
-from pony.orm import db_session, commit, exists
-import pandas as pd
+from pony.orm import db_session, commit, flush, select
 import plotly.graph_objects as go
 import dash_bootstrap_components as dbc
 
@@ -17,6 +16,18 @@ from model.assunzione import Assunzione
 from model.paziente import Paziente
 from model.sintomi import Sintomi
 from model.terapia import Terapia
+from model.metriche import patient_metrics
+from model.colonnare import mirror_glicemia
+from controller.analytics import (
+    weekday_means, weekly_means, monthly_means, weekly_store,
+    DOW_LABELS, MONTH_LABELS, MAX_WEEKS_WINDOW, WEEKLY_TRACE_NAME
+)
+from controller.alert_engine import on_glicemia_saved, on_assunzione_saved
+from controller.figure_cache import cached_figure, data_version
+from controller.figures import new_figure, empty_figure
+from controller.timeline import load_timeline, create_timeline_figure, relayout_range
+from controller.validation import VALIDATION_LIMITS, date_error, glicemia_error
+from controller.glicemia_import import import_glicemie_data_url
 from view.patient import *
 
 
@@ -28,11 +39,6 @@ CLINICAL_THRESHOLDS = {
     'HIGH_ALERT': 180
 }
 
-VALIDATION_LIMITS = {
-    'MIN_YEAR': 1900,
-    'MIN_NAME_LENGTH': 2,
-    'MIN_DESCRIPTION_LENGTH': 2
-}
 # =============================================================================
 # FUNZIONE CORE per poter fare i test
 # =============================================================================
@@ -72,7 +78,7 @@ def _save_glicemia_measurement_core(
         campo_due_ore = due_ore_pasto if momento_pasto == 'dopo_pasto' else None
 
         # Persistenza
-        Glicemia(
+        glicemia = Glicemia(
             paziente=paziente,
             valore=float(valore),
             data_ora=data_ora,
@@ -80,7 +86,12 @@ def _save_glicemia_measurement_core(
             note=note.strip() if note else '',
             due_ore_pasto=campo_due_ore
         )
+        # Inserimento (hook e versione) e alert nella stessa transazione:
+        # le cache del medico non vedono mai la misura senza il suo alert
+        flush()
+        on_glicemia_saved(glicemia)
         commit()
+        mirror_glicemia(paziente.username, data_ora, float(valore), momento_pasto, data_version(paziente))
 
         refresh_data = {'ts': pytime.time()}
         return get_success_message(valore, data_ora, momento_pasto, due_ore_pasto), refresh_data
@@ -89,6 +100,21 @@ def _save_glicemia_measurement_core(
         return get_error_message(f"Errore durante il salvataggio: {str(e)}"), dash.no_update
 
 
+# ---funzione core per l'importazione di glicemie da file ----------------------
+def _import_glicemie_core(contents, filename, momento, username: str | None = None):
+    if not contents:
+        return dash.no_update, dash.no_update
+
+    try:
+        # dcc.Upload: "data:<tipo>;base64,<contenuto>", decodificato durante la lettura
+        esito = import_glicemie_data_url(username or current_user.username, contents,
+                                         default_momento=momento or None)
+    except Exception as e:
+        return get_error_message(f"Importazione non riuscita: {str(e)}"), dash.no_update
+
+    return get_import_result_message(filename, esito), {'ts': pytime.time()}
+
+
 # ==Funzione core per Assunzione per poter essere testata ======================
 @db_session
 def _save_assunzione_core(
@@ -125,7 +151,7 @@ def _save_assunzione_core(
         data_ora = datetime.combine(data_obj, ora_obj)
 
         # Salva nel DB
-        Assunzione(
+        assunzione = Assunzione(
             paziente=paziente,
             nome_farmaco=nome_farmaco.strip(),
             dosaggio=dosaggio.strip(),
@@ -133,6 +159,7 @@ def _save_assunzione_core(
             note=note.strip() if note else ''
         )
         commit()
+        on_assunzione_saved(assunzione)
 
         refresh_data = {'ts': pytime.time()}
         return get_assunzione_success_message(nome_farmaco, dosaggio, data_ora), refresh_data
@@ -247,6 +274,18 @@ def _register_form_callbacks(app):
         n_clicks, valore, data_misurazione, ora, momento_pasto, note, due_ore_pasto
     )
 
+    # Form glicemia - importazione da file
+    @app.callback(
+        Output('import-glicemie-feedback', 'children'),
+        Output('alerts-refresh', 'data', allow_duplicate=True),
+        Input('upload-glicemie', 'contents'),
+        [State('upload-glicemie', 'filename'),
+         State('select-momento-import', 'value')],
+        prevent_initial_call=True
+    )
+    def import_glicemie_file(contents, filename, momento):
+        return _import_glicemie_core(contents, filename, momento)
+
     # Form assunzione farmaci - mostra
     @app.callback(
         Output('patient-content', 'children', allow_duplicate=True),
@@ -484,40 +523,68 @@ def _register_chart_callbacks(app):
         Input('btn-andamento-glicemico', 'n_clicks'),
         prevent_initial_call=True
     )
+    @db_session
     def show_andamento_glicemico(n_clicks):
         if n_clicks:
-            return get_andamento_glicemico_view()
+            return get_andamento_glicemico_view(patient_metrics(current_user.username))
         return dash.no_update
 
     @app.callback(
         Output("patient-week-dow", "figure"),
-        Output("patient-weekly-avg", "figure"),
+        Output("patient-weekly-store", "data"),
         Output("patient-monthly-avg", "figure"),
         Input("patient-content", "children"),
-        Input("weeks-window", "value"),
         prevent_initial_call=False
     )
     @db_session
-    def render_charts(_children, weeks_window):
-        """Genera i tre grafici: giorni settimana, settimanale, mensile"""
+    def render_charts(_children):
+        """Genera i tre grafici: giorni settimana, settimanale (nello store), mensile"""
         paziente = Paziente.get(username=current_user.username)
         if not paziente:
-            return _create_empty_figures("Paziente non trovato")
+            return _empty_charts("Paziente non trovato")
+
+        # Gli aggregati esistono solo se c'è almeno una misurazione
+        if paziente.rollups.is_empty():
+            return _empty_charts("Nessuna glicemia registrata")
+
+        # Genera i tre grafici dagli aggregati pre-calcolati
+        today = datetime.now().date()
+        username = paziente.username
 
-        # Recupera misurazioni glicemiche
-        glicemie = _get_patient_glicemie(paziente)
-        if not glicemie:
-            return _create_empty_figures("Nessuna glicemia registrata")
+        def build_week_store():
+            weeks, weekly_mean = weekly_means(username, MAX_WEEKS_WINDOW, today)
+            fig = _create_weekly_avg_chart(weeks, weekly_mean, MAX_WEEKS_WINDOW)
+            return weekly_store(fig, weeks, weekly_mean, today)
 
-        # Crea DataFrame
-        df = _create_glicemia_dataframe(glicemie)
+        # Figure già serializzate se i dati del paziente non sono cambiati
+        fig_dow = cached_figure(paziente, "paziente-giorni", None, today, lambda: _create_weekly_dow_chart(
+            weekday_means(username, today)))
+        week_store = cached_figure(paziente, "paziente-settimane", MAX_WEEKS_WINDOW, today, build_week_store)
+        fig_month = cached_figure(paziente, "paziente-mesi", None, today, lambda: _create_monthly_avg_chart(
+            monthly_means(username, today.year), today.year))
 
-        # Genera i tre grafici
-        fig_dow = _create_weekly_dow_chart(df)
-        fig_week = _create_weekly_avg_chart(df, weeks_window or 8)
-        fig_month = _create_monthly_avg_chart(df)
+        return fig_dow, week_store, fig_month
 
-        return fig_dow, fig_week, fig_month
+    # La finestra settimane ritaglia nel browser la serie già caricata
+    app.clientside_callback(
+        ClientsideFunction(namespace="charts", function_name="sliceWeeks"),
+        Output("patient-weekly-avg", "figure"),
+        Input("patient-weekly-store", "data"),
+        Input("weeks-window", "value")
+    )
+
+    @app.callback(
+        Output("patient-timeline", "figure"),
+        Input("patient-content", "children"),
+        Input("patient-timeline", "relayoutData"),
+        prevent_initial_call=False
+    )
+    @db_session
+    def render_timeline(_children, relayout):
+        """Timeline delle misurazioni, ricalcolata sull'intervallo visibile dopo uno zoom"""
+        start, end = relayout_range(relayout)
+        data = load_timeline(current_user.username, start, end)
+        return create_timeline_figure(data, start, end)
 
 # =============================================================================
 # CALLBACK PER LA NAVIGAZIONE
@@ -639,20 +706,9 @@ def _register_alert_callbacks(app):
 # =============================================================================
 
 def _validate_glicemia_input(valore, data_misurazione, ora, momento_pasto, due_ore_pasto):
-    """Valida i dati del form glicemia"""
-    if not all([valore, data_misurazione, ora, momento_pasto]):
-        return get_error_message("Per favore compila tutti i campi obbligatori!")
-
-    # Validazione data
-    error = _validate_date(data_misurazione, "misurazione")
-    if error:
-        return error
-
-    # Validazione campo "due ore dopo pasto"
-    if momento_pasto == 'dopo_pasto' and due_ore_pasto is None:
-        return get_error_message("Per favore specifica se sono passate almeno due ore dal pasto!")
-
-    return None
+    """Valida i dati del form glicemia (stesse regole dell'importazione da file)"""
+    error = glicemia_error(valore, data_misurazione, ora, momento_pasto, due_ore_pasto)
+    return get_error_message(error) if error else None
 
 def _validate_assunzione_input_updated(selected_farmaco, nome_farmaco, dosaggio, data_assunzione, ora):
     """Valida i dati del form assunzione"""
@@ -720,20 +776,8 @@ def _validate_sintomi_input(tipo, descrizione, data_inizio, data_fine, frequenza
 
 def _validate_date(date_string, field_name):
     """Valida una data in formato string"""
-    try:
-        data_obj = datetime.strptime(date_string, '%Y-%m-%d').date()
-        today = datetime.now().date()
-        min_date = datetime(VALIDATION_LIMITS['MIN_YEAR'], 1, 1).date()
-
-        if data_obj > today:
-            return get_error_message(f"La data di {field_name} non può essere nel futuro!")
-        if data_obj < min_date:
-            return get_error_message(f"La data di {field_name} non può essere precedente al {VALIDATION_LIMITS['MIN_YEAR']}!")
-            
-    except ValueError:
-        return get_error_message("Formato data non valido!")
-    
-    return None
+    error = date_error(date_string, field_name)
+    return get_error_message(error) if error else None
 
 # =============================================================================
 # FUNZIONI HELPER - UTILITÀ GENERALI
@@ -763,28 +807,6 @@ def _is_data_view_active(children, element_id):
     except Exception:
         return False
 
-def _get_patient_glicemie(paziente):
-    """Recupera le glicemie del paziente (tollera nomi diversi di relazioni)"""
-    return _rel_list(paziente, 'glicemias', 'glicemie', 'rilevazione', 'rilevazioni')
-
-def _rel_list(paziente, *names):
-    """Restituisce list(relazione) provando più nomi possibili"""
-    for name in names:
-        if hasattr(paziente, name):
-            try:
-                return list(getattr(paziente, name))
-            except Exception:
-                pass
-    return []
-
-def _create_glicemia_dataframe(glicemie):
-    """Crea DataFrame dalle glicemie"""
-    df = pd.DataFrame([{"data": g.data_ora, "valore": g.valore} for g in glicemie])
-    df = df.sort_values("data")
-    df["data"] = pd.to_datetime(df["data"])
-    df.set_index("data", inplace=True)
-    return df
-
 def _day_bounds(date):
     """Restituisce inizio e fine giornata per una data"""
     start = datetime.combine(date, dtime.min)
@@ -923,37 +945,63 @@ def _check_therapy_alerts(paziente):
 
     return alerts
 
+def _assunzioni_day_query(paziente, today):
+    """Query delle assunzioni del giorno (intervallo su paziente, data_ora)"""
+    start, end = _day_bounds(today)
+    return select(
+        a for a in Assunzione
+        if a.paziente == paziente and a.data_ora >= start and a.data_ora < end
+    )
+
+def _active_therapies_query(paziente, today):
+    """Query delle terapie attive nel giorno"""
+    start, end = _day_bounds(today)
+    return select(
+        t for t in Terapia
+        if t.paziente == paziente and t.data_inizio < end and
+           (t.data_fine is None or t.data_fine >= start)
+    )
+
+def _glicemia_day_query(paziente, today):
+    """Query delle glicemie del giorno (intervallo su paziente, data_ora)"""
+    start, end = _day_bounds(today)
+    return select(
+        g for g in Glicemia
+        if g.paziente == paziente and g.data_ora >= start and g.data_ora < end
+    )
+
 def _get_assunzioni_today(paziente, today):
     """Recupera assunzioni di oggi"""
-    start, end = _day_bounds(today)
     try:
-        return [a for a in paziente.assunzione if start <= a.data_ora < end]
+        return _assunzioni_day_query(paziente, today)[:]
     except Exception:
         return []
 
 def _get_active_therapies(paziente, today):
     """Recupera terapie attive per oggi"""
     try:
-        return [t for t in paziente.terapies
-                if (t.data_inizio is None or t.data_inizio.date() <= today) and 
-                   (t.data_fine is None or t.data_fine.date() >= today)]
+        return _active_therapies_query(paziente, today)[:]
     except Exception:
         return []
 
 def _has_assunzioni_today(paziente, today):
     """Verifica se ha assunzioni registrate oggi"""
-    return len(_get_assunzioni_today(paziente, today)) > 0
+    try:
+        return _assunzioni_day_query(paziente, today).exists()
+    except Exception:
+        return False
 
 def _has_active_therapies(paziente, today):
     """Verifica se ha terapie attive"""
-    return len(_get_active_therapies(paziente, today)) > 0
+    try:
+        return _active_therapies_query(paziente, today).exists()
+    except Exception:
+        return False
 
 def _has_glicemia_today(paziente, today):
     """Verifica se ha glicemie registrate oggi"""
-    start, end = _day_bounds(today)
     try:
-        glicemie_oggi = [g for g in paziente.rilevazione if start <= g.data_ora < end]
-        return len(glicemie_oggi) > 0
+        return _glicemia_day_query(paziente, today).exists()
     except Exception:
         return False
 
@@ -963,42 +1011,25 @@ def _has_glicemia_today(paziente, today):
 
 def _create_empty_figures(message="Nessuna glicemia registrata"):
     """Crea tre figure vuote con messaggio"""
-    def empty_fig():
-        fig = go.Figure()
-        fig.update_yaxes(range=[0, 300])
-        fig.add_annotation(text=message, xref="paper", yref="paper",
-                         x=0.5, y=0.5, showarrow=False)
-        fig.update_layout(height=360, margin=dict(l=10, r=10, t=30, b=10))
-        return fig
+    return empty_figure(message), empty_figure(message), empty_figure(message)
 
-    return empty_fig(), empty_fig(), empty_fig()
+def _empty_charts(message):
+    """Figure vuote per giorni e mesi, store settimanale con figura vuota"""
+    fig_dow, fig_week, fig_month = _create_empty_figures(message)
+    return fig_dow, weekly_store(fig_week), fig_month
 
-def _create_weekly_dow_chart(df):
+def _create_weekly_dow_chart(daily_mean):
     """Crea grafico giorni della settimana (settimana corrente)"""
-    today = datetime.now()
-    start_week = (today - timedelta(days=today.weekday())).replace(
-        hour=0, minute=0, second=0, microsecond=0
-    )
-    end_week = start_week + timedelta(days=7)
-
-    # Filtra dati settimana corrente
-    week_df = df.loc[(df.index >= start_week) & (df.index < end_week)].copy()
-
-    fig = go.Figure()
+    fig = new_figure()
     fig.update_yaxes(range=[0, 300], title="mg/dL")
 
-    dow_order = ["Lunedì", "Martedì", "Mercoledì", "Giovedì", "Venerdì", "Sabato", "Domenica"]
+    dow_order = DOW_LABELS
     fig.update_xaxes(categoryorder="array", categoryarray=dow_order, title="Giorno della settimana")
 
-    if not week_df.empty:
-        week_df["giorno_label"] = week_df.index.dayofweek.map({
-            i: dow_order[i] for i in range(7)
-        })
-
+    if any(v is not None for v in daily_mean):
         # Media per giorno
-        daily_mean = week_df.groupby("giorno_label")["valore"].mean().reindex(dow_order)
         fig.add_trace(go.Scatter(
-            x=dow_order, y=daily_mean.values,
+            x=dow_order, y=daily_mean,
             mode="lines+markers", name="Media giorno",
             line=dict(color="#F58518", width=2), connectgaps=True
         ))
@@ -1006,32 +1037,24 @@ def _create_weekly_dow_chart(df):
         # Aggiungi soglie cliniche
         _add_clinical_thresholds(fig, dow_order)
 
-    _apply_chart_styling(fig)
     return fig
 
-def _create_weekly_avg_chart(df, weeks_window):
-    """Crea grafico media settimanale"""
-    since = datetime.now() - timedelta(weeks=int(weeks_window))
-    recent = df.loc[df.index >= since].copy()
-
-    # Media settimanale (lunedì come inizio settimana)
-    weekly_mean = recent["valore"].resample("W-MON", label="left", closed="left").mean()
-
-    fig = go.Figure()
+def _create_weekly_avg_chart(weeks, weekly_mean, weeks_window):
+    """Crea grafico media settimanale (lunedì come inizio settimana)"""
+    fig = new_figure()
     fig.update_yaxes(range=[0, 300], title="mg/dL")
 
-    if not weekly_mean.empty:
+    if weeks:
         # Crea etichette asse X
         x_labels = []
-        for ts in weekly_mean.index:
-            start = ts
-            end = ts + timedelta(days=6)
+        for start in weeks:
+            end = start + timedelta(days=6)
             x_labels.append(f"{start.strftime('%d/%m')}–{end.strftime('%d/%m')}")
 
         fig.add_trace(go.Scatter(
-            x=x_labels, y=weekly_mean.values,
+            x=x_labels, y=weekly_mean,
             mode="lines+markers",
-            name=f"Media settimanale (ultime {weeks_window} sett.)",
+            name=WEEKLY_TRACE_NAME.format(n=weeks_window),
             line=dict(color="#4C78A8", width=2), connectgaps=True
         ))
 
@@ -1040,41 +1063,26 @@ def _create_weekly_avg_chart(df, weeks_window):
         fig.add_annotation(text="Nessuna settimana con dati nel periodo",
                           xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
 
-    _apply_chart_styling(fig)
     return fig
 
-def _create_monthly_avg_chart(df):
+def _create_monthly_avg_chart(monthly_mean, year):
     """Crea grafico media mensile (anno corrente)"""
-    year = datetime.now().year
-    year_start = pd.Timestamp(year=year, month=1, day=1)
-
-    # Indice fisso 12 mesi
-    idx_months = pd.date_range(start=year_start, periods=12, freq="MS")
+    mesi_it = MONTH_LABELS
 
-    # Filtra anno corrente e calcola media mensile
-    df_year = df.loc[(df.index >= year_start) &
-                     (df.index < year_start + pd.offsets.YearEnd(0) + pd.Timedelta(days=1))].copy()
-    monthly_mean = df_year["valore"].resample("MS").mean().reindex(idx_months)
-
-    mesi_it = ["Gen", "Feb", "Mar", "Apr", "Mag", "Giu",
-               "Lug", "Ago", "Set", "Ott", "Nov", "Dic"]
-    x_m = [mesi_it[ts.month - 1] for ts in monthly_mean.index]
-
-    fig = go.Figure()
+    fig = new_figure()
     fig.update_yaxes(range=[0, 300], title="mg/dL")
     
     fig.add_trace(go.Scatter(
-        x=x_m, y=monthly_mean.values,
+        x=mesi_it, y=monthly_mean,
         mode="lines+markers", name=f"Media mensile {year}",
         line=dict(color="#4C78A8", width=2), connectgaps=True
     ))
 
-    if monthly_mean.isna().all():
+    if all(v is None for v in monthly_mean):
         fig.add_annotation(text="Nessun dato per l'anno selezionato",
                           xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
 
-    _add_clinical_thresholds(fig, x_m)
-    _apply_chart_styling(fig)
+    _add_clinical_thresholds(fig, mesi_it)
     return fig
 
 def _add_clinical_thresholds(fig, x_labels):
@@ -1101,12 +1109,3 @@ def _add_clinical_thresholds(fig, x_labels):
         fillcolor="rgba(144,238,144,0.20)",
         name="Glicemia nella norma (80–130)", hoverinfo="skip", legendgroup="norma"
     ))
-
-def _apply_chart_styling(fig):
-    """Applica stile comune ai grafici"""
-    fig.update_layout(
-        plot_bgcolor="white", paper_bgcolor="white",
-        height=360, margin=dict(l=10, r=10, t=30, b=10)
-    )
-    fig.update_xaxes(showline=True, linecolor="black", linewidth=1)
-    fig.update_yaxes(showline=True, linecolor="black", linewidth=1)
\ No newline at end of file
@@ -0,0 +1,79 @@
+# controller/payload.py
+"""Misura della dimensione delle risposte delle callback Dash.
+
+Dash serializza le risposte con plotly.io.json, il cui motore "auto"
+usa già orjson quando è installato (vedi requirements.txt).
+
+Ogni risposta di /_dash-update-component viene misurata:
+  - le statistiche per callback (chiamate, byte totali e massimi) del
+    processo restano in memoria e sono leggibili dagli amministratori su
+    /admin/payload-stats (una risposta per worker, con il pid);
+  - ogni risposta viene registrata a livello DEBUG sul logger
+    "controller.payload"; con GLICEMIA_PAYLOAD_LOG impostata il logger
+    viene abilitato anche senza una configurazione del logging.
+"""
+import logging
+import os
+import threading
+
+from flask import request, jsonify, abort
+from flask_login import current_user
+
+PAYLOAD_LOG_ENV = "GLICEMIA_PAYLOAD_LOG"
+CALLBACK_PATH = "_dash-update-component"
+STATS_PATH = "/admin/payload-stats"
+
+logger = logging.getLogger(__name__)
+
+_stats = {}
+_lock = threading.Lock()
+
+
+def record_payload(output, size):
+    """Aggiorna le statistiche della callback con la dimensione di una risposta"""
+    with _lock:
+        stat = _stats.setdefault(output, {"chiamate": 0, "byte_totali": 0, "byte_max": 0})
+        stat["chiamate"] += 1
+        stat["byte_totali"] += size
+        stat["byte_max"] = max(stat["byte_max"], size)
+
+    logger.debug("%s: %d byte", output, size)
+
+def payload_stats():
+    """Statistiche per callback, dalla più pesante in totale"""
+    with _lock:
+        stats = {output: dict(stat) for output, stat in _stats.items()}
+    return dict(sorted(stats.items(), key=lambda item: -item[1]["byte_totali"]))
+
+def reset_payload_stats():
+    with _lock:
+        _stats.clear()
+
+def _enable_log():
+    """Log delle risposte su stderr anche senza configurazione del logging"""
+    logger.setLevel(logging.DEBUG)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("[payload] %(message)s"))
+        logger.addHandler(handler)
+
+def register_payload_instrumentation(server):
+    """Misura la dimensione di ogni risposta delle callback Dash ed espone le statistiche"""
+    if os.environ.get(PAYLOAD_LOG_ENV):
+        _enable_log()
+
+    @server.route(STATS_PATH)
+    def payload_stats_endpoint():
+        if not current_user.is_authenticated or not getattr(current_user, "is_admin", False):
+            abort(403)
+        return jsonify({"pid": os.getpid(), "callback": payload_stats()})
+
+    @server.after_request
+    def measure_callback_payload(response):
+        if not request.path.endswith(CALLBACK_PATH) or response.direct_passthrough:
+            return response
+
+        body = request.get_json(silent=True) or {}
+        output = body.get("output", "?")
+        record_payload(output, response.calculate_content_length() or len(response.get_data()))
+        return response
@@ -0,0 +1,183 @@
+# controller/push.py
+"""Canale push (Server-Sent Events) per le notifiche ai medici.
+
+Ogni dashboard medico apre una connessione EventSource su /alerts/stream.
+Quando il motore alert registra una variazione per un paziente, la versione
+degli alert dei medici che lo seguono (VersioneAlertMedico) viene
+incrementata nel database e le connessioni dello stesso processo vengono
+risvegliate (_changed): ognuna rilegge la propria versione con una lettura
+per chiave primaria. Una connessione inattiva non interroga il database:
+resta in attesa e rilegge la versione solo ogni PUSH_BACKSTOP_SECONDS, per
+le scritture avvenute in un altro processo (worker gunicorn). L'id SSE è la
+versione: alla riconnessione il browser invia Last-Event-ID e le variazioni
+perse vengono inviate subito.
+
+Deployment: ogni connessione aperta occupa un thread del server per al
+massimo STREAM_MAX_SECONDS, poi il browser si riconnette. Servono worker
+multi-thread (es. gunicorn --worker-class gthread --threads 8): sui
+worker sincroni lo stream bloccherebbe l'intero processo, quindi
+l'endpoint risponde 503. Oltre PUSH_MAX_STREAMS connessioni per processo
+l'endpoint risponde 503 e la dashboard attiva il polling lento
+(alerts-poll-medico), spento finché il canale push è aperto.
+
+Variabili d'ambiente:
+    GLICEMIA_PUSH_STREAMS   connessioni push contemporanee per processo
+"""
+import json
+import os
+import threading
+import time
+
+from flask import Response, request
+from flask_login import current_user
+from pony.orm import db_session, commit
+
+from model.database import db
+
+# Secondi tra due letture della versione senza notifiche nel processo
+# (scritture di altri worker)
+PUSH_BACKSTOP_SECONDS = 60
+# Secondi tra due heartbeat (commento SSE) per rilevare connessioni chiuse
+HEARTBEAT_SECONDS = 25
+# Durata massima di una connessione: il thread viene liberato e il browser si riconnette
+STREAM_MAX_SECONDS = 300
+PUSH_MAX_STREAMS = int(os.environ.get("GLICEMIA_PUSH_STREAMS", 32))
+
+_slots = threading.BoundedSemaphore(PUSH_MAX_STREAMS)
+
+# Notifiche nel processo: ogni notify incrementa la generazione e risveglia le connessioni
+_changed = threading.Condition()
+_generation = 0
+
+_VERSION_SQL = 'SELECT valore, evento FROM "VersioneAlertMedico" WHERE medico = $medico'
+
+_BUMP_DOCTOR_SQL = (
+    'INSERT INTO "VersioneAlertMedico" (medico, valore, evento) VALUES ($medico, 1, $evento) '
+    'ON CONFLICT (medico) DO UPDATE SET valore = valore + 1, evento = excluded.evento'
+)
+
+# Tutti i medici del paziente in una sola istruzione
+_BUMP_PATIENT_SQL = (
+    'INSERT INTO "VersioneAlertMedico" (medico, valore, evento) '
+    'SELECT medico, 1, $evento FROM "Medico_Paziente" WHERE paziente = $paziente '
+    'ON CONFLICT (medico) DO UPDATE SET valore = valore + 1, evento = excluded.evento'
+)
+
+
+def _wake_streams():
+    """Risveglia le connessioni del processo dopo il commit di una notifica"""
+    global _generation
+    with _changed:
+        _generation += 1
+        _changed.notify_all()
+
+def _wait_for_notification(seen, timeout):
+    """Attende una notifica successiva alla generazione seen (al massimo timeout secondi)"""
+    with _changed:
+        _changed.wait_for(lambda: _generation != seen, timeout=max(timeout, 0))
+        return _generation
+
+def notify_doctors(usernames, event):
+    """Segnala l'evento ai medici indicati (alle loro connessioni in qualsiasi processo)"""
+    usernames = set(usernames)
+    evento = json.dumps(event)
+    with db_session:
+        for username in usernames:
+            db.execute(_BUMP_DOCTOR_SQL, {"medico": username, "evento": evento})
+        commit()
+    _wake_streams()
+    return len(usernames)
+
+def notify_patient_doctors(paziente, event):
+    """Notifica i medici che seguono il paziente"""
+    evento = json.dumps({"patient_id": paziente.username, **event})
+    with db_session:
+        cursor = db.execute(_BUMP_PATIENT_SQL, {"paziente": paziente.username, "evento": evento})
+        commit()
+    _wake_streams()
+    return cursor.rowcount
+
+def current_version(username):
+    """Versione degli alert del medico e ultimo evento (0, {} se mai notificato)"""
+    with db_session:
+        righe = db.select(_VERSION_SQL, {"medico": username})
+    if not righe:
+        return 0, {}
+    valore, evento = righe[0]
+    return valore, json.loads(evento) if evento else {}
+
+def _format_event(versione, event):
+    """Serializza un evento nel formato SSE"""
+    return f"id: {versione}\nevent: alerts\ndata: {json.dumps(event)}\n\n"
+
+def _parse_last_event_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def event_stream(username, last_id=None, backstop=PUSH_BACKSTOP_SECONDS,
+                 heartbeat=HEARTBEAT_SECONDS, max_seconds=STREAM_MAX_SECONDS):
+    """
+    Generatore SSE per la connessione di un medico.
+
+    Args:
+        last_id: versione già vista dal browser (Last-Event-ID), None alla
+            prima connessione
+    """
+    # Generazione letta prima della versione: una notifica intermedia non va persa
+    vista = _generation
+    riconnessione = last_id is not None
+    if not riconnessione:
+        # Prima connessione: la dashboard ha appena letto gli alert, parto dalla versione attuale
+        last_id = current_version(username)[0]
+        yield f"retry: 5000\nid: {last_id}\n\n"
+    else:
+        yield "retry: 5000\n\n"
+
+    adesso = time.monotonic()
+    fine, prossimo_heartbeat = adesso + max_seconds, adesso + heartbeat
+    # Alla riconnessione la versione va confrontata subito con Last-Event-ID
+    prossimo_controllo = adesso if riconnessione else adesso + backstop
+    while True:
+        adesso = time.monotonic()
+        if adesso >= prossimo_controllo:
+            prossimo_controllo = adesso + backstop
+            versione, event = current_version(username)
+            if versione != last_id:
+                last_id = versione
+                prossimo_heartbeat = adesso + heartbeat
+                yield _format_event(versione, event)
+        if adesso >= prossimo_heartbeat:
+            prossimo_heartbeat = adesso + heartbeat
+            yield ": keep-alive\n\n"
+        if adesso >= fine:
+            return
+
+        generazione = _wait_for_notification(vista, min(prossimo_controllo, prossimo_heartbeat, fine) - adesso)
+        if generazione != vista:
+            vista = generazione
+            prossimo_controllo = time.monotonic()
+
+def register_push_routes(server):
+    """Registra l'endpoint SSE sul server Flask"""
+
+    @server.route("/alerts/stream")
+    def alerts_stream():
+        if not current_user.is_authenticated or current_user.role != 'Medico':
+            return Response(status=403)
+
+        # Worker sincrono (un solo thread) o connessioni esaurite: la dashboard usa il polling
+        if not request.environ.get("wsgi.multithread") or not _slots.acquire(blocking=False):
+            return Response(status=503)
+
+        response = Response(
+            event_stream(current_user.username,
+                         last_id=_parse_last_event_id(request.headers.get("Last-Event-ID"))),
+            mimetype="text/event-stream"
+        )
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["X-Accel-Buffering"] = "no"
+        # Rilasciato alla chiusura della risposta, anche se lo stream non è mai partito
+        response.call_on_close(_slots.release)
+        return response
@@ -0,0 +1,99 @@
+# controller/severity.py
+"""Classificazione vettoriale della gravità glicemica.
+
+Le soglie sono le stesse usate per gli alert del medico, applicate in un
+solo passaggio su array di valori e momenti del pasto (NumPy) oppure
+direttamente in SQL con un'espressione CASE.
+
+Codici di gravità:
+    0 = nella norma, 1 = 'warning', 2 = 'danger-orange', 3 = 'danger'
+"""
+import numpy as np
+
+NORMALE, WARNING, DANGER_ORANGE, DANGER = 0, 1, 2, 3
+
+# Codice numerico -> tipo alert usato nella UI
+SEVERITY_NAMES = (None, 'warning', 'danger-orange', 'danger')
+SEVERITY_CODES = {name: code for code, name in enumerate(SEVERITY_NAMES) if name}
+
+# Colori dei punti nei grafici per codice di gravità
+SEVERITY_COLORS = ("#4C78A8", "#F2C94C", "#F58518", "#D62728")
+
+_PRE_PASTO = ("digiuno", "prima_pasto")
+_DOPO_PASTO = "dopo_pasto"
+
+
+def _as_float_array(valori):
+    """Converte i valori in float (NaN per valori mancanti o non numerici)"""
+    try:
+        return np.asarray(valori, dtype=float)
+    except (TypeError, ValueError):
+        out = []
+        for v in valori:
+            try:
+                out.append(float(v))
+            except (TypeError, ValueError):
+                out.append(np.nan)
+        return np.asarray(out, dtype=float)
+
+def _meal_masks(momenti, size):
+    """Maschere pre-pasto / dopo-pasto normalizzando una sola volta ogni momento distinto"""
+    if momenti is None:
+        return np.zeros(size, dtype=bool), np.zeros(size, dtype=bool)
+
+    raw = np.asarray([m or "" for m in momenti], dtype=str)
+    distinti, inverse = np.unique(raw, return_inverse=True)
+    normalizzati = np.array([m.strip().lower() for m in distinti], dtype=str)
+
+    pre = np.isin(normalizzati, _PRE_PASTO)[inverse]
+    dopo = (normalizzati == _DOPO_PASTO)[inverse]
+    return pre, dopo
+
+def classify_severity(valori, momenti=None):
+    """
+    Classifica in un passaggio un intero storico glicemico.
+
+    Args:
+        valori: sequenza di valori in mg/dL (None o non numerici = normale)
+        momenti: sequenza di momenti del pasto, stessa lunghezza di valori
+
+    Returns:
+        np.ndarray int8 con i codici di gravità
+    """
+    v = _as_float_array(valori)
+    pre, dopo = _meal_masks(momenti, v.size)
+
+    def tra(lo, hi):
+        return (v >= lo) & (v <= hi)
+
+    # Le condizioni sono valutate in ordine: vince la gravità più alta
+    critico = (v < 54) | (v > 250) | (pre & (v > 200))
+    moderato = tra(54, 69) | (pre & tra(151, 200)) | (dopo & tra(201, 250))
+    lieve = tra(70, 90) | (pre & tra(131, 150)) | (dopo & tra(181, 200))
+
+    return np.select([critico, moderato, lieve], [DANGER, DANGER_ORANGE, WARNING],
+                     default=NORMALE).astype(np.int8)
+
+def severity_names(codes):
+    """Converte i codici numerici nei tipi alert ('warning', ... o None)"""
+    return [SEVERITY_NAMES[c] for c in codes]
+
+def severity_colors(codes):
+    """Colore di ogni punto del grafico in base alla gravità"""
+    return [SEVERITY_COLORS[c] for c in codes]
+
+def severity_case_sql(valore="valore", momento="momento_pasto"):
+    """Espressione SQL CASE equivalente a classify_severity (colonne indicate)"""
+    m = f"LOWER(TRIM(COALESCE({momento}, '')))"
+    pre = f"{m} IN ('digiuno', 'prima_pasto')"
+    dopo = f"{m} = 'dopo_pasto'"
+    return (
+        "CASE"
+        f" WHEN {valore} IS NULL THEN {NORMALE}"
+        f" WHEN {valore} < 54 OR {valore} > 250 OR ({pre} AND {valore} > 200) THEN {DANGER}"
+        f" WHEN ({valore} BETWEEN 54 AND 69) OR ({pre} AND {valore} BETWEEN 151 AND 200)"
+        f" OR ({dopo} AND {valore} BETWEEN 201 AND 250) THEN {DANGER_ORANGE}"
+        f" WHEN ({valore} BETWEEN 70 AND 90) OR ({pre} AND {valore} BETWEEN 131 AND 150)"
+        f" OR ({dopo} AND {valore} BETWEEN 181 AND 200) THEN {WARNING}"
+        f" ELSE {NORMALE} END"
+    )
@@ -0,0 +1,207 @@
+# controller/timeline.py
+"""Timeline delle singole misurazioni glicemiche con sottocampionamento.
+
+Se nell'intervallo visibile ci sono più di TIMELINE_MAX_POINTS misure,
+l'intervallo viene diviso in TIMELINE_MAX_POINTS / 2 fasce di tempo e per
+ognuna SQLite restituisce solo la misura minima e quella massima: picchi e
+ipoglicemie restano visibili e il grafico non supera mai il limite di punti.
+Zoomando (relayoutData) la stessa query viene ripetuta sul nuovo intervallo,
+quindi il dettaglio aumenta fino alle misure reali.
+
+Con l'archivio colonnare attivo (model.colonnare) intervallo e fasce sono
+calcolati sugli array mappati in memoria con lo stesso risultato: a ogni
+zoom il database legge solo la versione dei dati del paziente.
+"""
+from datetime import datetime
+import math
+
+import numpy as np
+import plotly.graph_objects as go
+
+from model.database import db, sql_datetime
+from model.colonnare import load_readings, decode_momenti, to_seconds
+from controller.severity import severity_case_sql, classify_severity, SEVERITY_COLORS
+from controller.figures import new_figure
+
+TIMELINE_MAX_POINTS = 2000
+
+EMPTY_TIMELINE = {"x": [], "y": [], "severita": [], "totale": 0, "campionato": False}
+
+_SEVERITA = severity_case_sql("valore", "momento_pasto")
+_FILTRO = "paziente = $paziente AND data_ora >= $start AND data_ora <= $end"
+
+
+def _parse_datetime(value):
+    """Datetime da stringa ISO (anche solo data) o None"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).strip().replace("T", " "))
+    except ValueError:
+        return None
+
+def relayout_range(relayout):
+    """
+    Intervallo dell'asse x dopo uno zoom del grafico.
+
+    Returns:
+        (start, end) oppure (None, None) se la vista copre tutto lo storico
+    """
+    if not relayout or relayout.get("xaxis.autorange"):
+        return None, None
+
+    start, end = relayout.get("xaxis.range[0]"), relayout.get("xaxis.range[1]")
+    if start is None and isinstance(relayout.get("xaxis.range"), list):
+        start, end = relayout["xaxis.range"][:2]
+
+    start, end = _parse_datetime(start), _parse_datetime(end)
+    if start is None or end is None or start >= end:
+        return None, None
+    return start, end
+
+def _history_bounds(paziente_username):
+    """Prima e ultima misurazione del paziente (lette dalla chiave primaria)"""
+    row = db.select(
+        'SELECT MIN(data_ora), MAX(data_ora) FROM "Glicemia" WHERE paziente = $paziente',
+        {"paziente": paziente_username}
+    )[0]
+    return _parse_datetime(row[0]), _parse_datetime(row[1])
+
+def timeline_raw_sql():
+    """Tutte le misure dell'intervallo con il codice di gravità"""
+    return (
+        f'SELECT data_ora, valore, {_SEVERITA} FROM "Glicemia" '
+        f"WHERE {_FILTRO} ORDER BY data_ora"
+    )
+
+def timeline_minmax_sql():
+    """
+    Misura minima e massima di ogni fascia ($j0 = inizio in giorni giuliani,
+    $scale = fasce per giorno, $ultima = indice dell'ultima fascia).
+    """
+    # Le misure esattamente alla fine dell'intervallo restano nell'ultima fascia
+    fascia = "MIN(CAST((julianday(data_ora) - $j0) * $scale AS INTEGER), $ultima)"
+
+    def estremo(agg):
+        # Le colonne non aggregate vengono dalla riga del minimo/massimo
+        return (
+            f'SELECT data_ora, {agg}(valore) AS v, {_SEVERITA} AS sev FROM "Glicemia" '
+            f"WHERE {_FILTRO} GROUP BY {fascia}"
+        )
+
+    return f"SELECT data_ora, v, sev FROM ({estremo('MIN')} UNION {estremo('MAX')}) ORDER BY data_ora"
+
+def _timeline_from_readings(letture, start, end, max_points):
+    """Come load_timeline, sulle colonne dell'archivio colonnare"""
+    tempi = letture["tempi"]
+    if not len(tempi):
+        return dict(EMPTY_TIMELINE)
+
+    # Secondi dal 1970 come i tempi salvati (start ed end con i microsecondi, come in SQL)
+    t_start = to_seconds(start) + start.microsecond / 1e6 if start else float(tempi[0].astype("<i8"))
+    t_end = to_seconds(end) + end.microsecond / 1e6 if end else float(tempi[-1].astype("<i8"))
+    i0 = np.searchsorted(tempi, np.datetime64(math.ceil(t_start), "s"), side="left")
+    i1 = np.searchsorted(tempi, np.datetime64(math.floor(t_end), "s"), side="right")
+    totale = int(max(i1 - i0, 0))
+    campionato = totale > max_points
+
+    # Viste sull'intervallo, senza copie
+    tempi, valori, momenti = (letture[k][i0:i1] for k in ("tempi", "valori", "momenti"))
+    if campionato:
+        fasce = max(max_points // 2, 1)
+        durata = max(t_end - t_start, 86400 * 1e-9)
+        secondi = tempi.astype("<i8") - t_start
+        indici = np.minimum((secondi * (fasce / durata)).astype(np.int64), fasce - 1)
+        # Posizioni del minimo e del massimo di ogni fascia
+        ordine = np.lexsort((valori, indici))
+        ordinati = indici[ordine]
+        primi = np.flatnonzero(np.r_[True, ordinati[1:] != ordinati[:-1]])
+        ultimi = np.r_[primi[1:], len(ordine)] - 1
+        posizioni = np.unique(np.concatenate([ordine[primi], ordine[ultimi]]))
+    else:
+        posizioni = slice(None)
+
+    valori = np.asarray(valori[posizioni])
+    return {
+        "x": tempi[posizioni].astype("datetime64[us]").tolist(),
+        "y": valori.tolist(),
+        "severita": classify_severity(valori, decode_momenti(momenti[posizioni])).tolist(),
+        "totale": totale,
+        "campionato": campionato,
+    }
+
+def load_timeline(paziente_username, start=None, end=None, max_points=TIMELINE_MAX_POINTS):
+    """
+    Misure del paziente nell'intervallo, sottocampionate se troppe.
+
+    Returns:
+        dict con 'x', 'y', 'severita' (liste), 'totale' (misure nell'intervallo)
+        e 'campionato' (True se sono state ridotte a min/max per fascia)
+    """
+    letture = load_readings(paziente_username)
+    if letture is not None:
+        return _timeline_from_readings(letture, start, end, max_points)
+
+    first, last = _history_bounds(paziente_username)
+    if first is None:
+        return dict(EMPTY_TIMELINE)
+
+    start = start or first
+    end = end or last
+    params = {"paziente": paziente_username, "start": sql_datetime(start), "end": sql_datetime(end)}
+
+    totale = db.select(f'SELECT COUNT(*) FROM "Glicemia" WHERE {_FILTRO}', params)[0]
+    campionato = totale > max_points
+
+    if campionato:
+        giorni = max((end - start).total_seconds() / 86400, 1e-9)
+        params["j0"] = db.select("SELECT julianday($start)", params)[0]
+        fasce = max(max_points // 2, 1)
+        params["scale"] = fasce / giorni
+        params["ultima"] = fasce - 1
+        rows = db.select(timeline_minmax_sql(), params)
+    else:
+        rows = db.select(timeline_raw_sql(), params)
+
+    return {
+        "x": [_parse_datetime(r[0]) for r in rows],
+        "y": [r[1] for r in rows],
+        "severita": [r[2] for r in rows],
+        "totale": totale,
+        "campionato": campionato,
+    }
+
+def create_timeline_figure(data, start=None, end=None, empty_message="Nessuna glicemia registrata",
+                           uirevision="timeline"):
+    """
+    Grafico della timeline: linea grigia e punti colorati per gravità.
+    Lo zoom dell'utente viene mantenuto finché uirevision non cambia (es. altro paziente).
+    """
+    fig = new_figure(showlegend=False, uirevision=uirevision)
+    # Scala 0-300 come gli altri grafici, allargata se ci sono valori più alti
+    fig.update_yaxes(range=[0, max([300] + [v + 20 for v in data["y"] if v is not None])], title="mg/dL")
+
+    if data["x"]:
+        fig.add_trace(go.Scattergl(
+            x=data["x"], y=data["y"],
+            mode="lines+markers", name="Misurazioni",
+            line=dict(color="rgba(120,120,120,0.5)", width=1),
+            marker=dict(size=5, color=[SEVERITY_COLORS[s] for s in data["severita"]]),
+            hovertemplate="%{x|%d/%m/%Y %H:%M}<br>%{y:.0f} mg/dL<extra></extra>"
+        ))
+        if data["campionato"]:
+            fig.add_annotation(
+                text=f"{len(data['x'])} punti (min/max) su {data['totale']} misure: zoom per il dettaglio",
+                xref="paper", yref="paper", x=1, y=1.08, showarrow=False, font=dict(size=11, color="gray"),
+                xanchor="right"
+            )
+    else:
+        fig.add_annotation(text=empty_message, xref="paper", yref="paper",
+                           x=0.5, y=0.5, showarrow=False)
+
+    if start and end:
+        fig.update_xaxes(range=[start, end])
+
+    return fig
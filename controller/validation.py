@@ -0,0 +1,50 @@
+# controller/validation.py
+"""Regole di validazione condivise dai form e dall'importazione da file.
+
+Le funzioni restituiscono il testo dell'errore (None se il dato è valido):
+i form lo mostrano con get_error_message, l'importazione lo registra per riga.
+"""
+from datetime import datetime, date
+
+VALIDATION_LIMITS = {
+    'MIN_YEAR': 1900,
+    'MIN_NAME_LENGTH': 2,
+    'MIN_DESCRIPTION_LENGTH': 2
+}
+
+MOMENTI_PASTO = ('digiuno', 'prima_pasto', 'dopo_pasto')
+
+
+def date_error(date_string, field_name, today=None):
+    """Data ('YYYY-MM-DD' o date già letta) non futura e non precedente a MIN_YEAR"""
+    if isinstance(date_string, date):
+        data_obj = date_string
+    else:
+        try:
+            data_obj = datetime.strptime(date_string, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            return "Formato data non valido!"
+
+    today = today or datetime.now().date()
+    min_date = datetime(VALIDATION_LIMITS['MIN_YEAR'], 1, 1).date()
+
+    if data_obj > today:
+        return f"La data di {field_name} non può essere nel futuro!"
+    if data_obj < min_date:
+        return f"La data di {field_name} non può essere precedente al {VALIDATION_LIMITS['MIN_YEAR']}!"
+    return None
+
+def glicemia_error(valore, data_misurazione, ora, momento_pasto, due_ore_pasto, today=None):
+    """Regole di una misurazione glicemica (form e importazione)"""
+    if not all([valore, data_misurazione, ora, momento_pasto]):
+        return "Per favore compila tutti i campi obbligatori!"
+
+    error = date_error(data_misurazione, "misurazione", today)
+    if error:
+        return error
+
+    # Campo "due ore dopo pasto"
+    if momento_pasto == 'dopo_pasto' and due_ore_pasto is None:
+        return "Per favore specifica se sono passate almeno due ore dal pasto!"
+
+    return None
@@ -0,0 +1,147 @@
+# manage.py
+"""Comandi di manutenzione del database.
+
+Uso:
+    python manage.py seed
+    python manage.py rebuild-rollups [--paziente USERNAME]
+    python manage.py rebuild-columns [--paziente USERNAME]
+    python manage.py compact-columns
+    python manage.py import-glicemie USERNAME FILE.csv [--momento digiuno]
+    python manage.py export DATASET (--paziente USERNAME | --medico USERNAME) [-o FILE.csv]
+
+Con -q/--quiet (prima del comando) vengono stampati solo gli errori di avvio.
+"""
+import argparse
+import sys
+
+
+def cmd_seed(args):
+    """Crea gli utenti iniziali in un database vuoto"""
+    from model.operations import initialize_db
+
+    initialize_db()
+    return 0
+
+
+def cmd_rebuild_rollups(args):
+    """Ricostruisce gli aggregati glicemici dallo storico"""
+    from model.rollup import rebuild_rollups
+
+    righe = rebuild_rollups(args.paziente)
+    target = f"paziente {args.paziente}" if args.paziente else "tutti i pazienti"
+    print(f"Aggregati glicemici ricostruiti per {target}: {righe} righe")
+    return 0
+
+
+def cmd_rebuild_columns(args):
+    """Ricostruisce l'archivio colonnare delle glicemie da SQLite"""
+    from model.colonnare import rebuild_column_store, COLUMN_STORE_ENV
+
+    misure = rebuild_column_store(args.paziente)
+    if misure is None:
+        print(f"Archivio colonnare non configurato: impostare {COLUMN_STORE_ENV}")
+        return 1
+    print(f"Archivio colonnare ricostruito: {misure} misure")
+    return 0
+
+
+def cmd_compact_columns(args):
+    """Fonde i log dell'archivio colonnare nei file base"""
+    from model.colonnare import get_column_store, COLUMN_STORE_ENV
+
+    store = get_column_store()
+    if store is None:
+        print(f"Archivio colonnare non configurato: impostare {COLUMN_STORE_ENV}")
+        return 1
+    pazienti = store.usernames()
+    for username in pazienti:
+        store.compact(username)
+    print(f"Archivio colonnare compattato per {len(pazienti)} pazienti")
+    return 0
+
+
+def cmd_import_glicemie(args):
+    """Importa le glicemie di un paziente da un file CSV"""
+    from controller.glicemia_import import import_glicemie
+
+    try:
+        with open(args.file, encoding="utf-8-sig", errors="replace", newline="") as f:
+            esito = import_glicemie(args.paziente, f, default_momento=args.momento)
+    except (OSError, ValueError) as e:
+        print(f"Importazione non riuscita: {e}")
+        return 1
+
+    print(f"Righe lette: {esito['righe']} - inserite: {esito['inserite']}, "
+          f"già presenti: {esito['duplicate']}, scartate: {esito['scartate']}")
+    for riga, errore in esito["errori"]:
+        print(f"  riga {riga}: {errore}")
+    return 0
+
+
+def cmd_export(args):
+    """Esporta in CSV un dataset di un paziente o di tutti i pazienti di un medico"""
+    from controller.export import iter_csv, panel_usernames
+
+    pazienti = [args.paziente] if args.paziente else panel_usernames(args.medico)
+    out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        for blocco in iter_csv(args.dataset, pazienti):
+            out.write(blocco)
+    finally:
+        if args.output:
+            out.close()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Comandi di manutenzione dash_app")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Stampa solo gli errori all'avvio")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("seed", help="Crea gli utenti iniziali (amministratori, pazienti e medici di esempio)")
+    p.set_defaults(func=cmd_seed)
+
+    p = sub.add_parser("rebuild-rollups", help="Ricostruisce gli aggregati giornalieri, settimanali e mensili (e le metriche)")
+    p.add_argument("--paziente", help="Username del paziente (default: tutti)")
+    p.set_defaults(func=cmd_rebuild_rollups)
+
+    p = sub.add_parser("rebuild-columns", help="Ricostruisce l'archivio colonnare delle glicemie")
+    p.add_argument("--paziente", help="Username del paziente (default: tutti)")
+    p.set_defaults(func=cmd_rebuild_columns)
+
+    p = sub.add_parser("compact-columns", help="Compatta l'archivio colonnare delle glicemie")
+    p.set_defaults(func=cmd_compact_columns)
+
+    p = sub.add_parser("import-glicemie", help="Importa le glicemie di un paziente da CSV (glucometro o CGM)")
+    p.add_argument("paziente", help="Username del paziente")
+    p.add_argument("file", help="File CSV")
+    # "dopo_pasto" richiede anche l'indicazione delle due ore, che un export CGM non ha
+    p.add_argument("--momento", choices=("digiuno", "prima_pasto"),
+                   help="Momento del pasto per le righe che non lo indicano (es. export CGM)")
+    p.set_defaults(func=cmd_import_glicemie)
+
+    p = sub.add_parser("export", help="Esporta in CSV i dati di un paziente o dei pazienti di un medico")
+    p.add_argument("dataset", choices=("glicemie", "assunzioni", "sintomi", "terapie"))
+    scope = p.add_mutually_exclusive_group(required=True)
+    scope.add_argument("--paziente", help="Username del paziente")
+    scope.add_argument("--medico", help="Username del medico (tutti i pazienti seguiti)")
+    p.add_argument("-o", "--output", help="File di destinazione (default: stdout)")
+    p.set_defaults(func=cmd_export)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    # Import qui: collega il database solo quando serve davvero
+    import model
+    # Il CSV esportato su stdout non deve contenere i messaggi di avvio
+    quiet = args.quiet or (args.command == "export" and not args.output)
+    if not model.init_app(quiet=quiet):
+        return 1
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,41 +1,23 @@
-from .database import db, configure_db
-
-# Configura il database per primo
-db_path = configure_db()
-#genero un commento per vedere se funziona comit e push
-# Solo se la configurazione è riuscita, procedi
-if db_path is not None:
-    # Poi importa tutte le entità
-    from .user import User
-    from .paziente import Paziente
-    from .medico import Medico
-    from .glicemia import Glicemia
-    from .assunzione import Assunzione
-    from .sintomi import Sintomi
-    from .terapia import Terapia
-
-    # Debug: stampa gli attributi delle entità
-    print("=== Debug Entity Attributes ===")
-    print(f"User attributes: {[attr.name for attr in User._attrs_]}")
-    print(f"Paziente attributes: {[attr.name for attr in Paziente._attrs_]}")
-    print(f"Medico attributes: {[attr.name for attr in Medico._attrs_]}")
-    print("=== End Debug ===")
-
-    # Ora genera il mapping e crea le tabelle
-    try:
-        db.generate_mapping(create_tables=True)
-        print(f"Database tables created successfully at: {db_path}")
-        
-        # Infine inizializza i dati
-        from .operations import initialize_db
-        initialize_db()
-        
-    except Exception as e:
-        print(f"Error creating tables: {e}")
-        import traceback
-        traceback.print_exc()
-else:
-    print("Database configuration failed, skipping table creation")
+"""Modello dati (Pony ORM su SQLite).
+
+L'import del package definisce solo le entità: il collegamento al database,
+il mapping e le migrazioni avvengono in init_app(), chiamata una volta
+all'avvio dall'applicazione, dai comandi di manage.py e dai test.
+Gli utenti iniziali si creano con `python manage.py seed`.
+"""
+from .database import db, configure_db, set_quiet, log
+
+# Entità (la definizione non richiede un database collegato)
+from .user import User
+from .paziente import Paziente
+from .medico import Medico
+from .glicemia import Glicemia
+from .assunzione import Assunzione
+from .sintomi import Sintomi
+from .terapia import Terapia
+from .alert import Alert, AlertStato
+from .versione import VersioneDati, VersioneUtenti, VersioneAlertMedico
+from .rollup import GlicemiaRollup
 
 # Import delle funzioni di operations per renderle disponibili
 from .operations import (
@@ -45,11 +27,62 @@ from .operations import (
     add_user,
     delete_user,
     get_user_by_username,
-    validate_user
+    validate_user,
+    initialize_db
 )
 
+
+def init_app(filename=None, create_tables=True, quiet=None):
+    """
+    Collega il database, genera il mapping e applica le migrazioni.
+    Le chiamate successive alla prima non fanno nulla.
+
+    Args:
+        filename: file SQLite (default data/dash_app.sqlite, ':memory:' per i test)
+        create_tables: crea le tabelle mancanti
+        quiet: se True stampa solo gli errori (default: variabile GLICEMIA_QUIET)
+
+    Returns:
+        True se il database è pronto
+    """
+    if quiet is not None:
+        set_quiet(quiet)
+    if db.schema is not None:
+        return True
+
+    db_path = configure_db(filename)
+    if db_path is None:
+        print("Database configuration failed, skipping table creation")
+        return False
+
+    try:
+        # Le migrazioni possono aggiungere colonne a tabelle esistenti:
+        # il controllo dello schema avviene dopo averle applicate
+        db.generate_mapping(create_tables=False, check_tables=False)
+        if create_tables:
+            db.create_tables()
+            log(f"Database tables created successfully at: {db_path}")
+
+        # Indici e modifiche a database già esistenti
+        from .migrations import run_migrations
+        run_migrations()
+        db.check_tables()
+    except Exception as e:
+        print(f"Error creating tables: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+    if filename != ':memory:':
+        # Chiude la connessione del processo principale: i worker creati
+        # con fork (es. gunicorn --preload) ne aprono una propria
+        db.disconnect()
+    return True
+
+
 __all__ = [
-    'db', 'User', 'Paziente', 'Medico', 'Glicemia', 'Assunzione', 'Sintomi', 'Terapia',
+    'db', 'init_app', 'User', 'Paziente', 'Medico', 'Glicemia', 'Assunzione', 'Sintomi', 'Terapia', 'Alert', 'AlertStato', 'VersioneDati', 'VersioneUtenti', 'VersioneAlertMedico', 'GlicemiaRollup',
     'assign_doctor_to_patient','get_user_by_username', 'add_user', 'validate_user', 'delete_user',
-    'get_patient_doctors', 'get_doctor_patients', 'delete_user_with_relations', 'get_all_users_for_dropdown', 'check_user_relations'
-]
\ No newline at end of file
+    'get_patient_doctors', 'get_doctor_patients', 'delete_user_with_relations', 'get_all_users_for_dropdown', 'check_user_relations',
+    'initialize_db'
+]
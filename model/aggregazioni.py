@@ -0,0 +1,74 @@
+# model/aggregazioni.py
+"""Aggregazioni delle glicemie calcolate direttamente in SQLite.
+
+Una sola query GROUP BY per periodo restituisce conteggio, somma, minimo,
+massimo, somma dei quadrati e misure per fascia di valori di ogni
+intervallo: nessun oggetto Glicemia viene caricato. I filtri su paziente
+e intervallo di date usano la chiave primaria (paziente, data_ora).
+"""
+from datetime import date, datetime
+
+from .database import db
+
+# Soglie delle fasce (mg/dL, consenso internazionale sul time-in-range)
+SOGLIA_MOLTO_BASSA = 54
+TIR_MIN, TIR_MAX = 70, 180
+SOGLIA_MOLTO_ALTA = 250
+
+# Contatori delle fasce, nell'ordine delle colonne di fasce_sql()
+FASCE = ("sotto_54", "sotto_70", "in_range", "sopra_180", "sopra_250")
+
+# Espressione SQLite dell'inizio periodo a partire da data_ora
+SQL_INIZIO_PERIODO = {
+    'giorno': "date(data_ora)",
+    'settimana': "date(data_ora, 'weekday 0', '-6 days')",  # lunedì della settimana
+    'mese': "date(data_ora, 'start of month')",
+}
+
+
+def _as_datetime(giorno):
+    """Le date diventano la mezzanotte del giorno"""
+    if isinstance(giorno, datetime):
+        return giorno
+    return datetime(giorno.year, giorno.month, giorno.day)
+
+def fasce(valore):
+    """Contributo di una misura ai contatori delle fasce"""
+    return {
+        "sotto_54": int(valore < SOGLIA_MOLTO_BASSA),
+        "sotto_70": int(valore < TIR_MIN),            # comprende anche le misure sotto 54
+        "in_range": int(TIR_MIN <= valore <= TIR_MAX),
+        "sopra_180": int(valore > TIR_MAX),           # comprende anche le misure sopra 250
+        "sopra_250": int(valore > SOGLIA_MOLTO_ALTA),
+    }
+
+def fasce_sql():
+    """Contatori delle fasce in una GROUP BY sulle glicemie (stesso ordine di FASCE)"""
+    return (
+        f"SUM(valore < {SOGLIA_MOLTO_BASSA}), SUM(valore < {TIR_MIN}), "
+        f"SUM(valore BETWEEN {TIR_MIN} AND {TIR_MAX}), "
+        f"SUM(valore > {TIR_MAX}), SUM(valore > {SOGLIA_MOLTO_ALTA})"
+    )
+
+def bucket_stats_sql(periodo):
+    """Query GROUP BY per periodo con parametri $paziente, $start e $end"""
+    inizio = SQL_INIZIO_PERIODO[periodo]
+    return (
+        f"SELECT {inizio} AS inizio, COUNT(*), SUM(valore), MIN(valore), MAX(valore), "
+        f"SUM(valore * valore), {fasce_sql()} FROM \"Glicemia\" "
+        f"WHERE paziente = $paziente AND data_ora >= $start AND data_ora < $end "
+        f"AND valore IS NOT NULL "
+        f"GROUP BY inizio ORDER BY inizio"
+    )
+
+def bucket_stats(paziente_username, periodo, start, end):
+    """
+    Statistiche per periodo delle glicemie con data_ora in [start, end).
+
+    Returns:
+        lista di tuple (inizio, conteggio, somma, minimo, massimo, somma_quadrati,
+        seguite dai contatori di FASCE) ordinate per inizio
+    """
+    params = {"paziente": paziente_username, "start": _as_datetime(start), "end": _as_datetime(end)}
+    rows = db.select(bucket_stats_sql(periodo), params)
+    return [(date.fromisoformat(inizio),) + tuple(stats) for inizio, *stats in rows]
@@ -0,0 +1,26 @@
+# model/alert.py
+from datetime import datetime, date
+from pony.orm import Required, Optional, PrimaryKey, Json, composite_index
+from .database import db
+from .paziente import Paziente
+
+class Alert(db.Entity):
+    """Alert per i medici, mantenuti dal motore alert ad ogni scrittura"""
+    id = PrimaryKey(int, auto=True)
+    paziente = Required(Paziente)  # Relazione con paziente
+
+    # Dati dell'alert
+    categoria = Required(str)  # 'glicemia', 'terapia'
+    tipo = Required(str)  # 'danger', 'danger-orange', 'warning'
+    data_ora = Required(datetime)  # data della misurazione o del calcolo aderenza
+    dati = Required(Json)  # dizionario dell'alert già pronto per la UI
+
+    composite_index(paziente, data_ora)
+
+
+class AlertStato(db.Entity):
+    """Stato del motore alert per ogni paziente"""
+    paziente = Required(Paziente)
+
+    # Giorno dell'ultimo ricalcolo degli alert di aderenza terapeutica
+    terapie_calcolate_il = Optional(date)
@@ -2,6 +2,7 @@ from datetime import datetime
 from pony.orm import Required, Optional, Set, PrimaryKey
 from .database import db
 from .paziente import Paziente
+from .versione import bump_version
 
 class Assunzione(db.Entity):
     """Entità per le assunzioni di farmaci"""
@@ -15,4 +16,14 @@ class Assunzione(db.Entity):
     # Campi opzionali
     note = Optional(str)
 
-    PrimaryKey(paziente, data_ora, nome_farmaco)  # Chiave composta per permettere più farmaci alla stessa data/ora
\ No newline at end of file
+    PrimaryKey(paziente, data_ora, nome_farmaco)  # Chiave composta per permettere più farmaci alla stessa data/ora
+
+    # Ogni scrittura invalida le cache che dipendono dai dati del paziente
+    def before_insert(self):
+        bump_version(self.paziente)
+
+    def before_update(self):
+        bump_version(self.paziente)
+
+    def before_delete(self):
+        bump_version(self.paziente)
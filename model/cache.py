@@ -0,0 +1,66 @@
+# model/cache.py
+"""Cache LRU in memoria, thread-safe e a dimensione limitata."""
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Cache con al massimo maxsize elementi: oltre il limite esce il meno usato.
+    Con ttl (secondi) gli elementi scadono anche per tempo.
+    """
+
+    def __init__(self, maxsize=128, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # chiave -> (valore, scadenza o None)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Restituisce il valore e lo marca come usato di recente"""
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            value, expires = item
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """Inserisce o aggiorna un valore, eliminando il meno usato se pieno"""
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """Rimuove una chiave"""
+        with self._lock:
+            item = self._data.pop(key, _MISSING)
+            return default if item is _MISSING else item[0]
+
+    def clear(self):
+        """Svuota la cache"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def __contains__(self, key):
+        """True se la chiave è presente e non scaduta (senza marcarla come usata)"""
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return False
+            expires = item[1]
+            return expires is None or expires > time.monotonic()
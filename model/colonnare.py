@@ -0,0 +1,335 @@
+# model/colonnare.py
+"""Archivio colonnare opzionale delle glicemie (array NumPy mappati in memoria).
+
+SQLite resta la fonte dei dati: questo archivio ne è una copia per paziente
+letta dalla timeline (controller.timeline), che seleziona l'intervallo
+visibile e lo sottocampiona su array senza interrogare il database. È attivo
+solo se la variabile d'ambiente GLICEMIA_COLUMN_STORE indica una cartella.
+
+Per ogni paziente ci sono due file di record (tempo, valore, momento):
+    base.bin  ordinato per tempo, riscritto solo dalla compattazione
+    log.bin   nuove misure in coda (append-only)
+Quando il log supera COMPACT_THRESHOLD record viene fuso nella base
+(anche con `python manage.py compact-columns`).
+
+Accanto ai record è salvata la versione dei dati del paziente (VersioneDati)
+a cui l'archivio corrisponde. Il salvataggio dal form aggiunge la misura
+solo se l'archivio era allineato alla versione precedente; ogni altra
+scrittura (importazione CSV, modifiche, cancellazioni, rollback) lascia
+l'archivio indietro e load_readings lo ricostruisce da SQLite alla prima
+lettura: i lettori non vedono mai dati diversi dal database.
+"""
+import os
+import re
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from .database import db
+
+try:
+    import fcntl  # lock tra processi (solo POSIX)
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+COLUMN_STORE_ENV = "GLICEMIA_COLUMN_STORE"
+COMPACT_THRESHOLD = 4096
+
+RECORD_DTYPE = np.dtype([("t", "<i8"), ("v", "<f8"), ("m", "i1")])
+
+# Codice del momento del pasto salvato nella colonna 'm' (-1 = non riconosciuto)
+MOMENTI = ("digiuno", "prima_pasto", "dopo_pasto")
+_MOMENTO_CODE = {m: i for i, m in enumerate(MOMENTI)}
+
+_BASE = "base.bin"
+_LOG = "log.bin"
+_VERSIONE = "versione"
+
+_VERSION_SQL = 'SELECT valore FROM "VersioneDati" WHERE paziente = $paziente'
+
+
+def to_seconds(data_ora):
+    """Datetime -> secondi dal 1970 (orario locale come salvato nel database)"""
+    return int(np.datetime64(data_ora.replace(microsecond=0), "s").astype("<i8"))
+
+def encode_momento(momento):
+    return _MOMENTO_CODE.get((momento or "").strip().lower(), -1)
+
+def decode_momenti(codes):
+    """Codici della colonna 'm' -> stringhe per classify_severity"""
+    nomi = np.array(MOMENTI + ("",), dtype=object)
+    return nomi[np.where(codes < 0, len(MOMENTI), codes)]
+
+def make_records(tempi, valori, momenti):
+    """Array di record da sequenze di datetime, valori e momenti"""
+    records = np.empty(len(valori), dtype=RECORD_DTYPE)
+    records["t"] = [to_seconds(t) for t in tempi]
+    records["v"] = valori
+    records["m"] = [encode_momento(m) for m in momenti]
+    return records
+
+
+class ColumnStore:
+    """Cartella con un archivio append-only per paziente"""
+
+    def __init__(self, root, compact_threshold=COMPACT_THRESHOLD):
+        self.root = root
+        self.compact_threshold = compact_threshold
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, username):
+        return os.path.join(self.root, re.sub(r"[^\w.-]", "_", username))
+
+    @contextmanager
+    def _locked(self, username):
+        """Lock per paziente tra thread e, dove possibile, tra processi"""
+        cartella = self._dir(username)
+        os.makedirs(cartella, exist_ok=True)
+        with self._lock:
+            if fcntl is None:
+                yield cartella
+                return
+            with open(os.path.join(cartella, ".lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield cartella
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _map(path):
+        """
+        Base mappata in sola lettura (array vuoto se assente). La base viene
+        sostituita con os.replace, mai riscritta: una mappa già aperta resta valida.
+        """
+        if not os.path.exists(path) or os.path.getsize(path) < RECORD_DTYPE.itemsize:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        n = os.path.getsize(path) // RECORD_DTYPE.itemsize
+        return np.memmap(path, dtype=RECORD_DTYPE, mode="r", shape=(n,))
+
+    @staticmethod
+    def _read_log(path):
+        """Log copiato in memoria: viene troncato dalla compattazione, non si può mappare"""
+        if not os.path.exists(path):
+            return np.empty(0, dtype=RECORD_DTYPE)
+        with open(path, "rb") as f:
+            dati = f.read()
+        n = len(dati) // RECORD_DTYPE.itemsize
+        return np.frombuffer(dati, dtype=RECORD_DTYPE, count=n)
+
+    @staticmethod
+    def _read_version(cartella):
+        try:
+            with open(os.path.join(cartella, _VERSIONE)) as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_version(cartella, versione):
+        tmp = os.path.join(cartella, _VERSIONE + ".tmp")
+        with open(tmp, "w") as f:
+            f.write(str(versione))
+        os.replace(tmp, os.path.join(cartella, _VERSIONE))
+
+    def append(self, username, records, versione):
+        """
+        Aggiunge record in coda al log se l'archivio è alla versione
+        precedente a versione; compatta se il log è cresciuto troppo.
+
+        Returns:
+            True se i record sono stati aggiunti, False se l'archivio non
+            era allineato (verrà ricostruito alla prossima lettura)
+        """
+        records = np.asarray(records, dtype=RECORD_DTYPE)
+        with self._locked(username) as cartella:
+            if self._read_version(cartella) != versione - 1:
+                return False
+            log_path = os.path.join(cartella, _LOG)
+            with open(log_path, "ab") as f:
+                f.write(records.tobytes())
+            self._write_version(cartella, versione)
+            if os.path.getsize(log_path) // RECORD_DTYPE.itemsize >= self.compact_threshold:
+                self._compact(cartella)
+        return True
+
+    def read(self, username):
+        """
+        Storico del paziente ordinato per tempo e versione a cui corrisponde.
+
+        Con il log vuoto i record sono direttamente la base mappata in
+        memoria (nessuna copia); altrimenti base e log vengono uniti.
+
+        Returns:
+            (record, versione o None se l'archivio non esiste)
+        """
+        with self._locked(username) as cartella:
+            versione = self._read_version(cartella)
+            base = self._map(os.path.join(cartella, _BASE))
+            log = self._read_log(os.path.join(cartella, _LOG))
+        if not len(log):
+            return base, versione
+        return _merge(base, log), versione
+
+    def compact(self, username):
+        """Fonde il log nella base (ordinata e senza duplicati)"""
+        with self._locked(username) as cartella:
+            self._compact(cartella)
+
+    def _compact(self, cartella):
+        base_path, log_path = os.path.join(cartella, _BASE), os.path.join(cartella, _LOG)
+        log = self._read_log(log_path)
+        if not len(log):
+            return
+        self._write_base(cartella, _merge(self._map(base_path), log))
+
+    def _write_base(self, cartella, records):
+        base_path = os.path.join(cartella, _BASE)
+        tmp = base_path + ".tmp"
+        records.tofile(tmp)
+        os.replace(tmp, base_path)
+        open(os.path.join(cartella, _LOG), "wb").close()
+
+    def replace(self, username, records, versione):
+        """Sostituisce l'intero storico del paziente (ricostruzione da SQLite)"""
+        with self._locked(username) as cartella:
+            self._write_base(cartella, _merge(np.empty(0, dtype=RECORD_DTYPE), records))
+            self._write_version(cartella, versione)
+
+    def drop(self, username):
+        """Elimina l'archivio del paziente"""
+        with self._locked(username) as cartella:
+            for name in (_BASE, _LOG, _VERSIONE, _BASE + ".tmp", _VERSIONE + ".tmp"):
+                path = os.path.join(cartella, name)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def usernames(self):
+        return [d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d))]
+
+
+def _merge(base, log):
+    """Unione ordinata per tempo; a parità di tempo vince il record più recente"""
+    records = np.concatenate([np.asarray(base, dtype=RECORD_DTYPE), np.asarray(log, dtype=RECORD_DTYPE)])
+    if not len(records):
+        return records
+    # Ordinamento stabile: a parità di tempo i record del log restano dopo quelli della base
+    records = records[np.argsort(records["t"], kind="stable")]
+    ultimo = np.append(records["t"][1:] != records["t"][:-1], True)
+    return records[ultimo]
+
+
+# ===============================
+# ARCHIVIO CONFIGURATO
+# ===============================
+
+_store = None
+_store_root = None
+
+def get_column_store():
+    """Archivio indicato da GLICEMIA_COLUMN_STORE, None se non configurato"""
+    global _store, _store_root
+    root = os.environ.get(COLUMN_STORE_ENV)
+    if not root:
+        return None
+    if _store is None or _store_root != root:
+        _store, _store_root = ColumnStore(root), root
+    return _store
+
+def _data_version(paziente_username):
+    """Versione dei dati del paziente (0 se mai scritti), senza caricare entità"""
+    righe = db.select(_VERSION_SQL, {"paziente": paziente_username})
+    return righe[0] if righe else 0
+
+def mirror_glicemia(paziente_username, data_ora, valore, momento_pasto, versione):
+    """
+    Copia una misura appena salvata nell'archivio colonnare (se attivo).
+
+    Args:
+        versione: versione dei dati del paziente dopo il salvataggio
+    """
+    store = get_column_store()
+    if store is None:
+        return
+    try:
+        store.append(paziente_username, make_records([data_ora], [valore], [momento_pasto]), versione)
+    except OSError as e:
+        # L'archivio è una copia: l'errore non deve bloccare il salvataggio
+        print(f"Archivio colonnare non aggiornato per {paziente_username}: {e}")
+
+def drop_patient_columns(paziente_username):
+    store = get_column_store()
+    if store is not None:
+        store.drop(paziente_username)
+
+def _sql_records(paziente_username):
+    """Storico del paziente letto da SQLite senza creare oggetti Pony"""
+    rows = db.select(
+        'SELECT data_ora, valore, momento_pasto FROM "Glicemia" '
+        'WHERE paziente = $paziente ORDER BY data_ora',
+        {"paziente": paziente_username}
+    )
+    if not rows:
+        return np.empty(0, dtype=RECORD_DTYPE)
+    tempi, valori, momenti = zip(*rows)
+    records = np.empty(len(rows), dtype=RECORD_DTYPE)
+    records["t"] = np.array(tempi, dtype="datetime64[us]").astype("datetime64[s]").astype("<i8")
+    records["v"] = valori
+    records["m"] = [encode_momento(m) for m in momenti]
+    return records
+
+def load_readings(paziente_username):
+    """
+    Storico glicemico del paziente come colonne NumPy dall'archivio colonnare,
+    ricostruito da SQLite se non allineato alla versione dei dati (da chiamare
+    in una db_session).
+
+    Returns:
+        dict con 'tempi' (datetime64[s]), 'valori' (float64) e 'momenti'
+        (codici int8) ordinati per tempo, None se l'archivio non è configurato
+    """
+    store = get_column_store()
+    if store is None:
+        return None
+
+    # Versione letta prima dei record: una scrittura concorrente lascia l'archivio indietro, mai avanti
+    versione = _data_version(paziente_username)
+    records, salvata = store.read(paziente_username)
+    if salvata != versione:
+        records = _sql_records(paziente_username)
+        try:
+            store.replace(paziente_username, records, versione)
+        except OSError as e:
+            print(f"Archivio colonnare non aggiornato per {paziente_username}: {e}")
+
+    return {
+        "tempi": records["t"].view("datetime64[s]"),
+        "valori": records["v"],
+        "momenti": records["m"],
+    }
+
+def rebuild_column_store(paziente_username=None):
+    """
+    Ricostruisce l'archivio da SQLite (un paziente o tutti).
+
+    Returns:
+        numero di misure scritte, None se l'archivio non è configurato
+    """
+    from pony.orm import db_session, select
+    from .paziente import Paziente
+
+    store = get_column_store()
+    if store is None:
+        return None
+
+    with db_session:
+        usernames = [paziente_username] if paziente_username else select(p.username for p in Paziente)[:]
+        totale = 0
+        for username in usernames:
+            versione = _data_version(username)
+            records = _sql_records(username)
+            store.replace(username, records, versione)
+            totale += len(records)
+    return totale
@@ -5,38 +5,104 @@ import os
 # Initialize the database
 db = Database()
 
+# Profilo SQLite applicato a ogni nuova connessione (una per thread e per processo).
+# WAL: i lettori non bloccano lo scrittore e viceversa; con synchronous=NORMAL
+# il commit non attende il fsync (resta sicuro in WAL, si perde al massimo
+# l'ultimo commit in caso di crash del sistema). busy_timeout fa attendere
+# una scrittura concorrente invece di fallire subito con "database is locked".
+SQLITE_PRAGMAS = [
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("busy_timeout", 10000),        # ms
+    ("cache_size", -20000),         # negativo = KiB (20 MB per connessione)
+    ("mmap_size", 268435456),       # 256 MB letti via memoria condivisa
+    ("temp_store", "MEMORY"),
+]
+
+def apply_sqlite_pragmas(connection, pragmas=None):
+    """Applica il profilo SQLite a una connessione DB-API"""
+    cursor = connection.cursor()
+    for name, value in (SQLITE_PRAGMAS if pragmas is None else pragmas):
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+
+# Pony apre una nuova connessione anche nei processi figli (gunicorn):
+# quelle ereditate dal master non vengono riusate dopo il fork
+@db.on_connect(provider='sqlite')
+def _configure_sqlite_connection(db, connection):
+    apply_sqlite_pragmas(connection)
+
+# Modalità silenziosa (test, worker, comandi): solo gli errori vengono stampati.
+# Attivabile con GLICEMIA_QUIET=1 o con model.init_app(quiet=True)
+_quiet = os.environ.get("GLICEMIA_QUIET", "") not in ("", "0")
+
+def set_quiet(quiet):
+    global _quiet
+    _quiet = bool(quiet)
+
+def log(message):
+    """Messaggio informativo di avvio, omesso in modalità silenziosa"""
+    if not _quiet:
+        print(message)
+
+def sql_datetime(value):
+    """
+    Datetime nel formato in cui Pony lo salva in SQLite ('AAAA-MM-GG hh:mm:ss.ffffff').
+
+    Nelle query SQL dirette i datetime sono confrontati come stringhe:
+    sqlite3 omette i microsecondi nulli, quindi '... 08:00:00' risulterebbe
+    minore della stessa ora salvata da Pony ('... 08:00:00.000000').
+    """
+    return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+def default_db_path():
+    return os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'dash_app.sqlite')
+
 # Flag per evitare doppia configurazione
 _db_configured = False
 
 # Configure the database path - now in the data directory
-def configure_db():
+def configure_db(filename=None):
+    """
+    Collega il database al file indicato (default data/dash_app.sqlite,
+    ':memory:' per un database in memoria).
+
+    Returns:
+        percorso del database, None se già configurato o in caso di errore
+    """
     global _db_configured
     
     if _db_configured:
-        print("Database already configured, skipping...")
+        log("Database already configured, skipping...")
         return None
-        
-    data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+
+    if filename == ':memory:':
+        db.bind(provider='sqlite', filename=':memory:')
+        _db_configured = True
+        log("Database bound successfully (in memoria)")
+        return filename
+
+    db_path = filename or default_db_path()
+    data_dir = os.path.dirname(db_path)
     
     # Create data directory if it doesn't exist
     if not os.path.exists(data_dir):
         os.makedirs(data_dir)
-        print(f"Created data directory: {data_dir}")
+        log(f"Created data directory: {data_dir}")
         
-    db_path = os.path.join(data_dir, 'dash_app.sqlite')
-    print(f"Database path: {db_path}")
+    log(f"Database path: {db_path}")
     
     # Se il database esiste ma è vuoto/corrotto, rimuovilo
     if os.path.exists(db_path):
         file_size = os.path.getsize(db_path)
         if file_size == 0:
             os.remove(db_path)
-            print("Removed empty database file")
+            log("Removed empty database file")
     
     try:
         db.bind(provider='sqlite', filename=db_path, create_db=True)
         _db_configured = True
-        print("Database bound successfully")
+        log("Database bound successfully")
     except Exception as e:
         print(f"Error binding database: {e}")
         # Se c'è un errore, prova a rimuovere il database e ricreare
@@ -51,4 +117,4 @@ def configure_db():
                 print(f"Error binding database after cleanup: {e2}")
                 return None
     
-    return db_path
\ No newline at end of file
+    return db_path
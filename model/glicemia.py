@@ -2,6 +2,8 @@ from datetime import datetime
 from pony.orm import Required, Optional, Set, PrimaryKey
 from .database import db
 from .paziente import Paziente
+from .versione import bump_version
+from .rollup import add_reading, recompute_buckets
 
 class Glicemia(db.Entity):
     """Entità per le misurazioni della glicemia"""
@@ -17,4 +19,21 @@ class Glicemia(db.Entity):
     note = Optional(str)
 
     PrimaryKey(paziente, data_ora)
-    
\ No newline at end of file
+
+    # Ogni scrittura invalida le cache che dipendono dai dati del paziente
+    # e aggiorna gli aggregati giornalieri, settimanali e mensili (con i contatori delle metriche)
+    def before_insert(self):
+        bump_version(self.paziente)
+        add_reading(self.paziente, self.data_ora, self.valore)
+
+    def before_update(self):
+        bump_version(self.paziente)
+
+    def after_update(self):
+        recompute_buckets(self.paziente, self.data_ora)
+
+    def before_delete(self):
+        bump_version(self.paziente)
+
+    def after_delete(self):
+        recompute_buckets(self.paziente, self.data_ora)
@@ -0,0 +1,68 @@
+# model/metriche.py
+"""Metriche glicemiche del paziente (GMI, TIR, TBR, TAR, variabilità).
+
+Gli aggregati giornalieri (GlicemiaRollup con periodo 'giorno') contengono
+già numero di misure, somma, somma dei quadrati e quante misure cadono in
+ogni fascia di valori: le metriche di una finestra di N giorni si
+ottengono sommando al massimo N righe, senza rileggere le glicemie.
+"""
+from datetime import datetime, timedelta
+import math
+
+from pony.orm import select
+
+from .rollup import GlicemiaRollup
+# TIR_MIN e TIR_MAX sono usate anche dalla panoramica del medico (controller.analytics)
+from .aggregazioni import FASCE, TIR_MIN, TIR_MAX  # noqa: F401
+
+DEFAULT_METRICS_DAYS = 14
+
+_CONTATORI = ("conteggio", "somma", "somma_quadrati") + FASCE
+
+
+def compute_metrics(conteggio, somma, somma_quadrati, sotto_54, sotto_70, in_range, sopra_180, sopra_250):
+    """
+    Metriche a partire dai contatori sommati.
+
+    Returns:
+        dict con misure, media, deviazione standard, CV (%), GMI (%),
+        TIR, TBR (<70 e <54) e TAR (>180 e >250) in percentuale delle misure;
+        None per i valori se non ci sono misure
+    """
+    metriche = {"misure": conteggio, "media": None, "dev_std": None, "cv": None, "gmi": None,
+                "tir": None, "tbr": None, "tbr_54": None, "tar": None, "tar_250": None}
+    if not conteggio:
+        return metriche
+
+    media = somma / conteggio
+    dev_std = math.sqrt(max(somma_quadrati / conteggio - media * media, 0.0))
+    metriche.update(
+        media=media,
+        dev_std=dev_std,
+        cv=dev_std / media * 100 if media else None,
+        # Glucose Management Indicator (Bergenstal et al., 2018) con la media in mg/dL
+        gmi=3.31 + 0.02392 * media,
+        tir=in_range / conteggio * 100,
+        tbr=sotto_70 / conteggio * 100,
+        tbr_54=sotto_54 / conteggio * 100,
+        tar=sopra_180 / conteggio * 100,
+        tar_250=sopra_250 / conteggio * 100,
+    )
+    return metriche
+
+def patient_metrics(paziente_username, days=DEFAULT_METRICS_DAYS, today=None):
+    """Metriche del paziente negli ultimi days giorni (oggi compreso)"""
+    today = today or datetime.now().date()
+    since = today - timedelta(days=int(days) - 1)
+
+    righe = select(
+        (r.conteggio, r.somma, r.somma_quadrati, r.sotto_54, r.sotto_70,
+         r.in_range, r.sopra_180, r.sopra_250)
+        for r in GlicemiaRollup
+        if r.paziente.username == paziente_username and r.periodo == 'giorno' and
+           r.inizio >= since and r.inizio <= today
+    )[:]
+    totali = [sum(colonna) for colonna in zip(*righe)] if righe else [0] * len(_CONTATORI)
+    metriche = compute_metrics(*totali)
+    metriche["giorni"] = int(days)
+    return metriche
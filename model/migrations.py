@@ -0,0 +1,116 @@
+# model/migrations.py
+"""Migrazioni versionate dello schema SQLite.
+
+generate_mapping(create_tables=True) crea solo le tabelle mancanti: le
+modifiche successive a un database esistente (indici, colonne, backfill)
+sono elencate qui in ordine e applicate una sola volta. La versione
+raggiunta è salvata in PRAGMA user_version.
+"""
+from pony.orm import db_session
+
+from .database import db, log
+from .rollup import rebuild_all_sql
+from .aggregazioni import FASCE
+
+
+def add_columns(table, columns):
+    """
+    Istruzione di migrazione che aggiunge a table le colonne mancanti.
+
+    Nei database nuovi la tabella viene creata da generate_mapping già
+    completa: ALTER TABLE ... ADD COLUMN fallirebbe, quindi le colonne
+    presenti vengono saltate.
+    """
+    def statements(conn):
+        presenti = {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+        return [f'ALTER TABLE "{table}" ADD COLUMN {nome} {definizione}'
+                for nome, definizione in columns if nome not in presenti]
+    return statements
+
+
+# (versione, descrizione, istruzioni SQL)
+MIGRATIONS = [
+    (1, "Indici secondari per terapie, sintomi, alert e medici", [
+        # Terapie attive del paziente in una data
+        'CREATE INDEX IF NOT EXISTS "idx_terapia__paziente_periodo" '
+        'ON "Terapia" ("paziente", "data_inizio", "data_fine")',
+        # Sintomi ancora in corso del paziente
+        'CREATE INDEX IF NOT EXISTS "idx_sintomi__paziente_data_fine" '
+        'ON "Sintomi" ("paziente", "data_fine")',
+        # Terapie prescritte da un medico, più recenti prima
+        'CREATE INDEX IF NOT EXISTS "idx_terapia__medico_data_inizio" '
+        'ON "Terapia" ("medico", "data_inizio")',
+        # Campanella: esiste un alert di questa gravità per il paziente?
+        'CREATE INDEX IF NOT EXISTS "idx_alert__paziente_tipo_data_ora" '
+        'ON "Alert" ("paziente", "tipo", "data_ora")',
+    ]),
+    (2, "Backfill degli aggregati glicemici giornalieri, settimanali e mensili", rebuild_all_sql()),
+    # La tabella MetricheGiornaliere è stata sostituita dai contatori in GlicemiaRollup (versione 4)
+    (3, "Backfill dei contatori giornalieri delle metriche glicemiche", []),
+    (4, "Contatori delle fasce di valori negli aggregati glicemici", [
+        add_columns("GlicemiaRollup", [(nome, "INTEGER NOT NULL DEFAULT 0") for nome in FASCE]),
+        *rebuild_all_sql(),
+        'DROP TABLE IF EXISTS "MetricheGiornaliere"',
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def get_schema_version(conn):
+    """Versione dello schema salvata nel database"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def apply_migrations(conn, migrations=None):
+    """
+    Applica su una connessione DB-API SQLite le migrazioni non ancora eseguite.
+
+    Ogni migrazione è una transazione esplicita (BEGIN IMMEDIATE ... COMMIT):
+    sqlite3 esegue le DDL come CREATE INDEX fuori transazione se lasciato
+    in modalità implicita, e rollback() non le annullerebbe. Dentro la
+    transazione la versione viene riletta, così due processi avviati
+    insieme non applicano due volte la stessa migrazione.
+
+    Returns:
+        lista delle versioni applicate
+    """
+    migrations = MIGRATIONS if migrations is None else migrations
+    applied = []
+
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None  # transazioni gestite qui
+    try:
+        if conn.in_transaction:
+            # Es. connessione di Pony con una transazione già aperta
+            conn.execute("COMMIT")
+
+        for version, descrizione, statements in sorted(migrations, key=lambda m: m[0]):
+            if version <= get_schema_version(conn):
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if version <= get_schema_version(conn):
+                    conn.execute("COMMIT")
+                    continue
+                for sql in statements:
+                    # Istruzioni che dipendono dallo schema presente (es. add_columns)
+                    for istruzione in (sql(conn) if callable(sql) else [sql]):
+                        conn.execute(istruzione)
+                # PRAGMA non accetta parametri: la versione è un intero nostro
+                conn.execute(f"PRAGMA user_version = {int(version)}")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            log(f"Migrazione {version} applicata: {descrizione}")
+            applied.append(version)
+    finally:
+        conn.isolation_level = isolation_level
+
+    return applied
+
+def run_migrations():
+    """Porta il database configurato all'ultima versione dello schema"""
+    with db_session:
+        conn = db.get_connection()
+        return apply_migrations(conn)
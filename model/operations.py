@@ -1,10 +1,13 @@
 from pony.orm import db_session, select, delete, commit, desc, count
-from werkzeug.security import generate_password_hash
 from datetime import date, datetime
 from pony.orm import commit
+from .user_cache import invalidate_user, UserSnapshot
+from .colonnare import drop_patient_columns
+from .passwords import hash_password, verify_password, needs_rehash
 
 @db_session
 def initialize_db():
+    """Crea gli utenti iniziali se il database non ne contiene (python manage.py seed)"""
     # Import locali per evitare problemi circolari
     from .user import User
     from .paziente import Paziente
@@ -21,7 +24,7 @@ def initialize_db():
             # Crea l'admin
             admin = User(
                 username='ale',
-                password_hash=generate_password_hash('ale'),
+                password_hash=hash_password('ale'),
                 is_admin=True,
                 name='Alessia',
                 surname='Gallista',
@@ -30,7 +33,7 @@ def initialize_db():
 
             admin2 = User(
                 username='indi',
-                password_hash=generate_password_hash('indi'),
+                password_hash=hash_password('indi'),
                 is_admin=True,
                 name='Indira',
                 surname='Adilovic',
@@ -39,7 +42,7 @@ def initialize_db():
             # Crea un paziente di esempio
             paziente = Paziente(
                 username='anna.sandre', 
-                password_hash=generate_password_hash('anna'), 
+                password_hash=hash_password('anna'), 
                 is_admin=False,
                 name='Anna',
                 surname='Sandre',
@@ -52,7 +55,7 @@ def initialize_db():
 
             paziente2 = Paziente(
                 username='FabrisChiara', 
-                password_hash=generate_password_hash('chiara'), 
+                password_hash=hash_password('chiara'), 
                 is_admin=False,
                 name='Chiara',
                 surname='Fabris',
@@ -66,7 +69,7 @@ def initialize_db():
             # Crea un medico di esempio
             medico = Medico(
                 username='mario.rossi',
-                password_hash=generate_password_hash('dr.rossi'),
+                password_hash=hash_password('dr.rossi'),
                 is_admin=False,
                 name='Mario',
                 surname='Rossi',
@@ -79,7 +82,7 @@ def initialize_db():
             # Crea un altro medico
             medico2 = Medico(
                 username='Laubianchi',
-                password_hash=generate_password_hash('dr.bianchi'),
+                password_hash=hash_password('dr.bianchi'),
                 is_admin=False,
                 name='Laura',
                 surname='Bianchi',
@@ -113,10 +116,6 @@ def initialize_db():
             raise
     else:
         print("Users already exist, skipping initialization")
-        # Stampa info sugli utenti esistenti
-        users = User.select()
-        for user in users:
-            print(f"Existing user: {user.username} ({user.role})")
 
 
 @db_session
@@ -150,7 +149,7 @@ def add_user(username, password, name, surname, telefono=None, role="User", is_a
     if User.get(username=username):
         return False
     
-    password_hash = generate_password_hash(password)
+    password_hash = hash_password(password)
     try:
         if role.lower() == "medico":
             user = Medico(
@@ -177,6 +176,7 @@ def add_user(username, password, name, surname, telefono=None, role="User", is_a
                 is_admin=is_admin
             )
         commit()
+        invalidate_user(username)
         return True
 
     except Exception as e:
@@ -197,6 +197,9 @@ def delete_user(username):
             return False
         
         user.delete()
+        commit()
+        invalidate_user(username)
+        drop_patient_columns(username)
         return True
     
     except Exception as e:
@@ -204,14 +207,38 @@ def delete_user(username):
         return False
 
 
-@db_session
 def validate_user(username, password):
-    """Validate user credentials"""
+    """
+    Validate user credentials.
+
+    La verifica dell'hash avviene nel pool delle password, fuori dalla
+    db_session; se l'hash usa parametri non più correnti viene aggiornato.
+
+    Returns:
+        UserSnapshot dell'utente o None
+
+    Raises:
+        PasswordPoolBusy: troppi accessi in corso
+    """
     from .user import User
-    user = User.get(username=username)
-    if user and user.check_password(password):
-        return user
-    return None
+    with db_session:
+        user = User.get(username=username)
+        if user is None:
+            return None
+        password_hash = user.password_hash
+        snapshot = UserSnapshot.from_user(user)
+
+    if not verify_password(password_hash, password):
+        return None
+
+    if needs_rehash(password_hash):
+        nuovo_hash = hash_password(password)
+        with db_session:
+            user = User.get(username=username)
+            # Solo se nel frattempo la password non è stata cambiata
+            if user is not None and user.password_hash == password_hash:
+                user.password_hash = nuovo_hash
+    return snapshot
 
 
 @db_session
@@ -324,6 +351,8 @@ def delete_user_with_relations(username):
         
         # Commit finale
         commit()
+        invalidate_user(username)
+        drop_patient_columns(username)
         
         # Costruisci il messaggio di successo
         success_message = f"Utente {user_info} eliminato con successo"
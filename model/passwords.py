@@ -0,0 +1,74 @@
+# model/passwords.py
+"""Hash e verifica delle password in un pool di thread limitato.
+
+Le funzioni di derivazione (scrypt, pbkdf2) sono lente per scelta: calcolate
+direttamente nelle callback, un picco di accessi occupa tutti i core e
+rallenta ogni altra callback. Qui i calcoli passano da un pool con al
+massimo PASSWORD_WORKERS thread (di default metà dei core): gli accessi in
+eccesso attendono in coda e il resto della CPU resta alle altre richieste.
+Bastano i thread perché hashlib rilascia il GIL durante scrypt e pbkdf2.
+
+Il metodo di hash è configurabile (formato di werkzeug, es.
+'scrypt:32768:8:1' o 'pbkdf2:sha256:600000'): le password salvate con
+parametri diversi vengono aggiornate al primo accesso riuscito.
+
+Variabili d'ambiente:
+    GLICEMIA_PASSWORD_METHOD   metodo e parametri della derivazione
+    GLICEMIA_PASSWORD_WORKERS  thread del pool
+    GLICEMIA_PASSWORD_QUEUE    richieste in attesa oltre a quelle in calcolo
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+PASSWORD_METHOD = os.environ.get("GLICEMIA_PASSWORD_METHOD", "scrypt:32768:8:1")
+PASSWORD_WORKERS = int(os.environ.get("GLICEMIA_PASSWORD_WORKERS", 0)) or min(4, max(1, (os.cpu_count() or 2) // 2))
+PASSWORD_QUEUE = int(os.environ.get("GLICEMIA_PASSWORD_QUEUE", 64))
+# Secondi di attesa di un posto in coda prima di rifiutare la richiesta
+PASSWORD_WAIT_TIMEOUT = 10
+
+
+class PasswordPoolBusy(Exception):
+    """Troppe richieste di hash in attesa"""
+
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+_slots = threading.BoundedSemaphore(PASSWORD_WORKERS + PASSWORD_QUEUE)
+
+
+def _get_executor():
+    """Pool del processo corrente (creato al primo uso, anche dopo un fork)"""
+    global _executor, _executor_pid
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="password")
+            _executor_pid = os.getpid()
+        return _executor
+
+def _run(fn, *args):
+    """Esegue fn nel pool e ne attende il risultato"""
+    if not _slots.acquire(timeout=PASSWORD_WAIT_TIMEOUT):
+        raise PasswordPoolBusy("Troppe richieste di accesso in corso")
+    try:
+        future = _get_executor().submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future.result()
+
+def hash_password(password, method=None):
+    """Hash della password con PASSWORD_METHOD (o il metodo indicato)"""
+    return _run(generate_password_hash, password, method or PASSWORD_METHOD)
+
+def verify_password(password_hash, password):
+    """True se la password corrisponde all'hash salvato"""
+    return _run(check_password_hash, password_hash, password)
+
+def needs_rehash(password_hash, method=None):
+    """True se l'hash è stato calcolato con un metodo o parametri diversi da quelli correnti"""
+    return password_hash.split("$", 1)[0] != (method or PASSWORD_METHOD)
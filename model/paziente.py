@@ -22,4 +22,8 @@ class Paziente(User):
     rilevazione = Set("Glicemia", reverse="paziente")
     assunzione = Set("Assunzione", reverse="paziente")
     sintomi = Set("Sintomi", reverse="paziente")
-    terapies = Set("Terapia", reverse="paziente")
\ No newline at end of file
+    terapies = Set("Terapia", reverse="paziente")
+    alerts = Set("Alert", reverse="paziente", cascade_delete=True)
+    alert_stato = Optional("AlertStato", reverse="paziente", cascade_delete=True)
+    versione_dati = Optional("VersioneDati", reverse="paziente", cascade_delete=True)
+    rollups = Set("GlicemiaRollup", reverse="paziente", cascade_delete=True)
\ No newline at end of file
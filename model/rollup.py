@@ -0,0 +1,197 @@
+# model/rollup.py
+"""Aggregati glicemici pre-calcolati per giorno, settimana e mese.
+
+Ogni riga contiene conteggio, somma, minimo, massimo e somma dei quadrati
+delle misurazioni del paziente nel periodo, più quante cadono in ogni
+fascia di valori: media, deviazione standard e metriche del time-in-range
+(model.metriche) si ricavano senza rileggere lo storico. Le righe vengono
+aggiornate dagli hook di Glicemia e possono essere ricostruite con
+`python manage.py rebuild-rollups`.
+"""
+from datetime import date, datetime, timedelta
+from pony.orm import Required, PrimaryKey, select, db_session, commit
+
+from .database import db
+from .paziente import Paziente
+from .aggregazioni import SQL_INIZIO_PERIODO, FASCE, bucket_stats, fasce, fasce_sql
+
+PERIODI = ('giorno', 'settimana', 'mese')
+
+
+class GlicemiaRollup(db.Entity):
+    """Aggregato delle glicemie di un paziente in un periodo"""
+    paziente = Required(Paziente)
+    periodo = Required(str)  # 'giorno', 'settimana', 'mese'
+    inizio = Required(date)  # giorno, lunedì della settimana o primo del mese
+
+    conteggio = Required(int)
+    somma = Required(float)
+    minimo = Required(float)
+    massimo = Required(float)
+    somma_quadrati = Required(float)
+
+    # Misure per fascia (model.aggregazioni.FASCE)
+    sotto_54 = Required(int, default=0)
+    sotto_70 = Required(int, default=0)   # comprende anche le misure sotto 54
+    in_range = Required(int, default=0)   # 70-180
+    sopra_180 = Required(int, default=0)  # comprende anche le misure sopra 250
+    sopra_250 = Required(int, default=0)
+
+    PrimaryKey(paziente, periodo, inizio)
+
+    @property
+    def media(self):
+        return self.somma / self.conteggio if self.conteggio else None
+
+
+# ===============================
+# PERIODI
+# ===============================
+
+def period_start(periodo, giorno):
+    """Inizio del periodo che contiene il giorno indicato"""
+    if isinstance(giorno, datetime):
+        giorno = giorno.date()
+    if periodo == 'giorno':
+        return giorno
+    if periodo == 'settimana':
+        return giorno - timedelta(days=giorno.weekday())
+    if periodo == 'mese':
+        return giorno.replace(day=1)
+    raise ValueError(f"Periodo non valido: {periodo}")
+
+def period_end(periodo, inizio):
+    """Primo giorno del periodo successivo"""
+    if periodo == 'giorno':
+        return inizio + timedelta(days=1)
+    if periodo == 'settimana':
+        return inizio + timedelta(days=7)
+    if periodo == 'mese':
+        return (inizio.replace(day=28) + timedelta(days=4)).replace(day=1)
+    raise ValueError(f"Periodo non valido: {periodo}")
+
+
+# ===============================
+# AGGIORNAMENTO DA HOOK
+# ===============================
+
+def _is_being_deleted(paziente):
+    return paziente is None or paziente._status_ in ('marked_to_delete', 'deleted', 'cancelled')
+
+def add_reading(paziente, data_ora, valore):
+    """Aggiunge una nuova misurazione agli aggregati (da Glicemia.before_insert)"""
+    if _is_being_deleted(paziente) or valore is None:
+        return
+
+    valore = float(valore)
+    for periodo in PERIODI:
+        inizio = period_start(periodo, data_ora)
+        rollup = GlicemiaRollup.get(paziente=paziente, periodo=periodo, inizio=inizio)
+        if rollup is None:
+            GlicemiaRollup(
+                paziente=paziente, periodo=periodo, inizio=inizio,
+                conteggio=1, somma=valore, minimo=valore, massimo=valore,
+                somma_quadrati=valore * valore, **fasce(valore)
+            )
+        else:
+            rollup.conteggio += 1
+            rollup.somma += valore
+            rollup.minimo = valore if valore < rollup.minimo else rollup.minimo
+            rollup.massimo = valore if valore > rollup.massimo else rollup.massimo
+            rollup.somma_quadrati += valore * valore
+            for nome, incremento in fasce(valore).items():
+                if incremento:
+                    setattr(rollup, nome, getattr(rollup, nome) + incremento)
+
+def recompute_buckets(paziente, data_ora):
+    """
+    Ricalcola dal database i periodi che contengono data_ora
+    (da Glicemia.after_update / after_delete: minimo e massimo non si possono sottrarre).
+    """
+    if _is_being_deleted(paziente):
+        return
+
+    inizi = {periodo: period_start(periodo, data_ora) for periodo in PERIODI}
+    start = min(inizi.values())
+    end = max(period_end(periodo, inizio) for periodo, inizio in inizi.items())
+
+    # Una sola GROUP BY per giorno sull'unione di giorno, settimana e mese
+    totali = {periodo: [0, 0.0, None, None, 0.0] + [0] * len(FASCE) for periodo in PERIODI}
+    for giorno, n, somma, minimo, massimo, somma_q, *conteggi in bucket_stats(paziente.username, 'giorno', start, end):
+        for periodo, inizio in inizi.items():
+            if inizio <= giorno < period_end(periodo, inizio):
+                t = totali[periodo]
+                t[0] += n
+                t[1] += somma
+                t[2] = minimo if t[2] is None else min(t[2], minimo)
+                t[3] = massimo if t[3] is None else max(t[3], massimo)
+                t[4] += somma_q
+                for i, c in enumerate(conteggi, start=5):
+                    t[i] += c
+
+    for periodo, inizio in inizi.items():
+        n, somma, minimo, massimo, somma_q, *conteggi = totali[periodo]
+        valori = dict(conteggio=n, somma=somma, minimo=minimo, massimo=massimo,
+                      somma_quadrati=somma_q, **dict(zip(FASCE, conteggi)))
+        rollup = GlicemiaRollup.get(paziente=paziente, periodo=periodo, inizio=inizio)
+        if not n:
+            if rollup is not None:
+                rollup.delete()
+        elif rollup is None:
+            GlicemiaRollup(paziente=paziente, periodo=periodo, inizio=inizio, **valori)
+        else:
+            rollup.set(**valori)
+
+
+# ===============================
+# RICOSTRUZIONE (BACKFILL)
+# ===============================
+
+def rebuild_sql(periodo, filtra_paziente=False):
+    """Istruzioni SQL che ricostruiscono gli aggregati di un periodo ($paziente se filtrate)"""
+    inizio = SQL_INIZIO_PERIODO[periodo]
+    filtro = " AND paziente = $paziente" if filtra_paziente else ""
+    return [
+        f"DELETE FROM \"GlicemiaRollup\" WHERE periodo = '{periodo}'{filtro}",
+        f"INSERT INTO \"GlicemiaRollup\" "
+        f"(paziente, periodo, inizio, conteggio, somma, minimo, massimo, somma_quadrati, {', '.join(FASCE)}) "
+        f"SELECT paziente, '{periodo}', {inizio}, COUNT(*), SUM(valore), MIN(valore), MAX(valore), "
+        f"SUM(valore * valore), {fasce_sql()} FROM \"Glicemia\" WHERE valore IS NOT NULL{filtro} "
+        f"GROUP BY paziente, {inizio}",
+    ]
+
+def rebuild_all_sql():
+    """Ricostruzione completa di tutti gli aggregati (usata anche dalla migrazione)"""
+    return [sql for periodo in PERIODI for sql in rebuild_sql(periodo)]
+
+@db_session
+def rebuild_rollups(paziente_username=None):
+    """
+    Ricostruisce gli aggregati di un paziente (o di tutti) con GROUP BY in SQL.
+
+    Returns:
+        numero di righe aggregate presenti al termine
+    """
+    params = {"paziente": paziente_username}
+    for periodo in PERIODI:
+        for sql in rebuild_sql(periodo, filtra_paziente=paziente_username is not None):
+            db.execute(sql, params)
+    commit()
+
+    query = select(r for r in GlicemiaRollup)
+    if paziente_username is not None:
+        query = query.filter(lambda r: r.paziente.username == paziente_username)
+    return query.count()
+
+# ===============================
+# LETTURA
+# ===============================
+
+def get_rollup_means(paziente_username, periodo, start_date, end_date):
+    """Media per periodo {inizio: media} con inizio in [start_date, end_date)"""
+    rows = select(
+        (r.inizio, r.somma, r.conteggio) for r in GlicemiaRollup
+        if r.paziente.username == paziente_username and r.periodo == periodo and
+           r.inizio >= start_date and r.inizio < end_date
+    )
+    return {inizio: somma / n for inizio, somma, n in rows if n}
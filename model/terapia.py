@@ -4,6 +4,7 @@ from pony.orm import Required, Optional, Set, PrimaryKey
 from .database import db
 from .medico import Medico
 from .paziente import Paziente
+from .versione import bump_version
 
 class Terapia(db.Entity):
     """Entità per le terapie prescritte dai medici ai pazienti"""
@@ -25,4 +26,14 @@ class Terapia(db.Entity):
     data_inizio = Required(datetime)  # quando iniziare la terapia
     data_fine = Optional(datetime)  # quando terminare (se applicabile)
     
-    PrimaryKey(medico_nome, paziente, nome_farmaco, data_inizio)
\ No newline at end of file
+    PrimaryKey(medico_nome, paziente, nome_farmaco, data_inizio)
+
+    # Ogni scrittura invalida le cache che dipendono dai dati del paziente
+    def before_insert(self):
+        bump_version(self.paziente)
+
+    def before_update(self):
+        bump_version(self.paziente)
+
+    def before_delete(self):
+        bump_version(self.paziente)
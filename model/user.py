@@ -1,9 +1,9 @@
 # model/user.py
 from pony.orm import PrimaryKey, Required, Optional, Discriminator
-from werkzeug.security import check_password_hash
 from flask_login import UserMixin
 
 from .database import db
+from .passwords import verify_password
 
 # Define the User entity con solo gli attributi comuni
 class User(db.Entity, UserMixin):
@@ -18,7 +18,7 @@ class User(db.Entity, UserMixin):
     telefono = Optional(str, default='')
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
     
     def get_id(self):
         return str(self.username)
\ No newline at end of file
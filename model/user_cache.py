@@ -0,0 +1,106 @@
+# model/user_cache.py
+"""Cache dell'identità utente per il user loader di Flask-Login.
+
+Ad ogni richiesta (anche ogni callback Dash) Flask-Login ricarica l'utente:
+qui viene tenuta una copia in sola lettura di identità e ruolo, con scadenza
+e invalidazione esplicita quando l'utente viene creato o eliminato.
+
+La cache è del singolo processo: invalidate_user incrementa anche la
+versione degli utenti salvata nel database (VersioneUtenti) e ogni processo
+la rilegge al più ogni USER_VERSION_CHECK secondi, svuotando la propria
+cache se è cambiata. Con più worker un utente eliminato o modificato resta
+valido negli altri processi al massimo per USER_VERSION_CHECK secondi.
+"""
+import threading
+import time
+
+from pony.orm import db_session, commit
+from flask_login import UserMixin
+
+from .cache import LRUCache
+from .database import db
+
+# Secondi di validità di una copia e numero massimo di utenti in cache
+USER_CACHE_TTL = 300
+USER_CACHE_SIZE = 1024
+# Secondi tra due letture della versione degli utenti dal database
+USER_VERSION_CHECK = 5
+
+_user_cache = LRUCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+_version_lock = threading.Lock()
+_versione_locale = None
+_prossimo_controllo = 0.0
+
+_VERSION_SQL = 'SELECT valore FROM "VersioneUtenti" WHERE id = 1'
+_BUMP_SQL = (
+    'INSERT INTO "VersioneUtenti" (id, valore) VALUES (1, 1) '
+    'ON CONFLICT (id) DO UPDATE SET valore = valore + 1'
+)
+
+
+class UserSnapshot(UserMixin):
+    """Copia dei dati di identità dell'utente, non legata a una db_session"""
+
+    def __init__(self, username, role, is_admin, name, surname):
+        self.username = username
+        self.role = role
+        self.is_admin = is_admin
+        self.name = name
+        self.surname = surname
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.username, user.role, user.is_admin, user.name, user.surname)
+
+    def get_id(self):
+        return str(self.username)
+
+
+def load_user_snapshot(username):
+    """Identità dell'utente dalla cache, dal database solo se assente o scaduta"""
+    _sync_version()
+    snapshot = _user_cache.get(username)
+    if snapshot is not None:
+        return snapshot
+
+    from .user import User
+    with db_session:
+        user = User.get(username=username)
+        if user is None:
+            return None
+        snapshot = UserSnapshot.from_user(user)
+
+    _user_cache.set(username, snapshot)
+    return snapshot
+
+def _sync_version():
+    """Svuota la cache se un altro processo ha modificato gli utenti (al più ogni USER_VERSION_CHECK s)"""
+    global _versione_locale, _prossimo_controllo
+    adesso = time.monotonic()
+    if adesso < _prossimo_controllo:
+        return
+    with _version_lock:
+        if adesso < _prossimo_controllo:
+            return
+        with db_session:
+            righe = db.select(_VERSION_SQL)
+        versione = righe[0] if righe else 0
+        if versione != _versione_locale:
+            _user_cache.clear()
+            _versione_locale = versione
+        _prossimo_controllo = adesso + USER_VERSION_CHECK
+
+def invalidate_user(username=None):
+    """
+    Rimuove un utente dalla cache (tutti se username è None) e segnala
+    la modifica agli altri processi tramite la versione nel database.
+    """
+    if username is None:
+        _user_cache.clear()
+    else:
+        _user_cache.pop(username)
+
+    with db_session:
+        db.execute(_BUMP_SQL)
+        commit()
@@ -0,0 +1,35 @@
+# model/versione.py
+from pony.orm import Required, Optional, PrimaryKey, Json
+from .database import db
+from .paziente import Paziente
+
+class VersioneDati(db.Entity):
+    """Versione dei dati clinici del paziente, incrementata ad ogni scrittura"""
+    paziente = Required(Paziente)
+    valore = Required(int, default=0)
+
+
+def bump_version(paziente):
+    """Incrementa la versione dei dati del paziente (chiamata dagli hook delle entità)"""
+    # Paziente in cancellazione: la versione verrà eliminata a cascata
+    if paziente is None or paziente._status_ in ('marked_to_delete', 'deleted', 'cancelled'):
+        return
+
+    versione = paziente.versione_dati
+    if versione is None:
+        VersioneDati(paziente=paziente, valore=1)
+    else:
+        versione.valore += 1
+
+
+class VersioneUtenti(db.Entity):
+    """Versione di identità e ruoli degli utenti (riga unica, id 1), condivisa tra i processi"""
+    id = PrimaryKey(int)
+    valore = Required(int, default=0)
+
+
+class VersioneAlertMedico(db.Entity):
+    """Versione degli alert dei pazienti di un medico, letta dai canali push di tutti i processi"""
+    medico = PrimaryKey(str)  # username del medico
+    valore = Required(int, default=0)
+    evento = Optional(Json)  # ultimo evento notificato
@@ -0,0 +1,5 @@
+# tests/__init__.py
+# I test usano un database in memoria: data/dash_app.sqlite non viene toccato
+import model
+
+model.init_app(":memory:", quiet=True)
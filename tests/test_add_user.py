@@ -21,7 +21,7 @@ class TestAddUser(unittest.TestCase):
              patch("model.medico.Medico") as Medico, \
              patch("model.paziente.Paziente"), \
              patch("model.operations.commit") as commit, \
-             patch("model.operations.generate_password_hash", return_value="HASH"):
+             patch("model.operations.hash_password", return_value="HASH"):
             User.get.return_value = None
 
             ok = add_user("doc1", "pwd", "Doc", "House", role="medico", is_admin=True)
@@ -42,7 +42,7 @@ class TestAddUser(unittest.TestCase):
              patch("model.medico.Medico"), \
              patch("model.paziente.Paziente") as Paziente, \
              patch("model.operations.commit") as commit, \
-             patch("model.operations.generate_password_hash", return_value="HASH"):
+             patch("model.operations.hash_password", return_value="HASH"):
             User.get.return_value = None
 
             ok = add_user("p1", "pwd", "Anna", "Rossi", role="paziente")
@@ -62,7 +62,7 @@ class TestAddUser(unittest.TestCase):
              patch("model.medico.Medico"), \
              patch("model.paziente.Paziente") as Paziente, \
              patch("model.operations.commit") as commit, \
-             patch("model.operations.generate_password_hash", return_value="HASH"):
+             patch("model.operations.hash_password", return_value="HASH"):
             User.get.return_value = None
             Paziente.side_effect = RuntimeError("BOOM")
 
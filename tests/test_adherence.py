@@ -0,0 +1,48 @@
+# tests/test_adherence.py
+import unittest
+from datetime import datetime, date
+import types
+
+from controller.adherence import bucket_intakes, daily_coverage, missing_streak
+
+
+class _Terapia(types.SimpleNamespace):
+    # Le entità Pony sono hashabili: servono come chiavi della copertura
+    __hash__ = object.__hash__
+
+
+def _assunzione(nome, dose, data_ora):
+    return types.SimpleNamespace(nome_farmaco=nome, dosaggio=dose, data_ora=data_ora)
+
+
+class TestAdherence(unittest.TestCase):
+
+    def setUp(self):
+        self.terapia = _Terapia(
+            nome_farmaco="Metformina", dosaggio_per_assunzione="500 mg",
+            data_inizio=datetime(2025, 9, 12), data_fine=datetime(2025, 9, 14)
+        )
+        self.buckets = bucket_intakes([
+            _assunzione("METFORMINA", "500mg", datetime(2025, 9, 12, 8, 0)),
+            _assunzione("metformina", "500 mg", datetime(2025, 9, 12, 20, 0)),
+            _assunzione("Insulina", "10 UI", datetime(2025, 9, 13, 8, 0)),
+        ])
+
+    def test_bucket_normalizzati_per_giorno(self):
+        self.assertEqual(self.buckets[(date(2025, 9, 12), "metformina", "500mg")], 2)
+        self.assertEqual(self.buckets[(date(2025, 9, 13), "insulina", "10ui")], 1)
+
+    def test_copertura_solo_giorni_attivi(self):
+        coverage = daily_coverage([self.terapia], self.buckets, date(2025, 9, 10), date(2025, 9, 20))
+        self.assertEqual(coverage[self.terapia], {
+            date(2025, 9, 12): 2, date(2025, 9, 13): 0, date(2025, 9, 14): 0
+        })
+
+    def test_streak_si_ferma_ad_assunzione_o_inizio_terapia(self):
+        self.assertEqual(missing_streak(self.terapia, self.buckets, date(2025, 9, 14), 3), 2)
+        self.terapia.data_inizio = datetime(2025, 9, 14)
+        self.assertEqual(missing_streak(self.terapia, self.buckets, date(2025, 9, 14), 3), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
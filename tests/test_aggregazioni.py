@@ -0,0 +1,48 @@
+# tests/test_aggregazioni.py
+"""Aggregazioni GROUP BY delle glicemie su uno schema in memoria."""
+import unittest
+import sqlite3
+import re
+
+from model import db
+from model.aggregazioni import bucket_stats_sql
+
+
+def _positional(sql):
+    """Parametri Pony $nome -> segnaposto DB-API"""
+    return re.sub(r"\$\w+", "?", sql)
+
+
+class TestBucketStatsSQL(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.executescript(db.schema.generate_create_script())
+        for paziente, data_ora, valore in [
+            ("anna", "2025-08-31 20:00:00", 100.0),
+            ("anna", "2025-09-01 08:00:00", 120.0),
+            ("anna", "2025-09-03 08:00:00", 180.0),
+            ("anna", "2025-09-08 08:00:00", 90.0),
+            ("carlo", "2025-09-02 08:00:00", 300.0),
+        ]:
+            self.conn.execute(
+                "INSERT INTO \"Glicemia\" (paziente, valore, data_ora, momento_pasto, note) "
+                "VALUES (?, ?, ?, 'digiuno', '')", (paziente, valore, data_ora)
+            )
+
+    def _stats(self, periodo, start, end):
+        return self.conn.execute(_positional(bucket_stats_sql(periodo)), ("anna", start, end)).fetchall()
+
+    def test_settimane_nel_intervallo(self):
+        rows = self._stats('settimana', "2025-09-01 00:00:00", "2025-09-15 00:00:00")
+        self.assertEqual([r[:3] for r in rows], [("2025-09-01", 2, 300.0), ("2025-09-08", 1, 90.0)])
+
+    def test_mese_esclude_altri_pazienti_e_fuori_intervallo(self):
+        rows = self._stats('mese', "2025-09-01 00:00:00", "2025-10-01 00:00:00")
+        # Contatori delle fasce: tre misure in range (180 compreso)
+        self.assertEqual(rows, [("2025-09-01", 3, 390.0, 90.0, 180.0, 120.0**2 + 180.0**2 + 90.0**2,
+                                 0, 0, 3, 0, 0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
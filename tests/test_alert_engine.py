@@ -0,0 +1,209 @@
+# tests/test_alert_engine.py
+import unittest
+from unittest.mock import patch, MagicMock
+from datetime import datetime
+import types
+
+from pony.orm import db_session, flush
+
+import controller.alert_engine as engine
+from model import Alert, AlertStato, Glicemia, Medico, Paziente
+from controller.adherence import bucket_intakes
+
+
+def _paziente(terapie=()):
+    return types.SimpleNamespace(
+        username="anna", name="Anna", surname="Sandre", terapies=list(terapie)
+    )
+
+
+class TestBuildGlicemiaAlert(unittest.TestCase):
+
+    def test_valore_normale_nessun_alert(self):
+        misura = types.SimpleNamespace(valore=110, data_ora=datetime(2025, 9, 15, 8, 0),
+                                       momento_pasto="digiuno", due_ore_pasto=None)
+        self.assertIsNone(engine._build_glicemia_alert(_paziente(), misura))
+
+    def test_valore_critico_crea_alert_danger(self):
+        misura = types.SimpleNamespace(valore=300, data_ora=datetime(2025, 9, 15, 8, 0),
+                                       momento_pasto="digiuno", due_ore_pasto=None)
+        alert = engine._build_glicemia_alert(_paziente(), misura)
+        self.assertEqual(alert["type"], "danger")
+        self.assertEqual(alert["patient_id"], "anna")
+        self.assertEqual(alert["timestamp"], "2025-09-15T08:00:00")
+        self.assertIn("critica", alert["message"])
+
+
+class TestBuildTherapyAlerts(unittest.TestCase):
+
+    def setUp(self):
+        self.oggi = datetime(2025, 9, 15).date()
+        self.terapia = types.SimpleNamespace(
+            nome_farmaco="Metformina", dosaggio_per_assunzione="500 mg",
+            data_inizio=datetime(2025, 9, 1), data_fine=None
+        )
+
+    @patch("controller.alert_engine.load_intake_buckets", return_value=bucket_intakes([]))
+    def test_tre_giorni_senza_assunzioni_crea_alert(self, mock_load):
+        alerts = engine._build_therapy_alerts(_paziente(terapie=[self.terapia]), self.oggi, datetime.now())
+        self.assertEqual(len(alerts), 1)
+        self.assertEqual(alerts[0]["streak_days"], 3)
+        self.assertEqual(alerts[0]["drug_name"], "Metformina")
+        # Una sola lettura delle assunzioni per l'intera finestra
+        mock_load.assert_called_once()
+        self.assertEqual(mock_load.call_args.args[1:], (datetime(2025, 9, 13).date(), self.oggi))
+
+    @patch("controller.alert_engine.load_intake_buckets")
+    def test_assunzione_recente_azzera_alert(self, mock_load):
+        # Nome e dosaggio scritti diversamente: il confronto è normalizzato
+        ass = types.SimpleNamespace(nome_farmaco="metformina", dosaggio="500mg",
+                                    data_ora=datetime(2025, 9, 14, 8, 0))
+        mock_load.return_value = bucket_intakes([ass])
+        paz = _paziente(terapie=[self.terapia])
+        self.assertEqual(engine._build_therapy_alerts(paz, self.oggi, datetime.now()), [])
+
+    @patch("controller.alert_engine.load_intake_buckets")
+    def test_terapia_non_ancora_iniziata_ignorata(self, mock_load):
+        self.terapia.data_inizio = datetime(2025, 9, 20)
+        alerts = engine._build_therapy_alerts(_paziente(terapie=[self.terapia]), self.oggi, datetime.now())
+        self.assertEqual(alerts, [])
+        # Nessuna terapia attiva: nessuna query sulle assunzioni
+        mock_load.assert_not_called()
+
+
+class TestCursore(unittest.TestCase):
+
+    def test_cursore_andata_e_ritorno(self):
+        cursor = engine.encode_cursor(datetime(2025, 9, 15, 8, 30), 42)
+        self.assertEqual(cursor, "2025-09-15T08:30:00|42")
+        self.assertEqual(engine.decode_cursor(cursor), (datetime(2025, 9, 15, 8, 30), 42))
+
+    def test_cursore_non_valido_riparte_dalla_prima_pagina(self):
+        self.assertIsNone(engine.decode_cursor(None))
+        self.assertIsNone(engine.decode_cursor("ieri|abc"))
+
+    def test_medico_assente_nessuna_pagina(self):
+        self.assertEqual(engine.query_doctor_alerts(None), ([], None))
+        self.assertIsNone(engine.doctor_alert_level(None))
+
+
+class TestAlertGlicemiaSuDatabase(unittest.TestCase):
+
+    def setUp(self):
+        with db_session:
+            Paziente(username="alert.anna", password_hash="x", name="Anna", surname="Alert")
+
+    def tearDown(self):
+        with db_session:
+            Paziente["alert.anna"].delete()
+
+    def test_una_sola_versione_per_misura_anomala(self):
+        with db_session:
+            paziente = Paziente["alert.anna"]
+            misura = Glicemia(paziente=paziente, valore=300.0, data_ora=datetime(2025, 9, 15, 8),
+                              momento_pasto="digiuno")
+            flush()
+            self.assertEqual(engine.update_glicemia_alerts(misura)["type"], "danger")
+
+        with db_session:
+            paziente = Paziente["alert.anna"]
+            self.assertEqual(paziente.versione_dati.valore, 1)
+            self.assertEqual(Alert.select(lambda a: a.paziente == paziente).count(), 1)
+
+
+class TestPaginazioneSuDatabase(unittest.TestCase):
+    """Paginazione keyset degli alert del medico sul database in memoria dei test"""
+
+    OGGI = datetime(2025, 9, 15).date()
+
+    def setUp(self):
+        engine._doctor_cache.clear()
+        with db_session:
+            medico = Medico(username="pagine.medico", password_hash="x", name="Luca", surname="Pagine",
+                            email="pagine.medico@example.it")
+            for username in ("pagine.anna", "pagine.bruno"):
+                paziente = Paziente(username=username, password_hash="x", name="Paz", surname="Pagine")
+                paziente.doctors.add(medico)
+                # Stato già calcolato oggi: la prima pagina non ricostruisce gli alert
+                AlertStato(paziente=paziente, terapie_calcolate_il=self.OGGI)
+                # Tre alert per ora: più alert con la stessa data_ora, anche tra pazienti
+                for i in range(12):
+                    data_ora = datetime(2025, 9, 10, 8 + i // 3)
+                    Alert(paziente=paziente, categoria="glicemia", tipo="warning", data_ora=data_ora,
+                          dati={"patient": username, "n": i})
+
+    def tearDown(self):
+        engine._doctor_cache.clear()
+        with db_session:
+            for username in ("pagine.anna", "pagine.bruno"):
+                Paziente[username].delete()
+            Medico["pagine.medico"].delete()
+
+    def _tutte_le_pagine(self, limit):
+        with db_session:
+            medico = Medico["pagine.medico"]
+            pagine, cursor = [], None
+            while True:
+                page, cursor = engine.query_doctor_alerts(medico, limit=limit, cursor=cursor,
+                                                          today_date=self.OGGI)
+                pagine.append(page)
+                if cursor is None:
+                    return pagine
+
+    def _attesi(self):
+        with db_session:
+            alert = Alert.select(lambda a: a.paziente.username.startswith("pagine."))[:]
+            return [a.dati for a in sorted(alert, key=lambda a: (a.data_ora, a.id), reverse=True)]
+
+    def test_nessun_buco_o_duplicato(self):
+        # 24 alert in pagine da 5: l'ultima pagina ne ha 4
+        pagine = self._tutte_le_pagine(5)
+        self.assertEqual([len(p) for p in pagine], [5, 5, 5, 5, 4])
+        self.assertEqual([a for p in pagine for a in p], self._attesi())
+
+    def test_ultima_pagina_piena(self):
+        # Pagine esatte: l'ultima non lascia un cursore verso una pagina vuota
+        pagine = self._tutte_le_pagine(6)
+        self.assertEqual([len(p) for p in pagine], [6, 6, 6, 6])
+        self.assertEqual([a for p in pagine for a in p], self._attesi())
+
+
+class TestCacheMedico(unittest.TestCase):
+
+    def setUp(self):
+        engine._doctor_cache.clear()
+        self.medico = types.SimpleNamespace(username="rossi")
+
+    @patch("controller.alert_engine._doctor_fingerprint")
+    def test_ricalcolo_solo_se_cambia_versione_paziente(self, mock_fp):
+        compute = MagicMock(side_effect=["prima", "dopo"])
+        oggi = datetime(2025, 9, 15).date()
+
+        mock_fp.return_value = (oggi, frozenset({("anna", 1)}))
+        self.assertEqual(engine._cached(self.medico, ("page",), oggi, compute), "prima")
+        self.assertEqual(engine._cached(self.medico, ("page",), oggi, compute), "prima")
+        self.assertEqual(compute.call_count, 1)
+
+        # Nuova glicemia di anna: versione incrementata
+        mock_fp.return_value = (oggi, frozenset({("anna", 2)}))
+        self.assertEqual(engine._cached(self.medico, ("page",), oggi, compute), "dopo")
+        self.assertEqual(compute.call_count, 2)
+
+
+class TestHookScrittura(unittest.TestCase):
+
+    @patch("controller.alert_engine.update_glicemia_alerts", side_effect=RuntimeError("BOOM"))
+    def test_errore_motore_non_blocca_salvataggio(self, mock_update):
+        # L'hook non deve propagare eccezioni al core di salvataggio
+        engine.on_glicemia_saved(MagicMock())
+        mock_update.assert_called_once()
+
+    @patch("controller.alert_engine.update_therapy_alerts")
+    def test_terapia_modificata_ricalcola_entrambi_i_pazienti(self, mock_update):
+        p1, p2 = MagicMock(), MagicMock()
+        engine.on_terapia_changed(p1, None, p2)
+        self.assertEqual([c.args[0] for c in mock_update.call_args_list], [p1, p2])
+
+
+if __name__ == "__main__":
+    unittest.main()
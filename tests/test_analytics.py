@@ -0,0 +1,77 @@
+# tests/test_analytics.py
+import unittest
+from unittest.mock import patch
+from datetime import date
+
+import controller.analytics as analytics
+
+
+class TestAssemble(unittest.TestCase):
+
+    def setUp(self):
+        self.oggi = date(2025, 9, 17)  # mercoledì
+
+    def test_giorni_settimana_corrente(self):
+        means = {date(2025, 9, 15): 110.0, date(2025, 9, 17): 150.0, date(2025, 9, 8): 999.0}
+        self.assertEqual(analytics.assemble_weekday(means, self.oggi),
+                         [110.0, None, 150.0, None, None, None, None])
+
+    def test_settimane_con_buchi(self):
+        means = {date(2025, 9, 1): 100.0, date(2025, 9, 15): 120.0}
+        starts, values = analytics.assemble_weekly(means)
+        self.assertEqual(starts, [date(2025, 9, 1), date(2025, 9, 8), date(2025, 9, 15)])
+        self.assertEqual(values, [100.0, None, 120.0])
+        self.assertEqual(analytics.assemble_weekly({}), ([], []))
+
+    def test_mesi_anno(self):
+        values = analytics.assemble_monthly({date(2025, 2, 1): 130.0}, 2025)
+        self.assertEqual(len(values), 12)
+        self.assertEqual(values[1], 130.0)
+        self.assertIsNone(values[0])
+
+    def test_inizio_finestra_allineato_al_lunedi(self):
+        self.assertEqual(analytics.weeks_window_start(self.oggi, 2), date(2025, 9, 1))
+
+    def test_indici_finestre_per_il_ritaglio_lato_client(self):
+        starts = [date(2025, 7, 14), date(2025, 7, 21), date(2025, 8, 25), date(2025, 9, 1)]
+        values = [100.0, 110.0, None, 130.0]
+        # 4 settimane -> dal 18/08; 8 settimane -> dal 21/07
+        self.assertEqual(analytics.weekly_window_cutoffs(starts, values, self.oggi), {"4": 3, "8": 1})
+        self.assertEqual(analytics.weekly_window_cutoffs([], [], self.oggi), {"4": 0, "8": 0})
+
+    def test_store_settimanale(self):
+        store = analytics.weekly_store({"data": []}, [date(2025, 9, 15)], [120.0], self.oggi)
+        self.assertEqual(store["size"], 1)
+        self.assertEqual(store["cutoffs"], {"4": 0, "8": 0})
+        self.assertEqual(analytics.weekly_store({"data": []})["cutoffs"], {})
+
+    @patch("controller.analytics.get_rollup_means", return_value={})
+    def test_serie_per_entrambi_i_ruoli(self, mock_means):
+        series = analytics.glucose_series("anna", 4, today=self.oggi)
+        self.assertEqual(set(series), {"giorni", "settimane", "mesi"})
+        periodi = [c.args[1] for c in mock_means.call_args_list]
+        self.assertEqual(periodi, ["giorno", "settimana", "mese"])
+        self.assertEqual(mock_means.call_args_list[1].args[2], date(2025, 8, 18))
+
+
+class TestPanelRow(unittest.TestCase):
+
+    def test_media_cv_e_tir_dalle_somme(self):
+        # Valori 100, 140, 300: uno fuori range e critico
+        row = analytics._panel_row("anna", "Anna", "Sandre", 3, 540.0, 100.0**2 + 140.0**2 + 300.0**2,
+                                   2, 1, "2025-09-15 08:00:00", 300.0)
+        self.assertAlmostEqual(row["media"], 180.0)
+        self.assertAlmostEqual(row["tir"], 200 / 3)
+        self.assertAlmostEqual(row["cv"], 48.0055, places=3)  # dev. std 86.41
+        self.assertEqual(row["nome"], "Sandre Anna")
+        self.assertEqual(row["ultima_data"].hour, 8)
+
+    def test_paziente_senza_misure(self):
+        row = analytics._panel_row("carlo", "Carlo", "Gialli", 0, None, None, 0, 0, None, None)
+        self.assertIsNone(row["media"])
+        self.assertIsNone(row["tir"])
+        self.assertEqual(row["critiche"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
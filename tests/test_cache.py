@@ -0,0 +1,42 @@
+# tests/test_cache.py
+import unittest
+from unittest.mock import patch
+
+import model.cache as cache_module
+from model.cache import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_oltre_il_limite_esce_il_meno_usato(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), 1)  # "a" diventa il più recente
+        cache.set("c", 3)
+
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(len(cache), 2)
+
+    def test_pop_e_clear(self):
+        cache = LRUCache()
+        cache.set("a", 1)
+        self.assertEqual(cache.pop("a"), 1)
+        self.assertIsNone(cache.get("a"))
+        cache.set("b", 2)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_chiave_scaduta_non_presente(self):
+        cache = LRUCache(ttl=10)
+        with patch.object(cache_module.time, "monotonic", return_value=100.0):
+            cache.set("a", 1)
+            self.assertIn("a", cache)
+        with patch.object(cache_module.time, "monotonic", return_value=111.0):
+            self.assertNotIn("a", cache)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+# tests/test_colonnare.py
+"""Archivio colonnare delle glicemie: file append-only, allineamento alla versione dei dati e timeline."""
+import unittest
+from unittest.mock import patch
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+from pony.orm import db_session
+
+import model.colonnare as colonnare
+from model import Paziente, Glicemia
+from model.colonnare import ColumnStore, make_records
+import controller.patient as patient
+from controller.timeline import load_timeline
+
+
+class TestColumnStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ColumnStore(self.tmp.name, compact_threshold=5)
+        self.t0 = datetime(2025, 9, 15, 8, 0)
+        self.store.replace("anna", make_records([], [], []), 0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _records(self, minuti, valori, momento="digiuno"):
+        return make_records([self.t0 + timedelta(minutes=m) for m in minuti], valori, [momento] * len(valori))
+
+    def test_lettura_ordinata_dal_log(self):
+        self.assertTrue(self.store.append("anna", self._records([30, 0], [150.0, 110.0]), 1))
+        records, versione = self.store.read("anna")
+        self.assertEqual(versione, 1)
+        self.assertEqual(list(records["v"]), [110.0, 150.0])
+        self.assertEqual(records["t"][0], np.datetime64(self.t0, "s").astype("<i8"))
+
+    def test_archivio_non_allineato_non_accetta_misure(self):
+        # Versione 2 senza la 1: una scrittura è passata da un'altra strada
+        self.assertFalse(self.store.append("anna", self._records([0], [100.0]), 2))
+        self.assertFalse(self.store.append("luca", self._records([0], [100.0]), 1))
+        self.assertEqual(self.store.read("anna")[1], 0)
+        self.assertEqual(self.store.read("luca")[1], None)
+
+    def test_compattazione_oltre_soglia_senza_copie(self):
+        for i in range(5):
+            self.store.append("anna", self._records([i], [100.0 + i]), i + 1)
+        cartella = self.store._dir("anna")
+        self.assertEqual(os.path.getsize(os.path.join(cartella, "log.bin")), 0)
+
+        records, versione = self.store.read("anna")
+        self.assertIsInstance(records, np.memmap)
+        self.assertEqual((len(records), versione), (5, 5))
+
+    def test_stesso_istante_vince_il_piu_recente(self):
+        self.store.append("anna", self._records([0], [100.0]), 1)
+        self.store.compact("anna")
+        self.store.append("anna", self._records([0], [180.0]), 2)
+        self.assertEqual(list(self.store.read("anna")[0]["v"]), [180.0])
+
+    def test_sostituzione_ed_eliminazione(self):
+        self.store.append("anna", self._records([0, 1], [100.0, 120.0]), 1)
+        self.store.replace("anna", self._records([5], [90.0]), 7)
+        records, versione = self.store.read("anna")
+        self.assertEqual((list(records["v"]), versione), ([90.0], 7))
+        self.store.drop("anna")
+        self.assertEqual(self.store.read("anna")[1], None)
+        self.assertEqual(len(self.store.read("anna")[0]), 0)
+
+    def test_momenti_codificati(self):
+        records = make_records([self.t0] * 3, [1, 2, 3], ["Dopo_pasto", "prima_pasto", None])
+        self.assertEqual(list(records["m"]), [2, 1, -1])
+        self.assertEqual(list(colonnare.decode_momenti(records["m"])), ["dopo_pasto", "prima_pasto", ""])
+
+
+class TestArchivioConfigurato(unittest.TestCase):
+    """Archivio attivo sul database in memoria dei test"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = patch.dict(os.environ, {colonnare.COLUMN_STORE_ENV: self.tmp.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+        self.inizio = datetime(2025, 9, 1)
+        with db_session:
+            paziente = Paziente(username="colonne.anna", password_hash="x", name="Anna", surname="Colonne")
+            # Una misura ogni 20 minuti per 3 giorni, con valori e momenti diversi
+            for i in range(3 * 72):
+                Glicemia(paziente=paziente, valore=60.0 + (i * 37) % 220,
+                         momento_pasto=("digiuno", "prima_pasto", "dopo_pasto")[i % 3],
+                         due_ore_pasto=True if i % 3 == 2 else None,
+                         data_ora=self.inizio + timedelta(minutes=20 * i))
+
+    def tearDown(self):
+        with db_session:
+            Paziente["colonne.anna"].delete()
+
+    def _timeline(self, *args, **kwargs):
+        with db_session:
+            return load_timeline("colonne.anna", *args, **kwargs)
+
+    def _timeline_sql(self, *args, **kwargs):
+        with patch.dict(os.environ, {colonnare.COLUMN_STORE_ENV: ""}):
+            return self._timeline(*args, **kwargs)
+
+    def test_disattivo_senza_variabile(self):
+        with patch.dict(os.environ, {colonnare.COLUMN_STORE_ENV: ""}), db_session:
+            self.assertIsNone(colonnare.get_column_store())
+            self.assertIsNone(colonnare.load_readings("colonne.anna"))
+            colonnare.mirror_glicemia("colonne.anna", datetime(2025, 9, 15), 120.0, "digiuno", 1)  # nessun effetto
+
+    def test_timeline_uguale_alla_query(self):
+        zoom = (datetime(2025, 9, 1, 6, 30, 0, 123000), datetime(2025, 9, 2, 12, 20))
+        for args, kwargs in [((), {}), ((), {"max_points": 40}), (zoom, {}), (zoom, {"max_points": 10})]:
+            with self.subTest(args=args, kwargs=kwargs):
+                self.assertEqual(self._timeline(*args, **kwargs), self._timeline_sql(*args, **kwargs))
+
+    def test_archivio_ricostruito_se_non_allineato(self):
+        self._timeline()
+        # Modifica che non passa dal form: la versione cambia, l'archivio viene riletto da SQLite
+        with db_session:
+            Glicemia[Paziente["colonne.anna"], self.inizio].valore = 400.0
+        data = self._timeline()
+        self.assertEqual(data["y"][0], 400.0)
+        self.assertEqual(data, self._timeline_sql())
+
+    def test_misura_del_form_copiata_nell_archivio(self):
+        self._timeline()
+        with db_session:
+            patient._save_glicemia_measurement_core(
+                n_clicks=1, valore="130", data_misurazione="2025-09-04", ora="08:00",
+                momento_pasto="digiuno", note="", due_ore_pasto=None, username="colonne.anna"
+            )
+        # La misura è in coda al log e l'archivio resta allineato: nessuna ricostruzione
+        with patch.object(colonnare, "_sql_records", side_effect=AssertionError("ricostruzione")), db_session:
+            letture = colonnare.load_readings("colonne.anna")
+        self.assertEqual(letture["tempi"][-1], np.datetime64("2025-09-04T08:00:00"))
+        self.assertEqual(letture["valori"][-1], 130.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
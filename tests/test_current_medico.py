@@ -0,0 +1,45 @@
+# tests/test_current_medico.py
+import unittest
+from unittest.mock import patch
+import types
+
+from flask import Flask
+
+import controller.doctor as doctor
+
+
+def _utente(role="Medico"):
+    return types.SimpleNamespace(username="mario.rossi", role=role, is_authenticated=True)
+
+
+class TestCurrentMedico(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+
+    @patch("controller.doctor.Medico")
+    def test_ricerca_per_username(self, mock_medico):
+        with self.app.test_request_context(), patch("controller.doctor.current_user", _utente()):
+            doctor.get_current_medico()
+        mock_medico.get.assert_called_once_with(username="mario.rossi")
+
+    def test_identita_risolta_una_volta_per_richiesta(self):
+        with self.app.test_request_context():
+            with patch("controller.doctor.current_user", _utente()):
+                self.assertEqual(doctor.get_current_medico_username(), "mario.rossi")
+            # Anche se current_user cambia, nella stessa richiesta resta il valore in g
+            with patch("controller.doctor.current_user", _utente(role="Paziente")):
+                self.assertEqual(doctor.get_current_medico_username(), "mario.rossi")
+
+        with self.app.test_request_context(), patch("controller.doctor.current_user", _utente(role="Paziente")):
+            self.assertIsNone(doctor.get_current_medico_username())
+
+    @patch("controller.doctor.Medico")
+    def test_utente_non_medico_nessuna_query(self, mock_medico):
+        with self.app.test_request_context(), patch("controller.doctor.current_user", _utente(role="Paziente")):
+            self.assertIsNone(doctor.get_current_medico())
+        mock_medico.get.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
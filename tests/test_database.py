@@ -0,0 +1,56 @@
+# tests/test_database.py
+"""Profilo SQLite applicato alle connessioni e avvio del modello."""
+import unittest
+import io
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from contextlib import redirect_stdout
+
+import model
+from model.database import apply_sqlite_pragmas, SQLITE_PRAGMAS, log
+
+
+class TestProfiloSQLite(unittest.TestCase):
+
+    def test_pragmas_su_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = sqlite3.connect(os.path.join(tmp, "test.sqlite"), isolation_level=None)
+            apply_sqlite_pragmas(conn)
+            pragma = lambda nome: conn.execute(f"PRAGMA {nome}").fetchone()[0]
+
+            self.assertEqual(pragma("journal_mode"), "wal")
+            self.assertEqual(pragma("synchronous"), 1)  # NORMAL
+            self.assertEqual(pragma("busy_timeout"), dict(SQLITE_PRAGMAS)["busy_timeout"])
+            self.assertEqual(pragma("cache_size"), dict(SQLITE_PRAGMAS)["cache_size"])
+            conn.close()
+
+    def test_profilo_vuoto(self):
+        conn = sqlite3.connect(":memory:")
+        apply_sqlite_pragmas(conn, [])
+        self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 2)  # FULL
+        conn.close()
+
+
+class TestAvvio(unittest.TestCase):
+
+    def test_import_senza_effetti(self):
+        # Solo definizioni: nessun collegamento al database e nessuna stampa
+        out = subprocess.run([sys.executable, "-c", "import model; print(model.db.provider is None)"],
+                             capture_output=True, text=True, check=True,
+                             cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual(out.stdout, "True\n")
+
+    def test_init_app_una_sola_volta(self):
+        # Già inizializzato in memoria da tests/__init__.py
+        with redirect_stdout(io.StringIO()) as out:
+            self.assertTrue(model.init_app())
+            log("messaggio di avvio")
+        self.assertEqual(out.getvalue(), "")
+        self.assertEqual(model.db.provider.pool.filename, ":memory:")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+# tests/test_export.py
+"""Export CSV: paginazione keyset su uno schema in memoria e scrittura a blocchi."""
+import unittest
+import csv
+import io
+import re
+import sqlite3
+from unittest.mock import patch
+
+from model import db
+import controller.export as export
+
+
+class _MemoryDB:
+    """Sostituto di db.select sullo schema in memoria (parametri $nome)"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.queries = []
+
+    def select(self, sql, params):
+        self.queries.append(sql)
+        rows = self.conn.execute(re.sub(r"\$(\w+)", r":\1", sql), params).fetchall()
+        return [r[0] for r in rows] if len(rows) and len(rows[0]) == 1 else rows
+
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.executescript(db.schema.generate_create_script())
+        for paziente, n in (("anna", 7), ("bruno", 3), ("carla", 2)):
+            self.conn.executemany(
+                'INSERT INTO "Glicemia" (paziente, valore, data_ora, momento_pasto, note) '
+                "VALUES (?, ?, ?, 'digiuno', '')",
+                [(paziente, 100.0 + i, f"2025-09-{1 + i:02d} 08:00:00") for i in range(n)]
+            )
+        # Stessa data e ora, farmaci diversi: la chiave keyset deve distinguerle
+        self.conn.executemany(
+            'INSERT INTO "Assunzione" (paziente, nome_farmaco, dosaggio, data_ora, note) '
+            "VALUES ('anna', ?, '1 cp', '2025-09-01 08:00:00', '')",
+            [("A",), ("B",), ("C",)]
+        )
+        self.conn.executemany('INSERT INTO "Medico_Paziente" (medico, paziente) VALUES (?, ?)',
+                              [("luca", "bruno"), ("luca", "anna")])
+        self.fake = _MemoryDB(self.conn)
+        patcher = patch.object(export, "db", self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pagine_keyset(self):
+        pagine = list(export.iter_pages("glicemie", "anna", page_size=3))
+        self.assertEqual([len(p) for p in pagine], [3, 3, 1])
+        date = [r[0] for p in pagine for r in p]
+        self.assertEqual(date, sorted(set(date)))
+        self.assertNotIn("OFFSET", " ".join(self.fake.queries))
+
+    def test_chiave_composta(self):
+        pagine = list(export.iter_pages("assunzioni", "anna", page_size=2))
+        self.assertEqual([r[1] for p in pagine for r in p], ["A", "B", "C"])
+
+    def test_csv_pannello_medico(self):
+        pazienti = export.panel_usernames("luca")
+        self.assertEqual(pazienti, ["anna", "bruno"])
+
+        blocchi = list(export.iter_csv("glicemie", pazienti, page_size=4))
+        self.assertEqual(len(blocchi), 3)    # anna: 4 + 3, bruno: 3
+        righe = list(csv.reader(io.StringIO("".join(blocchi))))
+        self.assertEqual(righe[0], ["paziente", "data_ora", "valore", "momento_pasto", "due_ore_pasto", "note"])
+        self.assertEqual([r[0] for r in righe[1:]], ["anna"] * 7 + ["bruno"] * 3)
+
+    def test_paziente_senza_dati(self):
+        self.assertEqual("".join(export.iter_csv("sintomi", ["anna"])),
+                         "paziente,tipo,descrizione,data_inizio,data_fine,frequenza,note\r\n")
+
+    def test_nome_file(self):
+        self.assertEqual(export.export_filename("paziente", "anna/../x", "glicemie"),
+                         "glicemie_paziente_anna_.._x.csv")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+# tests/test_figure_cache.py
+import unittest
+from unittest.mock import MagicMock
+from datetime import date
+import types
+
+import plotly.graph_objects as go
+
+import controller.figure_cache as fc
+
+
+def _paziente(versione=1):
+    return types.SimpleNamespace(
+        username="anna", versione_dati=types.SimpleNamespace(valore=versione)
+    )
+
+
+class TestCachedFigure(unittest.TestCase):
+
+    def setUp(self):
+        fc.clear_figure_cache()
+        self.oggi = date(2025, 9, 15)
+        self.build = MagicMock(side_effect=lambda: go.Figure(go.Scatter(x=[1], y=[2])))
+
+    def test_seconda_richiesta_non_ricostruisce(self):
+        paz = _paziente()
+        first = fc.cached_figure(paz, "settimane", 8, self.oggi, self.build)
+        second = fc.cached_figure(paz, "settimane", 8, self.oggi, self.build)
+        self.assertIs(first, second)
+        self.assertIsInstance(first, dict)
+        self.build.assert_called_once()
+
+    def test_nuova_versione_dati_ricostruisce(self):
+        fc.cached_figure(_paziente(1), "settimane", 8, self.oggi, self.build)
+        fc.cached_figure(_paziente(2), "settimane", 8, self.oggi, self.build)
+        self.assertEqual(self.build.call_count, 2)
+
+    def test_finestra_e_giorno_nella_chiave(self):
+        paz = _paziente()
+        fc.cached_figure(paz, "settimane", 8, self.oggi, self.build)
+        fc.cached_figure(paz, "settimane", 12, self.oggi, self.build)
+        fc.cached_figure(paz, "settimane", 8, date(2025, 9, 16), self.build)
+        self.assertEqual(self.build.call_count, 3)
+
+    def test_paziente_senza_versione(self):
+        paz = types.SimpleNamespace(username="anna", versione_dati=None)
+        self.assertEqual(fc.data_version(paz), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
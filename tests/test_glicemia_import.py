@@ -0,0 +1,184 @@
+# tests/test_glicemia_import.py
+"""Importazione delle glicemie da CSV: lettura, validazione per riga e blocchi."""
+import unittest
+import base64
+import io
+from unittest.mock import patch, MagicMock
+from datetime import date, datetime
+
+from pony.orm import db_session, commit
+from pony.orm.core import TransactionIntegrityError
+
+import controller.glicemia_import as gi
+from controller.validation import glicemia_error
+from model import db, Paziente, Glicemia, Alert, GlicemiaRollup
+
+
+OGGI = date(2025, 9, 15)
+
+
+class TestLetturaCSV(unittest.TestCase):
+
+    def test_alias_e_separatore(self):
+        testo = ("Timestamp (YYYY-MM-DDThh:mm:ss);Glucose Value (mg/dL);Altro\n"
+                 "2025-09-14T08:05:00;112;x\n\n")
+        righe = list(gi.iter_csv_rows(io.StringIO(testo)))
+        self.assertEqual(righe, [(2, {"data_ora": "2025-09-14T08:05:00", "valore": "112"})])
+
+    def test_file_vuoto(self):
+        self.assertEqual(list(gi.iter_csv_rows(io.StringIO(""))), [])
+
+
+class TestValidazioneRiga(unittest.TestCase):
+
+    def parse(self, default_momento=None, **row):
+        return gi.parse_row(row, default_momento, today=OGGI)
+
+    def test_riga_valida(self):
+        misura, errore = self.parse(data="15/09/2025", ora="08:00", valore="98,5",
+                                    momento_pasto="dopo_pasto", due_ore_pasto="Sì")
+        self.assertIsNone(errore)
+        self.assertEqual(misura.data_ora, datetime(2025, 9, 15, 8, 0))
+        self.assertEqual(misura.valore, 98.5)
+        self.assertIs(misura.due_ore_pasto, True)
+
+    def test_stesse_regole_del_form(self):
+        # Data futura, dopo pasto senza "due ore", campi mancanti
+        self.assertEqual(self.parse(data_ora="2025-09-16 08:00", valore="100", momento_pasto="digiuno")[1],
+                         glicemia_error(100, date(2025, 9, 16), "08:00", "digiuno", None, OGGI))
+        self.assertEqual(self.parse(data_ora="2025-09-14 08:00", valore="100", momento_pasto="dopo_pasto")[1],
+                         "Per favore specifica se sono passate almeno due ore dal pasto!")
+        self.assertEqual(self.parse(data_ora="2025-09-14 08:00", valore="100")[1],
+                         "Per favore compila tutti i campi obbligatori!")
+
+    def test_momento_predefinito_per_cgm(self):
+        misura, errore = self.parse("digiuno", data_ora="2025-09-14T08:05:00+02:00", valore="140")
+        self.assertIsNone(errore)
+        self.assertEqual(misura.momento_pasto, "digiuno")
+        self.assertIsNone(misura.data_ora.tzinfo)
+
+    def test_valori_non_validi(self):
+        self.assertIn("non numerico", self.parse(data_ora="2025-09-14 08:00", valore="HI", momento_pasto="digiuno")[1])
+        self.assertIn("non riconosciuto", self.parse(data_ora="2025-09-14 08:00", valore="90", momento_pasto="cena")[1])
+        self.assertEqual(self.parse(data_ora="ieri", valore="90", momento_pasto="digiuno")[1], "Formato data non valido!")
+
+
+class TestImportazione(unittest.TestCase):
+
+    def setUp(self):
+        righe = ["data_ora,valore,momento_pasto"]
+        righe += [f"2025-09-{1 + i // 24:02d} {i % 24:02d}:00,{100 + i},digiuno" for i in range(7)]
+        righe += ["2025-09-01 00:00,abc,digiuno"]
+        self.csv = io.StringIO("\n".join(righe) + "\n")
+
+    @patch.object(gi, "_after_import")
+    @patch.object(gi, "_insert_batch")
+    @patch.object(gi, "Paziente")
+    def test_blocchi_e_riepilogo(self, mock_Paziente, mock_insert, mock_after):
+        mock_Paziente.get.return_value = MagicMock()
+        # Nel secondo blocco una misura era già presente
+        risultati = iter([(3, 1), (2, 0), (1, 0)])
+        blocchi = []
+        mock_insert.side_effect = lambda username, misure: blocchi.append(len(misure)) or next(risultati)
+
+        esito = gi.import_glicemie("anna", self.csv, batch_size=3, today=OGGI)
+
+        self.assertEqual(blocchi, [3, 3, 1])
+        self.assertEqual(esito["righe"], 8)
+        self.assertEqual(esito["inserite"], 6)
+        self.assertEqual(esito["duplicate"], 1)
+        self.assertEqual(esito["scartate"], 1)
+        self.assertEqual(esito["errori"], [(9, "Valore non numerico: abc")])
+        mock_after.assert_called_once_with("anna", 1)
+
+    @patch.object(gi, "_insert_batch")
+    @patch.object(gi, "Paziente")
+    def test_paziente_inesistente(self, mock_Paziente, mock_insert):
+        mock_Paziente.get.return_value = None
+        with self.assertRaises(ValueError):
+            gi.import_glicemie("nessuno", self.csv)
+        mock_insert.assert_not_called()
+
+
+class TestImportazioneSuDatabase(unittest.TestCase):
+    """Importazione completa sul database in memoria dei test"""
+
+    CSV = ("data_ora,valore,momento_pasto\n"
+           "2025-09-10 08:00,110,digiuno\n"
+           "2025-09-10 13:00,300,prima_pasto\n"      # critico: un alert
+           "2025-09-11 08:00,95,digiuno\n"
+           "2025-09-11 08:00,97,digiuno\n")          # stessa data_ora: duplicato
+
+    def setUp(self):
+        with db_session:
+            Paziente(username="import.test", password_hash="x", name="Import", surname="Test")
+
+    def tearDown(self):
+        with db_session:
+            Paziente["import.test"].delete()
+
+    def importa(self, testo):
+        return gi.import_glicemie("import.test", io.StringIO(testo), batch_size=2, today=OGGI)
+
+    def test_righe_aggregati_e_alert(self):
+        esito = self.importa(self.CSV)
+        self.assertEqual((esito["inserite"], esito["duplicate"], esito["alert"]), (3, 1, 1))
+
+        with db_session:
+            paziente = Paziente["import.test"]
+            valori = sorted((g.data_ora, g.valore) for g in Glicemia.select(lambda g: g.paziente == paziente))
+            self.assertEqual(valori, [(datetime(2025, 9, 10, 8), 110.0), (datetime(2025, 9, 10, 13), 300.0),
+                                      (datetime(2025, 9, 11, 8), 95.0)])
+
+            alert = Alert.select(lambda a: a.paziente == paziente)[:]
+            self.assertEqual(len(alert), 1)
+            self.assertEqual(alert[0].data_ora, datetime(2025, 9, 10, 13))
+
+            giorno = GlicemiaRollup.get(paziente=paziente, periodo="giorno", inizio=date(2025, 9, 10))
+            self.assertEqual((giorno.conteggio, giorno.somma), (2, 410.0))
+            # Contatori delle metriche: 110 in range, 300 sopra 180 e 250
+            self.assertEqual((giorno.in_range, giorno.sopra_180, giorno.sopra_250), (1, 1, 1))
+            versione = paziente.versione_dati.valore
+
+        # Reimportando lo stesso file non cambia nulla
+        esito = self.importa(self.CSV)
+        self.assertEqual((esito["inserite"], esito["duplicate"], esito["alert"]), (0, 4, 0))
+        with db_session:
+            paziente = Paziente["import.test"]
+            self.assertEqual(Glicemia.select(lambda g: g.paziente == paziente).count(), 3)
+            self.assertEqual(paziente.versione_dati.valore, versione)
+
+    def test_stesso_formato_del_form(self):
+        self.importa(self.CSV)
+        with db_session:
+            salvate = db.select('SELECT data_ora FROM "Glicemia" WHERE paziente = $p', {"p": "import.test"})
+        self.assertIn("2025-09-10 08:00:00.000000", salvate)
+
+        # La stessa misura inserita dal form viola la chiave primaria invece di duplicarsi
+        with self.assertRaises(TransactionIntegrityError):
+            with db_session:
+                Glicemia(paziente=Paziente["import.test"], valore=110.0, momento_pasto="digiuno",
+                         data_ora=datetime(2025, 9, 10, 8))
+                commit()
+
+    def test_misura_del_form_all_ultima_ora_del_blocco(self):
+        with db_session:
+            Glicemia(paziente=Paziente["import.test"], valore=95.0, momento_pasto="digiuno",
+                     data_ora=datetime(2025, 9, 11, 8))
+        esito = self.importa(self.CSV)
+        self.assertEqual((esito["inserite"], esito["duplicate"]), (2, 2))
+        with db_session:
+            self.assertEqual(Glicemia.select(lambda g: g.paziente.username == "import.test").count(), 3)
+
+    def test_upload_base64_a_blocchi(self):
+        contents = "data:text/csv;base64," + base64.b64encode(self.CSV.encode()).decode()
+        with patch.object(gi._Base64Reader, "BLOCK", 8):
+            esito = gi.import_glicemie_data_url("import.test", contents, batch_size=2, today=OGGI)
+        self.assertEqual(esito["inserite"], 3)
+
+        with self.assertRaises(ValueError):
+            gi.import_glicemie_data_url("import.test", "non un data url")
+
+
+if __name__ == "__main__":
+    unittest.main()
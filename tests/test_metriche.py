@@ -0,0 +1,120 @@
+# tests/test_metriche.py
+"""Metriche glicemiche: calcolo dai contatori degli aggregati giornalieri e loro ricostruzione SQL."""
+import unittest
+import sqlite3
+from datetime import date, datetime
+
+from pony.orm import db_session
+
+from model import db, Paziente, Glicemia
+from model.aggregazioni import FASCE, fasce
+from model.metriche import compute_metrics, patient_metrics
+from model.rollup import rebuild_sql
+
+
+VALORI = [50.0, 65.0, 100.0, 180.0, 200.0, 260.0]
+
+
+class TestComputeMetrics(unittest.TestCase):
+
+    def test_nessuna_misura(self):
+        metriche = compute_metrics(0, 0.0, 0.0, 0, 0, 0, 0, 0)
+        self.assertEqual(metriche["misure"], 0)
+        self.assertIsNone(metriche["gmi"])
+        self.assertIsNone(metriche["tir"])
+
+    def test_metriche(self):
+        conteggi = [sum(fasce(v)[nome] for v in VALORI) for nome in FASCE]
+        metriche = compute_metrics(len(VALORI), sum(VALORI), sum(v * v for v in VALORI), *conteggi)
+
+        self.assertAlmostEqual(metriche["media"], 142.5)
+        self.assertAlmostEqual(metriche["gmi"], 3.31 + 0.02392 * 142.5)
+        self.assertAlmostEqual(metriche["tir"], 2 / 6 * 100)     # 100 e 180 (estremi inclusi)
+        self.assertAlmostEqual(metriche["tbr"], 2 / 6 * 100)     # 50 e 65
+        self.assertAlmostEqual(metriche["tbr_54"], 1 / 6 * 100)
+        self.assertAlmostEqual(metriche["tar"], 2 / 6 * 100)     # 200 e 260
+        self.assertAlmostEqual(metriche["tar_250"], 1 / 6 * 100)
+        self.assertAlmostEqual(metriche["cv"], metriche["dev_std"] / 142.5 * 100)
+
+
+class TestRicostruzioneSQL(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.executescript(db.schema.generate_create_script())
+        for i, valore in enumerate(VALORI):
+            self.conn.execute(
+                "INSERT INTO \"Glicemia\" (paziente, valore, data_ora, momento_pasto, note) "
+                "VALUES ('anna', ?, ?, 'digiuno', '')", (valore, f"2025-09-15 0{i}:00:00")
+            )
+        self.conn.execute(
+            "INSERT INTO \"Glicemia\" (paziente, valore, data_ora, momento_pasto, note) "
+            "VALUES ('anna', 120.0, '2025-09-16 08:00:00', 'digiuno', '')"
+        )
+
+    def _giorni(self):
+        return self.conn.execute(
+            f"SELECT inizio, conteggio, {', '.join(FASCE)} FROM \"GlicemiaRollup\" "
+            f"WHERE periodo = 'giorno' ORDER BY inizio"
+        ).fetchall()
+
+    def test_backfill_uguale_agli_hook(self):
+        for sql in rebuild_sql('giorno'):
+            self.conn.execute(sql)
+
+        giorni = self._giorni()
+        self.assertEqual(len(giorni), 2)
+        # Le fasce calcolate in SQL coincidono con quelle degli hook
+        attese = {nome: sum(fasce(v)[nome] for v in VALORI) for nome in FASCE}
+        self.assertEqual(giorni[0][:2], ("2025-09-15", len(VALORI)))
+        self.assertEqual(dict(zip(FASCE, giorni[0][2:])), attese)
+        self.assertEqual(giorni[1][1:], (1, 0, 0, 1, 0, 0))
+
+    def test_ricostruzione_idempotente_per_paziente(self):
+        for _ in range(2):
+            for sql in rebuild_sql('giorno', filtra_paziente=True):
+                self.conn.execute(sql.replace("$paziente", "'anna'"))
+        self.assertEqual(len(self._giorni()), 2)
+
+
+class TestMetrichePaziente(unittest.TestCase):
+    """patient_metrics sugli aggregati giornalieri aggiornati dagli hook"""
+
+    def setUp(self):
+        with db_session:
+            paziente = Paziente(username="metriche.anna", password_hash="x", name="Anna", surname="Metriche")
+            for i, valore in enumerate(VALORI):
+                Glicemia(paziente=paziente, valore=valore, momento_pasto="digiuno",
+                         data_ora=datetime(2025, 9, 15, i))
+            # Fuori dalla finestra di 7 giorni
+            Glicemia(paziente=paziente, valore=400.0, momento_pasto="digiuno", data_ora=datetime(2025, 9, 1, 8))
+
+    def tearDown(self):
+        with db_session:
+            Paziente["metriche.anna"].delete()
+
+    def test_finestra_di_giorni(self):
+        with db_session:
+            metriche = patient_metrics("metriche.anna", days=7, today=date(2025, 9, 15))
+        self.assertEqual(metriche["misure"], len(VALORI))
+        self.assertEqual(metriche["giorni"], 7)
+        self.assertAlmostEqual(metriche["media"], 142.5)
+        self.assertAlmostEqual(metriche["tar_250"], 1 / 6 * 100)
+
+    def test_misura_modificata(self):
+        with db_session:
+            Glicemia[Paziente["metriche.anna"], datetime(2025, 9, 15, 5)].valore = 150.0
+        with db_session:
+            metriche = patient_metrics("metriche.anna", days=7, today=date(2025, 9, 15))
+        self.assertAlmostEqual(metriche["tir"], 3 / 6 * 100)
+        self.assertEqual(metriche["tar_250"], 0)
+
+    def test_nessuna_misura(self):
+        with db_session:
+            metriche = patient_metrics("metriche.anna", days=7, today=date(2025, 10, 15))
+        self.assertEqual(metriche["misure"], 0)
+        self.assertIsNone(metriche["tir"])
+
+
+if __name__ == "__main__":
+    unittest.main()
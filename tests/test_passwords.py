@@ -0,0 +1,76 @@
+# tests/test_passwords.py
+"""Hash delle password nel pool limitato e aggiornamento dei parametri all'accesso."""
+import unittest
+import threading
+from unittest.mock import patch
+
+from pony.orm import db_session
+
+import model.passwords as passwords
+from model import User
+from model.operations import validate_user
+
+# Derivazione economica: i test verificano il flusso, non il costo
+VELOCE = "pbkdf2:sha256:1000"
+
+
+class TestPool(unittest.TestCase):
+
+    def test_hash_e_verifica(self):
+        h = passwords.hash_password("segreta", VELOCE)
+        self.assertTrue(h.startswith(VELOCE + "$"))
+        self.assertTrue(passwords.verify_password(h, "segreta"))
+        self.assertFalse(passwords.verify_password(h, "sbagliata"))
+
+    def test_calcolo_nei_thread_del_pool(self):
+        nomi = []
+        with patch.object(passwords, "generate_password_hash",
+                          side_effect=lambda *a: nomi.append(threading.current_thread().name) or "h"):
+            passwords.hash_password("x")
+        self.assertTrue(nomi[0].startswith("password"))
+
+    def test_needs_rehash(self):
+        self.assertFalse(passwords.needs_rehash(VELOCE + "$salt$hash", VELOCE))
+        self.assertTrue(passwords.needs_rehash("pbkdf2:sha256:600000$salt$hash", VELOCE))
+
+    def test_coda_piena(self):
+        with patch.object(passwords, "_slots", threading.BoundedSemaphore(1)), \
+             patch.object(passwords, "PASSWORD_WAIT_TIMEOUT", 0.01):
+            passwords._slots.acquire()
+            with self.assertRaises(passwords.PasswordPoolBusy):
+                passwords.hash_password("x", VELOCE)
+
+
+class TestValidateUser(unittest.TestCase):
+
+    def setUp(self):
+        with db_session:
+            User(username="login.test", password_hash=passwords.hash_password("pwd", "pbkdf2:sha256:500"),
+                 name="Login", surname="Test")
+
+    def tearDown(self):
+        with db_session:
+            User["login.test"].delete()
+
+    def _hash(self):
+        with db_session:
+            return User["login.test"].password_hash
+
+    def test_credenziali(self):
+        with patch.object(passwords, "PASSWORD_METHOD", "pbkdf2:sha256:500"):
+            self.assertEqual(validate_user("login.test", "pwd").username, "login.test")
+            self.assertIsNone(validate_user("login.test", "altra"))
+            self.assertIsNone(validate_user("nessuno", "pwd"))
+
+    def test_aggiornamento_parametri(self):
+        with patch.object(passwords, "PASSWORD_METHOD", VELOCE):
+            vecchio = self._hash()
+            self.assertIsNotNone(validate_user("login.test", "pwd"))
+            nuovo = self._hash()
+        self.assertNotEqual(nuovo, vecchio)
+        self.assertTrue(nuovo.startswith(VELOCE + "$"))
+        self.assertTrue(passwords.verify_password(nuovo, "pwd"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+# tests/test_payload.py
+"""Template compatto delle figure e misura delle risposte delle callback."""
+import unittest
+import json
+from unittest.mock import patch, MagicMock
+
+from flask import Flask, jsonify
+
+import controller.payload as payload
+from controller.figures import new_figure, empty_figure
+from controller.patient import _create_weekly_dow_chart
+
+
+class TestTemplateCompatto(unittest.TestCase):
+
+    def test_figura_senza_template_predefinito(self):
+        fig = _create_weekly_dow_chart([100, 120, None, 130, 140, 150, 110]).to_dict()
+        template = fig["layout"]["template"]
+        self.assertNotIn("data", template)
+        self.assertEqual(template["layout"]["plot_bgcolor"], "white")
+        # Il template predefinito di Plotly da solo supera i 7 KB
+        self.assertLess(len(json.dumps(fig)), 2500)
+
+    def test_layout_aggiuntivo(self):
+        fig = new_figure(hovermode="x unified").to_dict()
+        self.assertEqual(fig["layout"]["hovermode"], "x unified")
+        self.assertEqual(empty_figure("vuoto").to_dict()["layout"]["annotations"][0]["text"], "vuoto")
+
+
+class TestPayload(unittest.TestCase):
+
+    def setUp(self):
+        payload.reset_payload_stats()
+        self.app = Flask(__name__)
+        payload.register_payload_instrumentation(self.app)
+
+        @self.app.route("/_dash-update-component", methods=["POST"])
+        def update():
+            return jsonify({"response": {"x": list(range(100))}})
+
+        @self.app.route("/altro", methods=["POST"])
+        def altro():
+            return jsonify({})
+
+    def tearDown(self):
+        payload.reset_payload_stats()
+
+    def test_statistiche_per_callback(self):
+        client = self.app.test_client()
+        for _ in range(2):
+            r = client.post("/_dash-update-component", json={"output": "grafico.figure"})
+        client.post("/altro", json={"output": "ignorato"})
+
+        stats = payload.payload_stats()
+        self.assertEqual(list(stats), ["grafico.figure"])
+        self.assertEqual(stats["grafico.figure"]["chiamate"], 2)
+        self.assertEqual(stats["grafico.figure"]["byte_max"], len(r.get_data()))
+        self.assertEqual(stats["grafico.figure"]["byte_totali"], 2 * len(r.get_data()))
+
+    def test_log_debug(self):
+        with self.assertLogs("controller.payload", level="DEBUG") as log:
+            self.app.test_client().post("/_dash-update-component", json={"output": "grafico.figure"})
+        self.assertIn("grafico.figure", log.output[0])
+
+    def test_endpoint_solo_admin(self):
+        client = self.app.test_client()
+        client.post("/_dash-update-component", json={"output": "grafico.figure"})
+
+        with patch.object(payload, "current_user", MagicMock(is_authenticated=True, is_admin=False)):
+            self.assertEqual(client.get(payload.STATS_PATH).status_code, 403)
+        with patch.object(payload, "current_user", MagicMock(is_authenticated=True, is_admin=True)):
+            dati = client.get(payload.STATS_PATH).get_json()
+        self.assertEqual(dati["callback"]["grafico.figure"]["chiamate"], 1)
+        self.assertIn("pid", dati)
+
+
+if __name__ == "__main__":
+    unittest.main()
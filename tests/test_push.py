@@ -0,0 +1,109 @@
+# tests/test_push.py
+"""Canale push: versione degli alert per medico nel database, risveglio nel processo e stream SSE."""
+import unittest
+import threading
+import types
+from unittest.mock import patch
+
+from flask import Flask
+from pony.orm import db_session
+
+import controller.push as push
+from model import Medico, Paziente, VersioneAlertMedico
+
+
+class TestPushBroker(unittest.TestCase):
+
+    def setUp(self):
+        with db_session:
+            rossi = Medico(username="push.rossi", password_hash="x", name="Mario", surname="Rossi",
+                           email="push.rossi@example.it")
+            Medico(username="push.bianchi", password_hash="x", name="Luca", surname="Bianchi",
+                   email="push.bianchi@example.it")
+            Paziente(username="push.anna", password_hash="x", name="Anna", surname="Push").doctors.add(rossi)
+
+    def tearDown(self):
+        with db_session:
+            Paziente["push.anna"].delete()
+            for username in ("push.rossi", "push.bianchi"):
+                Medico[username].delete()
+            VersioneAlertMedico.select(lambda v: v.medico.startswith("push.")).delete(bulk=True)
+
+    def test_notifica_solo_medici_del_paziente(self):
+        paziente = types.SimpleNamespace(username="push.anna")
+        self.assertEqual(push.notify_patient_doctors(paziente, {"categoria": "glicemia"}), 1)
+        self.assertEqual(push.notify_patient_doctors(paziente, {"categoria": "terapia"}), 1)
+
+        self.assertEqual(push.current_version("push.rossi"),
+                         (2, {"patient_id": "push.anna", "categoria": "terapia"}))
+        self.assertEqual(push.current_version("push.bianchi"), (0, {}))
+
+    def test_stream_risvegliato_dalla_notifica(self):
+        push.notify_doctors(["push.rossi"], {"n": 1})
+        stream = push.event_stream("push.rossi", heartbeat=0.01)
+        # Prima connessione: id = versione attuale, nessun evento già visto
+        self.assertEqual(next(stream), "retry: 5000\nid: 1\n\n")
+        self.assertEqual(next(stream), ": keep-alive\n\n")
+
+        # Notifica nello stesso processo: evento senza attendere il controllo periodico
+        push.notify_doctors(["push.rossi"], {"categoria": "terapia"})
+        self.assertEqual(next(stream), 'id: 2\nevent: alerts\ndata: {"categoria": "terapia"}\n\n')
+        stream.close()
+
+    def test_connessione_inattiva_non_legge_il_database(self):
+        with patch.object(push, "current_version", wraps=push.current_version) as letture:
+            stream = push.event_stream("push.rossi", heartbeat=0.01, max_seconds=0.1)
+            self.assertEqual(list(stream)[0], "retry: 5000\nid: 0\n\n")
+        # Solo la lettura iniziale: gli heartbeat non interrogano il database
+        self.assertEqual(letture.call_count, 1)
+
+    def test_scrittura_di_un_altro_processo(self):
+        stream = push.event_stream("push.rossi", backstop=0.01, heartbeat=60)
+        self.assertEqual(next(stream), "retry: 5000\nid: 0\n\n")
+        # Scrittura senza notifica nel processo (es. un altro worker): la vede il controllo periodico
+        with db_session:
+            push.db.execute(push._BUMP_DOCTOR_SQL, {"medico": "push.rossi", "evento": '{"n": 1}'})
+        self.assertEqual(next(stream), 'id: 1\nevent: alerts\ndata: {"n": 1}\n\n')
+        stream.close()
+
+    def test_riconnessione_recupera_eventi_persi(self):
+        push.notify_doctors(["push.rossi"], {"n": 1})
+        push.notify_doctors(["push.rossi"], {"n": 2})
+        stream = push.event_stream("push.rossi", last_id=1)
+        self.assertEqual(next(stream), "retry: 5000\n\n")
+        self.assertEqual(next(stream), 'id: 2\nevent: alerts\ndata: {"n": 2}\n\n')
+        stream.close()
+
+    def test_durata_massima_libera_il_thread(self):
+        stream = push.event_stream("push.rossi", heartbeat=60, max_seconds=0.05)
+        self.assertEqual(list(stream), ["retry: 5000\nid: 0\n\n"])
+
+
+class TestEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.server = Flask(__name__)
+        push.register_push_routes(self.server)
+        medico = types.SimpleNamespace(is_authenticated=True, role="Medico", username="push.rossi")
+        patcher = patch.object(push, "current_user", medico)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get(self, multithread=True):
+        return self.server.test_client().get("/alerts/stream", environ_overrides={"wsgi.multithread": multithread})
+
+    def test_worker_sincrono_rifiutato(self):
+        self.assertEqual(self._get(multithread=False).status_code, 503)
+
+    def test_connessioni_limitate_per_processo(self):
+        with patch.object(push, "_slots", threading.BoundedSemaphore(1)):
+            prima = self._get()
+            self.assertEqual(prima.status_code, 200)
+            self.assertEqual(self._get().status_code, 503)
+            # Chiusa la prima connessione il posto torna libero
+            prima.close()
+            self.assertTrue(push._slots.acquire(blocking=False))
+
+
+if __name__ == "__main__":
+    unittest.main()
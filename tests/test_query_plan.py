@@ -0,0 +1,194 @@
+# tests/test_query_plan.py
+"""Verifica che le query più frequenti usino indici e non scansioni di tabella.
+
+Lo schema generato da Pony viene ricreato in un database SQLite in memoria,
+le migrazioni vengono applicate e su ogni query si esegue EXPLAIN QUERY PLAN.
+"""
+import unittest
+import sqlite3
+import re
+from datetime import datetime, date
+from pony.orm import db_session, desc
+
+from model import db, Medico, Paziente
+from model.migrations import apply_migrations, get_schema_version, add_columns, LATEST_VERSION
+import controller.alert_engine as engine
+import controller.patient as patient
+from controller.adherence import intake_range_query
+from model.rollup import GlicemiaRollup
+from model.aggregazioni import FASCE, bucket_stats_sql
+from controller.analytics import panel_stats_sql
+from controller.export import DATASETS, page_sql
+
+
+def _fresh_schema():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(db.schema.generate_create_script())
+    return conn
+
+
+class TestMigrations(unittest.TestCase):
+
+    def test_database_nuovo_portato_all_ultima_versione(self):
+        conn = _fresh_schema()
+        self.assertEqual(get_schema_version(conn), 0)
+        self.assertEqual(apply_migrations(conn)[-1], LATEST_VERSION)
+        self.assertEqual(get_schema_version(conn), LATEST_VERSION)
+
+        indici = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertIn("idx_terapia__paziente_periodo", indici)
+        self.assertIn("idx_sintomi__paziente_data_fine", indici)
+
+    def test_migrazioni_applicate_una_sola_volta(self):
+        conn = _fresh_schema()
+        apply_migrations(conn)
+        self.assertEqual(apply_migrations(conn), [])
+
+    def test_errore_annulla_la_migrazione(self):
+        conn = _fresh_schema()
+        rotta = [(1, "rotta", [
+            'CREATE INDEX "idx_valido" ON "Glicemia" ("valore")',
+            'CREATE INDEX "idx_x" ON "Tabella_Inesistente" ("a")',
+        ])]
+        with self.assertRaises(sqlite3.OperationalError):
+            apply_migrations(conn, rotta)
+        self.assertEqual(get_schema_version(conn), 0)
+        # Anche la DDL riuscita prima dell'errore viene annullata
+        indici = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertNotIn("idx_valido", indici)
+
+    def test_migrazione_con_transazione_aperta(self):
+        # Come la connessione di Pony: transazione già in corso
+        conn = _fresh_schema()
+        conn.isolation_level = None
+        conn.execute("BEGIN IMMEDIATE")
+        self.assertEqual(apply_migrations(conn)[-1], LATEST_VERSION)
+        self.assertFalse(conn.in_transaction)
+        self.assertEqual(get_schema_version(conn), LATEST_VERSION)
+
+    def test_contatori_aggiunti_agli_aggregati_esistenti(self):
+        # Database alla versione 3: aggregati senza contatori e tabella delle metriche separata
+        conn = _fresh_schema()
+        conn.execute('DROP TABLE "GlicemiaRollup"')
+        conn.execute('CREATE TABLE "GlicemiaRollup" (paziente TEXT NOT NULL, periodo TEXT NOT NULL, '
+                     'inizio DATE NOT NULL, conteggio INTEGER NOT NULL, somma REAL NOT NULL, '
+                     'minimo REAL NOT NULL, massimo REAL NOT NULL, somma_quadrati REAL NOT NULL, '
+                     'PRIMARY KEY (paziente, periodo, inizio))')
+        conn.execute('CREATE TABLE "MetricheGiornaliere" (paziente TEXT, giorno DATE)')
+        conn.execute("INSERT INTO \"Glicemia\" (paziente, valore, data_ora, momento_pasto, note) "
+                     "VALUES ('anna', 260.0, '2025-09-15 08:00:00.000000', 'digiuno', '')")
+        conn.execute("PRAGMA user_version = 3")
+        conn.commit()
+
+        self.assertEqual(apply_migrations(conn), [4])
+        riga = conn.execute(f"SELECT {', '.join(FASCE)} FROM \"GlicemiaRollup\" "
+                            f"WHERE periodo = 'giorno'").fetchone()
+        self.assertEqual(riga, (0, 0, 0, 1, 1))
+        tabelle = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.assertNotIn("MetricheGiornaliere", tabelle)
+
+    def test_colonne_gia_presenti_saltate(self):
+        conn = _fresh_schema()
+        self.assertEqual(add_columns("GlicemiaRollup", [("sotto_54", "INTEGER")])(conn), [])
+
+
+class TestQueryPlan(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.conn = _fresh_schema()
+        apply_migrations(cls.conn)
+
+    def setUp(self):
+        self.session = db_session()
+        self.session.__enter__()
+        # Oggetti non caricati: servono solo come parametri per generare l'SQL
+        self.medico = Medico._get_by_raw_pkval_(("medico.test",))
+        self.paziente = Paziente._get_by_raw_pkval_(("paziente.test",))
+        self.oggi = date(2025, 9, 15)
+
+    def tearDown(self):
+        self.session.__exit__(None, None, None)
+
+    def assertUsesIndexes(self, query):
+        sql = query.get_sql()
+        plan = [row[-1] for row in self.conn.execute("EXPLAIN QUERY PLAN " + sql, [None] * sql.count("?"))]
+        scans = [step for step in plan if step.startswith("SCAN")]
+        self.assertEqual(scans, [], f"Scansione completa nel piano: {plan}")
+        return plan
+
+    # --- Alert medico ---
+
+    def test_pagina_alert_medico(self):
+        query = engine._doctor_alerts_query(
+            self.medico, since=datetime(2025, 9, 1), severities=["danger", "warning"]
+        ).order_by(lambda a: (desc(a.data_ora), desc(a.id)))
+        plan = self.assertUsesIndexes(query)
+        self.assertTrue(any("idx_alert__paziente" in step for step in plan))
+
+    def test_pagina_alert_con_cursore(self):
+        c_ts, c_id = datetime(2025, 9, 10), 42
+        query = engine._doctor_alerts_query(self.medico).filter(
+            lambda a: a.data_ora < c_ts or (a.data_ora == c_ts and a.id < c_id)
+        )
+        self.assertUsesIndexes(query)
+
+    def test_livello_campanella(self):
+        self.assertUsesIndexes(engine._doctor_alerts_query(self.medico, severities=["danger"]))
+
+    def test_impronta_versioni_e_stati_scaduti(self):
+        self.assertUsesIndexes(engine._versions_query(self.medico))
+        self.assertUsesIndexes(engine._new_patients_query(self.medico))
+        self.assertUsesIndexes(engine._stale_patients_query(self.medico, self.oggi))
+
+    # --- Promemoria giornalieri del paziente ---
+
+    def test_promemoria_paziente(self):
+        self.assertUsesIndexes(patient._assunzioni_day_query(self.paziente, self.oggi))
+        self.assertUsesIndexes(patient._glicemia_day_query(self.paziente, self.oggi))
+        plan = self.assertUsesIndexes(patient._active_therapies_query(self.paziente, self.oggi))
+        self.assertTrue(any("idx_terapia__paziente_periodo" in step for step in plan))
+
+    # --- Aderenza e grafici ---
+
+    def test_finestra_assunzioni_aderenza(self):
+        self.assertUsesIndexes(intake_range_query(self.paziente, date(2025, 9, 13), self.oggi))
+
+    def test_aggregati_grafici(self):
+        query = GlicemiaRollup.select(
+            lambda r: r.paziente.username == "paziente.test" and r.periodo == 'settimana' and
+                      r.inizio >= date(2025, 7, 1) and r.inizio < self.oggi
+        )
+        self.assertUsesIndexes(query)
+
+    def test_metriche_giornaliere(self):
+        # Stessa query di patient_metrics sugli aggregati giornalieri
+        query = GlicemiaRollup.select(
+            lambda r: r.paziente.username == "paziente.test" and r.periodo == 'giorno' and
+                      r.inizio >= date(2025, 9, 1) and r.inizio <= self.oggi
+        )
+        self.assertUsesIndexes(query)
+
+    def test_group_by_glicemie(self):
+        for periodo in ('giorno', 'settimana', 'mese'):
+            sql = re.sub(r"\$\w+", "?", bucket_stats_sql(periodo))
+            plan = [row[-1] for row in self.conn.execute("EXPLAIN QUERY PLAN " + sql, [None] * 3)]
+            self.assertFalse([s for s in plan if s.startswith("SCAN")], plan)
+
+    def test_panoramica_pazienti_medico(self):
+        sql = re.sub(r"\$\w+", "?", panel_stats_sql())
+        plan = [row[-1] for row in self.conn.execute("EXPLAIN QUERY PLAN " + sql, [None] * 2)]
+        self.assertFalse([s for s in plan if s.startswith("SCAN")], plan)
+
+    def test_pagine_export(self):
+        for dataset in DATASETS:
+            for first_page in (True, False):
+                sql = page_sql(dataset, first_page)
+                n = len(re.findall(r"\$\w+", sql))
+                sql = re.sub(r"\$\w+", "?", sql)
+                plan = [row[-1] for row in self.conn.execute("EXPLAIN QUERY PLAN " + sql, [None] * n)]
+                self.assertFalse([s for s in plan if s.startswith("SCAN")], plan)
+
+
+if __name__ == "__main__":
+    unittest.main()
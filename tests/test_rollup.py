@@ -0,0 +1,72 @@
+# tests/test_rollup.py
+"""Aggregati glicemici: periodi e ricostruzione SQL su uno schema in memoria."""
+import unittest
+import sqlite3
+from datetime import date, datetime
+
+from model import db
+from model.rollup import period_start, period_end, rebuild_sql, rebuild_all_sql
+
+
+class TestPeriodi(unittest.TestCase):
+
+    def test_inizio_periodo(self):
+        giorno = datetime(2025, 9, 17, 14, 30)  # mercoledì
+        self.assertEqual(period_start('giorno', giorno), date(2025, 9, 17))
+        self.assertEqual(period_start('settimana', giorno), date(2025, 9, 15))
+        self.assertEqual(period_start('mese', giorno), date(2025, 9, 1))
+
+    def test_fine_periodo(self):
+        self.assertEqual(period_end('giorno', date(2025, 12, 31)), date(2026, 1, 1))
+        self.assertEqual(period_end('settimana', date(2025, 9, 15)), date(2025, 9, 22))
+        self.assertEqual(period_end('mese', date(2025, 2, 1)), date(2025, 3, 1))
+        self.assertEqual(period_end('mese', date(2025, 12, 1)), date(2026, 1, 1))
+
+    def test_periodo_non_valido(self):
+        with self.assertRaises(ValueError):
+            period_start('anno', date(2025, 1, 1))
+
+
+class TestRicostruzioneSQL(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.executescript(db.schema.generate_create_script())
+        # Chiavi esterne non attive di default: basta la tabella Glicemia
+        for data_ora, valore in [
+            ("2025-09-14 20:00:00", 100.0),  # domenica: settimana precedente
+            ("2025-09-15 08:00:00", 120.0),
+            ("2025-09-15 13:00:00", 180.0),
+            ("2025-09-17 08:00:00", 90.0),
+        ]:
+            self.conn.execute(
+                "INSERT INTO \"Glicemia\" (paziente, valore, data_ora, momento_pasto, note) "
+                "VALUES ('anna', ?, ?, 'digiuno', '')", (valore, data_ora)
+            )
+
+    def _rollups(self, periodo):
+        return self.conn.execute(
+            "SELECT inizio, conteggio, somma, minimo, massimo FROM \"GlicemiaRollup\" "
+            "WHERE periodo = ? ORDER BY inizio", (periodo,)
+        ).fetchall()
+
+    def test_ricostruzione_completa(self):
+        for sql in rebuild_all_sql():
+            self.conn.execute(sql)
+
+        self.assertEqual(self._rollups('settimana'), [
+            ("2025-09-08", 1, 100.0, 100.0, 100.0),
+            ("2025-09-15", 3, 390.0, 90.0, 180.0),
+        ])
+        self.assertEqual(self._rollups('mese'), [("2025-09-01", 4, 490.0, 90.0, 180.0)])
+        self.assertEqual(len(self._rollups('giorno')), 3)
+
+    def test_ricostruzione_idempotente_per_paziente(self):
+        for _ in range(2):
+            for sql in rebuild_sql('giorno', filtra_paziente=True):
+                self.conn.execute(sql.replace("$paziente", "'anna'"))
+        self.assertEqual(self._rollups('giorno')[1], ("2025-09-15", 2, 300.0, 120.0, 180.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
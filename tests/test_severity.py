@@ -0,0 +1,42 @@
+# tests/test_severity.py
+import unittest
+import sqlite3
+import types
+
+from controller.severity import classify_severity, severity_names, severity_case_sql
+from controller.alert_engine import _is_anomalo_with_severity
+
+
+VALORI = [None, 40, 60, 80, 110, 140, 140, 160, 190, 190, 210, 210, 230, 300, "abc"]
+MOMENTI = ["digiuno", "digiuno", "dopo_pasto", None, "digiuno", " Digiuno ", "dopo_pasto",
+           "prima_pasto", "dopo_pasto", "digiuno", "digiuno", "dopo_pasto", "dopo_pasto", None, "digiuno"]
+
+
+class TestClassifySeverity(unittest.TestCase):
+
+    def test_batch_classifica_tutto_lo_storico(self):
+        self.assertEqual(severity_names(classify_severity(VALORI, MOMENTI)), [
+            None, 'danger', 'danger-orange', 'warning', None, 'warning', None,
+            'danger-orange', 'warning', 'danger-orange', 'danger', 'danger-orange',
+            'danger-orange', 'danger', None
+        ])
+
+    def test_wrapper_scalare_coerente_con_batch(self):
+        attesi = severity_names(classify_severity(VALORI, MOMENTI))
+        for valore, momento, atteso in zip(VALORI, MOMENTI, attesi):
+            misura = types.SimpleNamespace(momento_pasto=momento)
+            self.assertEqual(_is_anomalo_with_severity(valore, misura), atteso)
+
+    def test_case_sql_equivalente_a_numpy(self):
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE glicemia (valore REAL, momento_pasto TEXT)")
+        righe = [(v, m) for v, m in zip(VALORI, MOMENTI) if v != "abc"]
+        conn.executemany("INSERT INTO glicemia VALUES (?, ?)", righe)
+
+        sql_codes = [r[0] for r in conn.execute(f"SELECT {severity_case_sql()} FROM glicemia")]
+        np_codes = classify_severity([r[0] for r in righe], [r[1] for r in righe]).tolist()
+        self.assertEqual(sql_codes, np_codes)
+
+
+if __name__ == "__main__":
+    unittest.main()
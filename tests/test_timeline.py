@@ -0,0 +1,116 @@
+# tests/test_timeline.py
+"""Timeline glicemica: intervallo dello zoom e sottocampionamento min/max in SQL."""
+import unittest
+import sqlite3
+import re
+from datetime import datetime, timedelta
+
+from pony.orm import db_session
+
+from model import db, Paziente, Glicemia
+from controller.timeline import (
+    relayout_range, timeline_minmax_sql, timeline_raw_sql, create_timeline_figure, load_timeline
+)
+from controller.severity import DANGER, SEVERITY_COLORS
+
+
+def _named(sql):
+    """Parametri Pony $nome -> parametri nominali sqlite3 :nome"""
+    return re.sub(r"\$(\w+)", r":\1", sql)
+
+
+class TestRelayoutRange(unittest.TestCase):
+
+    def test_zoom(self):
+        start, end = relayout_range({"xaxis.range[0]": "2025-09-01 06:30:00.123",
+                                     "xaxis.range[1]": "2025-09-10"})
+        self.assertEqual(start, datetime(2025, 9, 1, 6, 30, 0, 123000))
+        self.assertEqual(end, datetime(2025, 9, 10))
+
+    def test_vista_completa(self):
+        self.assertEqual(relayout_range(None), (None, None))
+        self.assertEqual(relayout_range({"xaxis.autorange": True}), (None, None))
+        self.assertEqual(relayout_range({"yaxis.range[0]": 10}), (None, None))
+        self.assertEqual(relayout_range({"xaxis.range[0]": "x", "xaxis.range[1]": "y"}), (None, None))
+
+
+class TestSottocampionamento(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.executescript(db.schema.generate_create_script())
+        self.inizio = datetime(2025, 9, 1)
+        # 4 misure ogni ora per 2 giorni, con un picco critico
+        rows = []
+        for i in range(48 * 4):
+            valore = 100.0 + (i % 4) * 10
+            if i == 57:
+                valore = 320.0
+            rows.append(("anna", valore, (self.inizio + timedelta(minutes=15 * i)).strftime("%Y-%m-%d %H:%M:%S")))
+        self.conn.executemany(
+            "INSERT INTO \"Glicemia\" (paziente, valore, data_ora, momento_pasto, note) "
+            "VALUES (?, ?, ?, 'dopo_pasto', '')", rows
+        )
+        self.params = {"paziente": "anna", "start": "2025-09-01 00:00:00", "end": "2025-09-03 00:00:00"}
+
+    def test_min_max_per_fascia_conserva_i_picchi(self):
+        params = dict(self.params, j0=self.conn.execute("SELECT julianday(?)", (self.params["start"],)).fetchone()[0],
+                      scale=24.0, ultima=47)  # una fascia per ora
+        rows = self.conn.execute(_named(timeline_minmax_sql()), params).fetchall()
+
+        self.assertLessEqual(len(rows), 48 * 2)
+        self.assertEqual([r[0] for r in rows], sorted(r[0] for r in rows))
+        picco = [r for r in rows if r[1] == 320.0]
+        self.assertEqual(len(picco), 1)
+        self.assertEqual(picco[0][2], DANGER)
+        self.assertEqual(min(r[1] for r in rows), 100.0)
+
+    def test_misure_grezze(self):
+        rows = self.conn.execute(_named(timeline_raw_sql()), self.params).fetchall()
+        self.assertEqual(len(rows), 48 * 4)
+
+    def test_nessuna_scansione_completa(self):
+        for sql in (timeline_raw_sql(), timeline_minmax_sql()):
+            plan = [r[-1] for r in self.conn.execute("EXPLAIN QUERY PLAN " + _named(sql),
+                                                     dict(self.params, j0=0, scale=1, ultima=0))]
+            self.assertFalse([s for s in plan if s.startswith("SCAN Glicemia")], plan)
+
+
+class TestLimitePunti(unittest.TestCase):
+    """Sottocampionamento completo sul database in memoria dei test"""
+
+    def setUp(self):
+        self.inizio = datetime(2025, 9, 1)
+        with db_session:
+            paziente = Paziente(username="timeline.anna", password_hash="x", name="Anna", surname="Timeline")
+            # Una misura all'ora per 4 giorni, l'ultima esattamente alla fine dell'intervallo
+            for i in range(4 * 24 + 1):
+                Glicemia(paziente=paziente, valore=100.0 + i % 7, momento_pasto="digiuno",
+                         data_ora=self.inizio + timedelta(hours=i))
+
+    def tearDown(self):
+        with db_session:
+            Paziente["timeline.anna"].delete()
+
+    def test_misura_alla_fine_dell_intervallo(self):
+        with db_session:
+            data = load_timeline("timeline.anna", self.inizio, self.inizio + timedelta(days=4), max_points=10)
+        # Anche la misura esattamente alla fine fa parte dell'intervallo...
+        self.assertEqual(data["totale"], 4 * 24 + 1)
+        self.assertTrue(data["campionato"])
+        # ...ma non apre una fascia in più oltre l'ultima
+        self.assertLessEqual(len(data["x"]), 10)
+
+
+class TestFigura(unittest.TestCase):
+
+    def test_colori_per_gravita(self):
+        data = {"x": [datetime(2025, 9, 1), datetime(2025, 9, 2)], "y": [110.0, 320.0],
+                "severita": [0, DANGER], "totale": 2, "campionato": False}
+        fig = create_timeline_figure(data)
+        self.assertEqual(list(fig.data[0].marker.color), [SEVERITY_COLORS[0], SEVERITY_COLORS[DANGER]])
+        self.assertGreaterEqual(fig.layout.yaxis.range[1], 320)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+# tests/test_user_cache.py
+import unittest
+from unittest.mock import patch
+import types
+
+from pony.orm import db_session, commit
+
+import model.user_cache as user_cache
+from model import db
+
+
+def _user(username="anna", role="Paziente"):
+    return types.SimpleNamespace(username=username, role=role, is_admin=False,
+                                 name="Anna", surname="Sandre")
+
+
+class TestUserCache(unittest.TestCase):
+
+    def setUp(self):
+        user_cache.invalidate_user()
+        user_cache._prossimo_controllo = 0.0
+
+    @patch("model.user.User")
+    def test_seconda_richiesta_senza_query(self, mock_user):
+        mock_user.get.return_value = _user()
+
+        primo = user_cache.load_user_snapshot("anna")
+        secondo = user_cache.load_user_snapshot("anna")
+
+        self.assertIs(primo, secondo)
+        self.assertEqual(primo.get_id(), "anna")
+        self.assertEqual(primo.role, "Paziente")
+        mock_user.get.assert_called_once_with(username="anna")
+
+    @patch("model.user.User")
+    def test_invalidazione_ricarica_dal_database(self, mock_user):
+        mock_user.get.return_value = _user()
+        user_cache.load_user_snapshot("anna")
+        user_cache.invalidate_user("anna")
+
+        mock_user.get.return_value = None  # utente eliminato
+        self.assertIsNone(user_cache.load_user_snapshot("anna"))
+        self.assertEqual(mock_user.get.call_count, 2)
+
+    @patch("model.user.User")
+    def test_copia_scaduta_ricaricata(self, mock_user):
+        mock_user.get.return_value = _user()
+        with patch("model.cache.time.monotonic", return_value=1000.0):
+            user_cache.load_user_snapshot("anna")
+        with patch("model.cache.time.monotonic", return_value=1000.0 + user_cache.USER_CACHE_TTL + 1):
+            user_cache.load_user_snapshot("anna")
+        self.assertEqual(mock_user.get.call_count, 2)
+
+    @patch("model.user.User")
+    def test_modifica_da_un_altro_processo(self, mock_user):
+        mock_user.get.return_value = _user(role="Medico")
+        self.assertEqual(user_cache.load_user_snapshot("anna").role, "Medico")
+
+        # Un altro worker cambia l'utente: solo la versione nel database lo segnala
+        with db_session:
+            db.execute(user_cache._BUMP_SQL)
+            commit()
+        mock_user.get.return_value = _user(role="Paziente")
+
+        # Entro USER_VERSION_CHECK secondi la copia locale resta valida...
+        self.assertEqual(user_cache.load_user_snapshot("anna").role, "Medico")
+        # ...poi la versione viene riletta e la cache svuotata
+        user_cache._prossimo_controllo = 0.0
+        self.assertEqual(user_cache.load_user_snapshot("anna").role, "Paziente")
+        self.assertEqual(mock_user.get.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+# view/components.py
+"""Componenti condivisi dalle dashboard di paziente e medico"""
+from urllib.parse import quote
+
+from dash import html
+import dash_bootstrap_components as dbc
+
+
+def _fmt_metric(value, fmt="{:.0f}"):
+    """Valore di una metrica formattato o trattino se assente"""
+    return fmt.format(value) if value is not None else "—"
+
+def create_metrics_card(metriche):
+    """Riquadro con GMI, media, variabilità e tempo nelle fasce glicemiche"""
+    if not metriche["misure"]:
+        return dbc.Alert(f"Nessuna glicemia negli ultimi {metriche['giorni']} giorni.",
+                         color="light", className="mb-3")
+
+    valori = [
+        ("GMI", _fmt_metric(metriche["gmi"], "{:.1f} %")),
+        ("Media", _fmt_metric(metriche["media"], "{:.0f} mg/dL")),
+        ("CV", _fmt_metric(metriche["cv"], "{:.0f} %")),
+        ("In range 70-180", _fmt_metric(metriche["tir"], "{:.0f} %")),
+        ("Sotto 70", _fmt_metric(metriche["tbr"], "{:.0f} %")),
+        ("Sotto 54", _fmt_metric(metriche["tbr_54"], "{:.0f} %")),
+        ("Sopra 180", _fmt_metric(metriche["tar"], "{:.0f} %")),
+        ("Sopra 250", _fmt_metric(metriche["tar_250"], "{:.0f} %")),
+    ]
+    return html.Div([
+        html.H6(f"Metriche ultimi {metriche['giorni']} giorni ({metriche['misure']} misure)",
+                className="text-secondary mb-2"),
+        dbc.Row([
+            dbc.Col([
+                html.Div(label, className="text-muted small"),
+                html.Div(value, className="fw-bold")
+            ], width=6, md=3, className="mb-2")
+            for label, value in valori
+        ])
+    ], className="mb-3")
+
+EXPORT_DATASETS = [
+    ("glicemie", "Glicemie"),
+    ("assunzioni", "Assunzioni"),
+    ("sintomi", "Sintomi e patologie"),
+    ("terapie", "Terapie"),
+]
+
+def create_export_links(scope, username, title="Esporta dati (CSV)"):
+    """Link di download degli export CSV (scope 'paziente' o 'medico')"""
+    return html.Div([
+        html.H6(title, className="text-secondary mb-2"),
+        html.Div([
+            html.A([html.I(className="fas fa-download me-1"), label],
+                   href=f"/export/{scope}/{quote(username)}/{dataset}.csv", download="",
+                   className="btn btn-outline-secondary btn-sm me-2 mb-2")
+            for dataset, label in EXPORT_DATASETS
+        ])
+    ], className="mb-3")
@@ -3,6 +3,7 @@
 from dash import html, dcc
 import dash_bootstrap_components as dbc
 from datetime import datetime, date
+from view.components import create_metrics_card, create_export_links
 
 def create_header_with_logo_and_logout(username):
     """Crea header con logo e logout"""
@@ -165,13 +166,54 @@ def get_doctor_dashboard(username):
 
                     ]),
                     dcc.Store(id="alerts-store-medico"),
-                    dcc.Interval(id="alerts-poll-medico", interval=60_000, n_intervals=0),
+                    # Aggiornato dal canale push (assets/alerts_push.js) quando cambia un alert
+                    dcc.Store(id="alerts-push-medico"),
+                    # Ripiego lento, attivato da assets/alerts_push.js solo se il canale push
+                    # non è disponibile (connessioni esaurite, proxy, browser senza EventSource)
+                    dcc.Interval(id="alerts-poll-medico", interval=300_000, n_intervals=0, disabled=True),
                     dbc.Modal(
                         id="alerts-modal-medico",
                         is_open=False,
                         children=[
                             dbc.ModalHeader(dbc.ModalTitle("Notifiche pazienti")),
-                            dbc.ModalBody(id="alerts-modal-body-medico"),
+                            dbc.ModalBody([
+                                # Filtri: periodo e gravità
+                                dbc.Row([
+                                    dbc.Col([
+                                        dbc.Select(
+                                            id="alerts-period-medico",
+                                            options=[
+                                                {"label": "Ultimi 7 giorni", "value": "7"},
+                                                {"label": "Ultimi 30 giorni", "value": "30"},
+                                                {"label": "Ultimi 90 giorni", "value": "90"},
+                                                {"label": "Tutto lo storico", "value": "tutti"},
+                                            ],
+                                            value="tutti",
+                                        )
+                                    ], width=12, md=5, className="mb-2"),
+                                    dbc.Col([
+                                        dbc.Checklist(
+                                            id="alerts-severity-medico",
+                                            options=[
+                                                {"label": "Critiche", "value": "danger"},
+                                                {"label": "Preoccupanti", "value": "danger-orange"},
+                                                {"label": "Anomale", "value": "warning"},
+                                            ],
+                                            value=["danger", "danger-orange", "warning"],
+                                            inline=True,
+                                        )
+                                    ], width=12, md=7, className="mb-2 d-flex align-items-center"),
+                                ], className="mb-2"),
+                                html.Div(id="alerts-modal-body-medico"),
+                                # Pagine successive caricate su richiesta
+                                html.Div(
+                                    dbc.Button("Carica altri", id="alerts-load-more-medico",
+                                               color="outline-secondary", size="sm", n_clicks=0),
+                                    id="alerts-load-more-wrapper-medico",
+                                    className="text-center mt-3",
+                                    style={"display": "none"}
+                                ),
+                            ]),
                             dbc.ModalFooter(
                                 dbc.Button("Chiudi", id="alerts-modal-close-medico", color="secondary")
                                 )
@@ -605,13 +647,35 @@ def get_edit_terapia_form(terapia, pazienti):
             ], className="d-grid gap-2 d-md-flex justify-content-md-end")
         ])
     ], className="mt-3")
-def get_andamento_glicemico_medico_view():
+def get_andamento_glicemico_medico_view(medico_username=None):
     return dbc.Card([
         dbc.CardHeader(
             html.H5("Andamento glicemico — settimanale e mensile", 
                 className="doctor-title mb-0", style={"fontWeight": "400"})
         ),
         dbc.CardBody([
+            # Panoramica di tutti i pazienti seguiti
+            html.H6("Panoramica dei miei pazienti", className="form-label"),
+            html.Div([
+                html.Label("Periodo", className="form-label"),
+                dcc.Dropdown(
+                    id="panel-window-medico",
+                    options=[
+                        {"label": "Ultimi 7 giorni", "value": 7},
+                        {"label": "Ultimi 30 giorni", "value": 30},
+                        {"label": "Ultimi 90 giorni", "value": 90}
+                    ],
+                    value=30,
+                    clearable=False,
+                    style={"maxWidth": "320px"},
+                    className="form-control"
+                )
+            ], className="mb-3"),
+            html.Div(id="panel-stats-medico", className="mb-3"),
+            create_export_links("medico", medico_username, "Esporta i dati di tutti i pazienti (CSV)")
+            if medico_username else html.Div(),
+            html.Hr(),
+
             html.Div([
                 html.Label("Seleziona paziente", className="form-label"),
                 dcc.Dropdown(
@@ -643,16 +707,58 @@ def get_andamento_glicemico_medico_view():
                     className="form-control"
                 )
             ], className="mb-3"),
+            # Serie della finestra più ampia: la finestra scelta viene ritagliata nel browser
+            dcc.Store(id="doctor-weekly-store"),
             dcc.Graph(id="doctor-weekly-avg", config={"displayModeBar": False}),
             html.Hr(),
 
             html.H6("C) Media mese per mese (Gen→Dic)", className="form-label"),
             dcc.Graph(id="doctor-monthly-avg", config={"displayModeBar": False}),
+            html.Hr(),
+
+            html.H6("D) Tutte le misurazioni (zoom per il dettaglio)", className="form-label"),
+            dcc.Graph(id="doctor-timeline"),
 
             html.Div("Scala 0—300 mg/dL", className="mt-2 text-muted")
         ])
     ], className="mb-4", style={"backgroundColor": "white", "backdropFilter": "none"})
 
+def _fmt_number(value, fmt="{:.0f}"):
+    """Numero formattato o trattino se assente"""
+    return fmt.format(value) if value is not None else "—"
+
+def create_panel_stats_table(stats):
+    """Tabella con le statistiche glicemiche di tutti i pazienti del medico"""
+    if not stats:
+        return html.P("Nessun paziente seguito.", className="text-muted")
+
+    header = html.Thead(html.Tr([
+        html.Th("Paziente"), html.Th("Misure"), html.Th("Media (mg/dL)"), html.Th("CV %"),
+        html.Th("TIR %"), html.Th("Critiche"), html.Th("Ultima misura")
+    ]))
+
+    rows = []
+    for r in stats:
+        ultima = "—"
+        if r["ultima_data"] is not None:
+            ultima = f"{r['ultima_data'].strftime('%d/%m/%Y %H:%M')} · {_fmt_number(r['ultimo_valore'])} mg/dL"
+        rows.append(html.Tr([
+            html.Td(f"{r['nome']} ({r['username']})"),
+            html.Td(r["misure"]),
+            html.Td(_fmt_number(r["media"])),
+            html.Td(_fmt_number(r["cv"], "{:.1f}")),
+            html.Td(_fmt_number(r["tir"])),
+            html.Td(r["critiche"]),
+            html.Td(ultima),
+        ], className="table-danger" if r["critiche"] else ""))
+
+    return html.Div([
+        dbc.Table([header, html.Tbody(rows)], bordered=False, hover=True, responsive=True,
+                  size="sm", className="mb-1"),
+        html.Small("TIR: percentuale di misure tra 70 e 180 mg/dL · CV: coefficiente di variazione",
+                   className="text-muted")
+    ])
+
 # Funzioni per gestione dati pazienti
 
 def get_dati_pazienti_menu(pazienti):
@@ -692,8 +798,8 @@ def create_patient_info_section(paziente, title, info_dict, css_class=""):
         html.P(info_elements, className="card-text")
     ], width=12, md=6)
 
-def get_patient_data_display(paziente, can_modify=True):
-    """Visualizza i dati clinici del paziente con opzione di modifica"""
+def get_patient_data_display(paziente, can_modify=True, metriche=None):
+    """Visualizza i dati clinici (e le metriche glicemiche) del paziente con opzione di modifica"""
     general_info = {
         "Nome Completo": f"{paziente.name} {paziente.surname}",
         "Username": paziente.username,
@@ -728,6 +834,10 @@ def get_patient_data_display(paziente, can_modify=True):
                 create_patient_info_section(paziente, "Informazioni Generali", general_info),
                 create_patient_info_section(paziente, "Dati Clinici", clinical_info)
             ], className="mb-4"),
+
+            # Metriche glicemiche (GMI, TIR, variabilità)
+            create_metrics_card(metriche) if metriche else html.Div(),
+            create_export_links("paziente", paziente.username),
             
             # Info ultima modifica
             html.Div([
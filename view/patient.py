@@ -3,6 +3,7 @@
 from dash import html, dcc
 import dash_bootstrap_components as dbc
 from datetime import datetime, date
+from view.components import create_metrics_card, create_export_links
 
 def get_terapie_options(terapie):
     """Crea le opzioni per il dropdown dei farmaci dalle terapie attive"""
@@ -290,10 +291,47 @@ def get_glicemia_form():
             
             # Pulsanti
             _create_form_buttons("btn-salva-glicemia", "btn-annulla-glicemia", 
-                               "Salva Misurazione", "Annulla")
+                               "Salva Misurazione", "Annulla"),
+
+            # Importazione da file del glucometro o del sensore
+            html.Hr(),
+            html.H6("Importa da file (CSV del glucometro o del sensore)", className="text-secondary mb-2"),
+            html.P("Colonne: data_ora (oppure data e ora), valore, momento_pasto, due_ore_pasto, note. "
+                   "Le misure già registrate vengono saltate.", className="text-muted small mb-2"),
+            dbc.Row([
+                dbc.Col([
+                    dbc.Label("Momento per le righe senza indicazione", className="form-label"),
+                    dbc.Select(id="select-momento-import",
+                             options=[
+                                 {"label": "Scarta la riga", "value": ""},
+                                 {"label": "A digiuno", "value": "digiuno"},
+                                 {"label": "Prima del pasto", "value": "prima_pasto"}
+                             ], value="", className="form-control")
+                ], width=12, md=6),
+                dbc.Col([
+                    dcc.Upload(
+                        id="upload-glicemie",
+                        children=html.Div(["Trascina qui il file o ", html.A("selezionalo")]),
+                        accept=".csv,.txt", max_size=20 * 1024 * 1024,
+                        style={"borderWidth": "1px", "borderStyle": "dashed", "borderRadius": "8px",
+                               "textAlign": "center", "padding": "18px", "cursor": "pointer"}
+                    )
+                ], width=12, md=6)
+            ], className="mb-2"),
+            dcc.Loading(html.Div(id="import-glicemie-feedback"))
         ])
     ], className="mt-3")
 
+def get_import_result_message(filename, esito):
+    """Riepilogo dell'importazione di un file di glicemie"""
+    return dbc.Alert([
+        html.H6(f"Importazione di {filename or 'file'} completata", className="alert-heading"),
+        html.P(f"Righe lette: {esito['righe']} — nuove misure: {esito['inserite']}, "
+               f"già presenti: {esito['duplicate']}, scartate: {esito['scartate']}", className="mb-1"),
+        html.Ul([html.Li(f"Riga {riga}: {errore}") for riga, errore in esito["errori"]],
+                className="small mb-0") if esito["errori"] else html.Div()
+    ], color="success" if esito["inserite"] or not esito["scartate"] else "warning", className="mt-2")
+
 def get_nuova_assunzione_form():
     """Form per registrare una nuova assunzione di farmaci con dropdown terapie"""
     return dbc.Card([
@@ -495,7 +533,8 @@ def get_patient_personal_data_display(paziente):
             dbc.Row([
                 create_patient_info_section_readonly("Informazioni Anagrafiche", general_info),
                 create_patient_info_section_readonly("Dati Clinici", clinical_info)
-            ], className="mb-4")
+            ], className="mb-4"),
+            create_export_links("paziente", paziente.username, "Scarica i miei dati (CSV)")
         ])
     ], className="mt-3", style={"border-left": "4px solid #28a745"})
 
@@ -517,14 +556,18 @@ def create_patient_info_section_readonly(title, info_dict, col_width=6):
         html.P(info_elements, className="card-text")
     ], width=12, md=col_width)
 
-def get_andamento_glicemico_view():
-    """Card con 3 grafici: giorno-settimana, media settimanale, media mensile"""
+def get_andamento_glicemico_view(metriche=None):
+    """Card con metriche e grafici: giorno-settimana, media settimanale, media mensile"""
     return dbc.Card([
         dbc.CardHeader([
             html.H5("Andamento glicemico — settimanale e mensile",
                    className="patient-title mb-0", style={"fontWeight": "400"})
         ]),
         dbc.CardBody([
+            # Metriche (GMI, TIR, variabilità) dai contatori giornalieri
+            create_metrics_card(metriche) if metriche else html.Div(),
+            html.Hr() if metriche else html.Div(),
+
             # Grafico A - Media giornaliera settimana corrente
             html.H6("A) Media giornaliera (Lun→Dom, settimana corrente)", className="form-label"),
             dcc.Graph(id="patient-week-dow", config={"displayModeBar": False}),
@@ -541,12 +584,19 @@ def get_andamento_glicemico_view():
                            ],
                            value=8, clearable=False, style={"maxWidth": "320px"})
             ], className="mb-3"),
+            # Serie della finestra più ampia: la finestra scelta viene ritagliata nel browser
+            dcc.Store(id="patient-weekly-store"),
             dcc.Graph(id="patient-weekly-avg", config={"displayModeBar": False}),
             html.Hr(),
 
             # Grafico C - Media mese per mese
             html.H6("C) Media mese per mese (Gen→Dic)", className="form-label"),
             dcc.Graph(id="patient-monthly-avg", config={"displayModeBar": False}),
+            html.Hr(),
+
+            # Grafico D - Tutte le misurazioni
+            html.H6("D) Tutte le misurazioni (zoom per il dettaglio)", className="form-label"),
+            dcc.Graph(id="patient-timeline"),
             
             html.Div("Scala 0—300 mg/dL", className="mt-2 text-muted"),
             